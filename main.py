@@ -1,13 +1,28 @@
 # standard library imports
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import json
+import os
+import sys
+import threading
+import time
 
 # custom/internal imports
 from src.core.generated_resume import GeneratedResume
 from src.core.generated_cover_letter import GeneratedCoverLetter
+from src.core.batch_resume_generator import BatchResumeGenerator
+from src.core.orchestrated_run import OrchestratedRun
 from src.utils.logger import log
 from src.utils.scrape_otta import OttaScraper
 from src.utils.scrape_linkedin import LinkedinScraper
+from src.utils.anthropic_client import prewarm_client
+from src.utils.batch_manifest import read_batch_manifest
+from src.utils.single_content_completion import model_config
+from src.utils.single_content_completion import response_cache
+from src.utils.single_content_completion import hedge_policy
+from src.utils.single_content_completion import retry_policy
+from src.utils.single_content_completion import telemetry
 
 # ------------------------------------------------------------------------------
 # load params and data
@@ -19,6 +34,50 @@ role_title_overrides =[
     "AI/ML Consultant"
 ]
 
+# ------------------------------------------------------------------------------
+# generate the resume and cover letter of a job description
+#
+# with orchestrated_run set in the model config, the cover letter calls overlap
+# the resume pipeline and both documents render concurrently; otherwise the
+# cover letter is generated after the resume is written
+# ------------------------------------------------------------------------------
+
+def generate_documents(
+    job_description,
+    resume_run=False,
+    max_workers=None
+):
+    """
+    generates and writes the resume and cover letter of a job description
+    :param job_description: job description dict
+    :param resume_run: continue from the checkpoint of an earlier failed run
+    :param max_workers: concurrent API calls allowed to this job
+    """
+    if model_config['orchestrated_run']:
+        OrchestratedRun(
+            job_description=job_description,
+            role_title_overrides=role_title_overrides,
+            resume_run=resume_run
+        ).run(max_workers=max_workers)
+        return
+
+    # create resume object
+    generated_resume = GeneratedResume(
+        job_description=job_description,
+        role_title_overrides=role_title_overrides,
+        resume_run=resume_run
+    )
+
+    generated_resume.generate_resume(max_workers=max_workers)
+
+    generated_cover_letter = GeneratedCoverLetter(
+        job_description=job_description,
+        personal_info=generated_resume.personal_info,
+        resume=generated_resume.professional_experience_output
+    )
+
+    generated_cover_letter.generate_cover_letter()
+
 # ------------------------------------------------------------------------------
 # generate resume and cover letter from flat files
 #
@@ -33,13 +92,15 @@ role_title_overrides =[
 # ------------------------------------------------------------------------------
 
 def generate_resume_from_flat(
-    job_description_file = "jd.json"
+    job_description_file = "jd.json",
+    resume_run=False
 ):
     """
     generates a resume and cover letter from a job description flat file that is
         properly formatted in the template provided
 
     :param job_description_file: formated flat file job description path
+    :param resume_run: continue from the checkpoint of an earlier failed run
 
     :debug: job_description_file='jd.json'
     """
@@ -54,21 +115,7 @@ def generate_resume_from_flat(
     with open(full_jd_path, "r", encoding='utf-8') as json_file:
         job_description = json.load(json_file)
 
-    # create resume object
-    generated_resume = GeneratedResume(
-        job_description = job_description,
-        role_title_overrides=role_title_overrides
-    )
-
-    generated_resume.generate_resume()
-
-    generated_cover_letter = GeneratedCoverLetter(
-        job_description=job_description,
-        personal_info=generated_resume.personal_info,
-        resume=generated_resume.professional_experience_output
-    )
-
-    generated_cover_letter.generate_cover_letter()
+    generate_documents(job_description, resume_run)
 
 # ------------------------------------------------------------------------------
 # generate resume from Otta
@@ -84,12 +131,14 @@ def generate_resume_from_flat(
 # ------------------------------------------------------------------------------
 
 def generate_resume_via_otta(
-    otta_url: str
+    otta_url: str,
+    resume_run=False
 ):
     """
     ingests only the Otta URL and generates a complete tailored resume and cover
         letter
     :param otta_url: full URL of the otta job posting
+    :param resume_run: continue from the checkpoint of an earlier failed run
     :return:
     """
     log('generating resume and cover letter from Otta')
@@ -100,21 +149,7 @@ def generate_resume_via_otta(
     # perform scrape
     otta_scraper.scrape()
 
-    # create resume object
-    generated_resume = GeneratedResume(
-        job_description=otta_scraper.job_description,
-        role_title_overrides=role_title_overrides
-    )
-
-    generated_resume.generate_resume()
-
-    generated_cover_letter = GeneratedCoverLetter(
-        job_description=otta_scraper.job_description,
-        personal_info=generated_resume.personal_info,
-        resume=generated_resume.professional_experience_output
-    )
-
-    generated_cover_letter.generate_cover_letter()
+    generate_documents(otta_scraper.job_description, resume_run)
 
 # ------------------------------------------------------------------------------
 # generate resume from linkedin
@@ -134,12 +169,14 @@ def generate_resume_via_otta(
 # ------------------------------------------------------------------------------
 
 def generate_resume_via_linkedin(
-    linkedin_url: str
+    linkedin_url: str,
+    resume_run=False
 ):
     """
     ingests only the LinkedIn URL and generates a complete tailored resume and
         cover letter
     param linkedin_url: full URL of the LinkedIn job posting
+    param resume_run: continue from the checkpoint of an earlier failed run
     return:
     """
     log('generating resume and cover letter from LinkedIn')
@@ -150,21 +187,144 @@ def generate_resume_via_linkedin(
     # perform scrape
     linkedin_scraper.scrape()
 
-    # create resume object
-    generated_resume = GeneratedResume(
-        job_description=linkedin_scraper.job_description,
-        role_title_overrides=role_title_overrides
-    )
+    generate_documents(linkedin_scraper.job_description, resume_run)
 
-    generated_resume.generate_resume()
+# ------------------------------------------------------------------------------
+# generate resumes for many job descriptions via the Message Batches API
+#
+# latency is traded for cost: each pipeline stage is submitted as one batch for
+# all job descriptions, and batches can take minutes to hours to complete
+#
+# execute the function with the following commands:
+# cd <project_dir>
+# python main.py --message-batches jd.json jd-2.json jd-3.json
+# ------------------------------------------------------------------------------
 
-    generated_cover_letter = GeneratedCoverLetter(
-        job_description=linkedin_scraper.job_description,
-        personal_info=generated_resume.personal_info,
-        resume=generated_resume.professional_experience_output
+def generate_resumes_via_message_batches(
+    job_description_files
+):
+    """
+    generates resumes for several job description flat files through the Message
+        Batches API, then generates a cover letter for each completed resume
+    :param job_description_files: list of job description file names in
+        ./data/input/job_description/
+    :return: number of failed jobs
+    """
+    log(f'generating {len(job_description_files)} resumes via message batches')
+
+    generated_resumes = []
+    for job_description_file in job_description_files:
+        full_jd_path = "./data/input/job_description/" + job_description_file
+        with open(full_jd_path, "r", encoding='utf-8') as json_file:
+            job_description = json.load(json_file)
+        generated_resumes.append(GeneratedResume(
+            job_description=job_description,
+            role_title_overrides=role_title_overrides
+        ))
+
+    batch_generator = BatchResumeGenerator(generated_resumes)
+    completed_resumes = batch_generator.generate_resume_content()
+
+    for generated_resume in completed_resumes:
+        generated_resume.write_resume()
+
+        generated_cover_letter = GeneratedCoverLetter(
+            job_description=generated_resume.job_description,
+            personal_info=generated_resume.personal_info,
+            resume=generated_resume.professional_experience_output
+        )
+
+        generated_cover_letter.generate_cover_letter()
+
+    for j, error in batch_generator.failed_jobs.items():
+        log(f'resume generation failed for {job_description_files[j]}: {error}')
+
+    return len(batch_generator.failed_jobs)
+
+# ------------------------------------------------------------------------------
+# generate resumes and cover letters for a batch of job descriptions
+#
+# takes a directory of job description flat files, or a manifest file listing
+# one job description file or Otta/LinkedIn URL per line; jobs run concurrently
+# in one process and share the max_concurrency budget of concurrent API calls
+#
+# execute the function with the following commands:
+# cd <project_dir>
+# python main.py --batch ./data/input/job_description/
+# python main.py --batch weekly-sweep.txt
+# ------------------------------------------------------------------------------
+
+def generate_batch_job(
+    source,
+    location,
+    resume_run=False,
+    max_workers=None
+):
+    """
+    generates the resume and cover letter of a single batch job
+    :param source: 'flat', 'otta' or 'linkedin'
+    :param location: job description file path or job posting URL
+    :param resume_run: continue from the checkpoint of an earlier failed run
+    :param max_workers: concurrent API calls allowed to this job
+    """
+    if source == 'flat':
+        with open(location, "r", encoding='utf-8') as json_file:
+            job_description = json.load(json_file)
+    else:
+        scraper = OttaScraper(location) if source == 'otta' else LinkedinScraper(location)
+        scraper.scrape()
+        job_description = scraper.job_description
+
+    generate_documents(job_description, resume_run, max_workers)
+
+
+def generate_resumes_in_batch(
+    batch_path,
+    resume_run=False
+):
+    """
+    generates a resume and cover letter for every job in a batch directory or
+        manifest, then reports the status of each job and the batch throughput
+    :param batch_path: directory of job description files or manifest file
+    :param resume_run: continue each job from the checkpoint of an earlier run
+    :return: number of failed jobs
+    """
+    jobs = read_batch_manifest(batch_path)
+    batch_config = model_config['batch']
+    concurrent_jobs = max(1, min(batch_config['max_concurrent_jobs'], len(jobs)))
+    # the jobs running at once split the budget of concurrent API calls
+    max_workers = max(1, model_config['max_concurrency'] // concurrent_jobs)
+    retry_policy.run_deadline = batch_config['run_deadline_seconds']
+
+    log(f'generating {len(jobs)} resumes in batch, {concurrent_jobs} at a time')
+
+    def run_job(job):
+        start_time = time.time()
+        try:
+            generate_batch_job(*job, resume_run=resume_run, max_workers=max_workers)
+            return 'succeeded', time.time() - start_time, None
+        except Exception as e:
+            log(f'batch job {job[1]} failed: {e}')
+            return 'failed', time.time() - start_time, e
+
+    batch_start = time.time()
+    # the jobs run within the batch's run, and so share its deadline
+    with retry_policy.run(), ThreadPoolExecutor(max_workers=concurrent_jobs) as executor:
+        results = list(executor.map(run_job, jobs))
+    batch_duration = time.time() - batch_start
+
+    report = "batch job status:\n"
+    for (source, location), (status, duration, error) in zip(jobs, results):
+        report += f"{status:<10}{duration:>8.1f}s  {location}"
+        report += f"  ({error})\n" if error else "\n"
+    succeeded = sum(status == 'succeeded' for status, _, _ in results)
+    report += (
+        f"{succeeded} of {len(jobs)} jobs succeeded in {batch_duration:.1f} seconds "
+        f"({succeeded / batch_duration * 3600 if batch_duration else 0:.1f} jobs per hour)"
     )
+    log(report)
 
-    generated_cover_letter.generate_cover_letter()
+    return len(jobs) - succeeded
 
 # ------------------------------------------------------------------------------
 # other functions
@@ -221,20 +381,56 @@ def main():
                        help='Otta job posting URL')
     group.add_argument('--linkedin', '-l',
                        help='LinkedIn job posting URL')
+    group.add_argument('--message-batches', '-m', nargs='+',
+                       help='Paths to several job description files, generated via the Message Batches API')
+    group.add_argument('--batch', '-b',
+                       help='Directory of job description files, or manifest file of job description files and URLs')
+
+    # optional flags that apply to every input source
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore cached API responses and refresh them with new calls')
+    parser.add_argument('--resume-run', action='store_true',
+                        help='Continue a failed run from its checkpoint instead of starting over')
 
     args = parser.parse_args()
 
-    # Call appropriate function based on which argument was provided
-    if args.job_description:
-        generate_resume_from_flat(args.job_description)
-    elif args.otta:
-        generate_resume_via_otta(args.otta)
-    elif args.linkedin:
-        generate_resume_via_linkedin(args.linkedin)
+    if args.no_cache:
+        response_cache.bypass = True
+
+    # open API connections while the job description is loaded or scraped
+    prewarm_thread = threading.Thread(target=prewarm_client, daemon=True)
+    prewarm_thread.start()
+
+    # Call appropriate function based on which argument was provided; failed
+    # batch jobs are logged without stopping the batch, so both batch modes
+    # report them in the exit status for schedulers and shell scripts
+    exit_status = 0
+    try:
+        if args.job_description:
+            generate_resume_from_flat(args.job_description, args.resume_run)
+        elif args.otta:
+            generate_resume_via_otta(args.otta, args.resume_run)
+        elif args.linkedin:
+            generate_resume_via_linkedin(args.linkedin, args.resume_run)
+        elif args.message_batches:
+            if generate_resumes_via_message_batches(args.message_batches):
+                exit_status = 1
+        elif args.batch:
+            if generate_resumes_in_batch(args.batch, args.resume_run):
+                exit_status = 1
+    finally:
+        # summarize and export the chat completion calls, including failed runs
+        hedge_policy.log_summary()
+        telemetry.export_run(
+            os.getenv('TELEMETRY_OUTPUT_PATH', './data/output/telemetry/'),
+            datetime.now().strftime('run-%Y%m%d-%H%M%S')
+        )
+
+    return exit_status
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
 # ------------------------------------------------------------------------------
 # end of main.py
@@ -0,0 +1,149 @@
+# internal imports
+from src.core.generated_resume import GeneratedResume
+from src.utils.batch_completion import complete_batch
+from src.utils.logger import log
+from src.utils.single_content_completion import forget_response
+from src.utils.single_content_completion import planned_max_tokens
+
+# ------------------------------------------------------------------------------
+# define primary class
+# ------------------------------------------------------------------------------
+
+class BatchResumeGenerator:
+    """
+    This class generates the resume content of many queued jobs through the
+    Message Batches API. Each pipeline stage's prompts are collected across all
+    jobs and submitted as a single batch; once the batch ends, every job is
+    advanced to its next stage. Jobs whose prompts or outputs fail are dropped
+    from later stages and reported in failed_jobs
+    :param resumes: list of GeneratedResume objects, one per queued job
+    :param client: Anthropic client, or a LocalBatchEndpoint for offline runs
+    :param poll_interval: seconds between batch status checks
+    """
+    def __init__(
+        self,
+        resumes,
+        client=None,
+        poll_interval=None
+    ):
+        log("initializing BatchResumeGenerator object")
+        self.resumes = resumes
+        self.client = client
+        self.poll_interval = poll_interval
+        # maps job index to the error that removed it from the batch
+        self.failed_jobs = {}
+        log("BatchResumeGenerator object initialized")
+
+# ------------------------------------------------------------------------------
+# helper methods
+# ------------------------------------------------------------------------------
+
+    def _fail_job(self, j, error):
+        log(f"Error in batch job {j}, removing it from the batch: {error}")
+        self.failed_jobs[j] = error
+
+    def _submit(self, stage, stores, reask=True):
+        """
+        submit the requests of a stage as one batch and store their outputs
+        :param stage: name of the stage
+        :param stores: dict mapping custom_id to tuples of the job index, task
+            name, output store, output store args and prompt of each request
+        :param reask: if False, outputs that could not be parsed fail their job
+            instead of being re-asked
+        :return: stores of the corrective re-asks of outputs that could not be
+            parsed, keyed like stores
+        """
+        responses, errors = complete_batch(
+            [
+                (custom_id, content, planned_max_tokens(task_name))
+                for custom_id, (_, task_name, _, _, content) in stores.items()
+            ],
+            client=self.client,
+            poll_interval=self.poll_interval
+        )
+
+        reasks = {}
+        for custom_id, (j, task_name, store_output, args, content) in stores.items():
+            if j in self.failed_jobs:
+                continue
+            if custom_id in errors:
+                self._fail_job(j, RuntimeError(f"{stage} request failed: {errors[custom_id]}"))
+                continue
+            try:
+                store_output(*args, responses[custom_id])
+            except Exception as e:
+                # a rejected output is not replayed from the response cache by reruns
+                forget_response(content, stage=task_name)
+                corrective_prompt = None
+                if reask and isinstance(e, ValueError):
+                    corrective_prompt = self.resumes[j]._corrective_prompt(
+                        task_name, content, responses[custom_id], e
+                    )
+                if corrective_prompt is None:
+                    self._fail_job(j, e)
+                    continue
+                reasks[f"{custom_id}-reask"] = (j, task_name, store_output, args, corrective_prompt)
+        return reasks
+
+    def _run_stage(self, stage_index, stage):
+        """
+        submit one pipeline stage for every active job and store the outputs;
+        outputs that could not be parsed are re-asked once in a second batch,
+        like the corrective re-asks of the threaded and asyncio pipelines
+        :param stage_index: position of the stage in PIPELINE_STAGES
+        :param stage: name of the stage
+        """
+        stores = {}
+
+        for j, resume in enumerate(self.resumes):
+            if j in self.failed_jobs:
+                continue
+            try:
+                for t, (task_name, build_prompt, store_output, args) in enumerate(resume._stage_tasks(stage)):
+                    if resume._complete_locally(task_name, args):
+                        continue
+                    custom_id = f"job{j}-stage{stage_index}-task{t}"
+                    stores[custom_id] = (j, task_name, store_output, args, build_prompt(*args))
+            except Exception as e:
+                self._fail_job(j, e)
+
+        log(f"submitting {stage} stage: {len(stores)} requests across "
+            f"{len(self.resumes) - len(self.failed_jobs)} jobs")
+        reasks = self._submit(stage, stores)
+
+        if reasks:
+            log(f"submitting {len(reasks)} corrective re-asks of the {stage} stage")
+            self._submit(stage, reasks, reask=False)
+
+# ------------------------------------------------------------------------------
+# primary method
+# ------------------------------------------------------------------------------
+
+    def generate_resume_content(self):
+        """
+        run every pipeline stage for all queued jobs and finish the resume
+        content of each job that completed, saving its employer outputs for
+        incremental regeneration; unchanged employers reuse the outputs saved
+        by the previous run of their job description
+        :return: list of GeneratedResume objects that completed successfully
+        """
+        log(f"generating resume content for {len(self.resumes)} jobs via message batches")
+
+        for resume in self.resumes:
+            resume._load_previous_employer_outputs()
+
+        for stage_index, stage in enumerate(GeneratedResume.PIPELINE_STAGES):
+            self._run_stage(stage_index, stage)
+
+        completed = []
+        for j, resume in enumerate(self.resumes):
+            if j not in self.failed_jobs:
+                resume.finish_resume_content()
+                completed.append(resume)
+
+        log(f"batch generation complete: {len(completed)} of {len(self.resumes)} jobs succeeded")
+        return completed
+
+# ------------------------------------------------------------------------------
+# end of batch_resume_generator.py
+# ------------------------------------------------------------------------------
@@ -1,15 +1,23 @@
 # external imports
-from docx import Document
-from docx.shared import Pt, Inches, RGBColor
+from docx.shared import Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from dotenv import dotenv_values
+import asyncio
+import io
 import json
 import pathlib
 import os
 import re
 import yaml
 # internal imports
+from src.utils.single_content_completion import async_complete_single_content
 from src.utils.single_content_completion import complete_single_content
+from src.utils.single_content_completion import retry_policy
+from src.utils.single_content_completion import stream_single_content
+from src.utils.docx_template import base_document
+from src.utils.atomic_write import write_atomically
+from src.utils.asset_registry import HEADER_IMAGE
+from src.utils.asset_registry import add_asset_picture
 from src.utils.logger import log
 
 # ------------------------------------------------------------------------------
@@ -20,7 +28,7 @@ log('loading params and data')
 
 env_vars = dotenv_values(".env")
 
-with open('config/model_v1.3.2.yaml', 'r') as file:
+with open('config/model_v1.3.6.yaml', 'r') as file:
     model_config: object = yaml.safe_load(file)
 
 with open('config/doc_format.yaml', 'r') as file:
@@ -67,6 +75,7 @@ class GeneratedCoverLetter:
         self.personal_info = personal_info
         self.resume = resume
         # generated content to be defined via methods
+        self.company_info = None
         self.cover_letter_text = None
         log("GeneratedCoverLetter object initialized")
 
@@ -75,28 +84,36 @@ class GeneratedCoverLetter:
 # sub methods to main cover letter generator method
 # -----------------------------------------------------------------------------
 
-    def generate_cover_letter_content(self):
-        """generates a cover letter using the OpenAI API"""
-        log("generating cover letter content")
-
-        # read in user generated cover letter content if any
+    def _load_cover_letter_content(self):
+        """
+        read in user generated cover letter content if any
+        :return: custom cover letter content, or None if no file exists
+        """
         cl_content_path = self.env_vars['COVER_LETTER_CONTENT_PATH'] + self.job_description['company_name'] + '.txt'
 
         if pathlib.Path(cl_content_path).exists():
             with open(cl_content_path, 'r', encoding='utf-8') as f:
-                cl_content = f.read()
-        else:
-            cl_content = None
+                return f.read()
+        return None
+
 
-        # retrieve information about company
-        company_info = complete_single_content(
+    def _company_info_prompt(self):
+        """builds the prompt to retrieve information about the company"""
+        return (
             "Give me a summary about this company and tell me about its " + \
             "values: " + self.job_description['company_name']
         )
 
-        # generate body of cover letter
+
+    def _cover_letter_prompt(self, company_info, cl_content):
+        """
+        builds the prompt for the body of the cover letter
+        :param company_info: summary of the company returned by the API
+        :param cl_content: custom cover letter content, or None
+        :return: formatted prompt
+        """
         if cl_content is not None:
-            self.cover_letter_text = complete_single_content(
+            return (
                 "An individual has this experience: " + str(self.resume) + ". " +
                 "They are applying for this job: " + self.job_description['role_description'] + ". " +
                 "at this company: " + company_info + " ." +
@@ -110,7 +127,7 @@ class GeneratedCoverLetter:
                 "7. Limit the output to 4 paragraphs."
             )
         else:
-            self.cover_letter_text = complete_single_content(
+            return (
                 "An individual has this experience: " + str(self.resume) + ". " +
                 "They are applying for this job: " + self.job_description['role_description'] + ". " +
                 "at this company: " + company_info + " ." +
@@ -123,44 +140,109 @@ class GeneratedCoverLetter:
                 "6. Limit the output to 4 paragraphs."
             )
 
+
+    def fetch_company_info(self):
+        """
+        retrieve the summary of the company; it only needs the company name, so
+            it can run before the resume is generated
+        :write: self.company_info
+        """
+        self.company_info = complete_single_content(
+            self._company_info_prompt(), stage='company_info'
+        )
+
+
+    def stream_cover_letter_content(self):
+        """
+        generates the cover letter content, yielding the body of the cover letter
+        as it is generated; self.cover_letter_text is set once the stream ends
+        :return: generator of text deltas
+        """
+        log("generating cover letter content")
+
+        cl_content = self._load_cover_letter_content()
+
+        # retrieve information about company, unless fetched ahead of time
+        if self.company_info is None:
+            self.fetch_company_info()
+
+        # generate body of cover letter
+        cover_letter_chunks = []
+        for text in stream_single_content(
+            self._cover_letter_prompt(self.company_info, cl_content),
+            stage='cover_letter_body'
+        ):
+            cover_letter_chunks.append(text)
+            yield text
+
+        self.cover_letter_text = "".join(cover_letter_chunks)
+
         log("cover letter content generated")
 
 
-    def write_cover_letter(self):
+    def generate_cover_letter_content(self, on_text=None):
         """
-        takes the cover_letter_text string from the cover_letter_gen function and
-        writes it to a .docx file at the specified path
+        generates a cover letter using the Anthropic API
+        :param on_text: optional function called with each piece of the cover
+            letter body as it arrives, e.g. to display progress
         """
-        log("writing cover letter to docx file")
+        with retry_policy.run():
+            for text in self.stream_cover_letter_content():
+                if on_text is not None:
+                    on_text(text)
+
 
-        # open and format doc
-        cover_letter_doc = Document()
-
-        section = cover_letter_doc.sections[0]
-        section.top_margin = Inches(1)
-        section.bottom_margin = Inches(1)
-        section.left_margin = Inches(1)
-        section.right_margin = Inches(1)
-
-        # set document styles
-        normal_style = cover_letter_doc.styles['Normal']
-        normal_font = normal_style.font
-        normal_font.name = self.doc_format['cover_letter']['font_name']
-        normal_font.size = Pt(self.doc_format['cover_letter']['font_size'])
-        normal_font.color.rgb = RGBColor(
-            self.doc_format['cover_letter']['font_color'][0],
-            self.doc_format['cover_letter']['font_color'][1],
-            self.doc_format['cover_letter']['font_color'][2]
+    async def async_generate_cover_letter_content(self):
+        """
+        generates a cover letter with the async Anthropic client so that it can
+        share an event loop with other pipelines
+        """
+        log("generating cover letter content asynchronously")
+
+        cl_content = await asyncio.to_thread(self._load_cover_letter_content)
+
+        with retry_policy.run():
+            # retrieve information about company, unless fetched ahead of time
+            if self.company_info is None:
+                self.company_info = await async_complete_single_content(
+                    self._company_info_prompt(), stage='company_info'
+                )
+
+            # generate body of cover letter
+            self.cover_letter_text = await async_complete_single_content(
+                self._cover_letter_prompt(self.company_info, cl_content),
+                stage='cover_letter_body'
+            )
+
+        log("cover letter content generated")
+
+
+    def output_path(self):
+        """
+        :return: path of the cover letter in the COVER_LETTER_OUTPUT_PATH directory
+        """
+        file_name = re.sub(
+            r'\s+',
+            '',
+            f"{self.personal_info['first_name'].lower()}-"
+            f"{self.personal_info['last_name'].lower()}-"
+            f"{self.job_description['name_param']}-cover-letter.docx"
         )
-        normal_paragraph_format = normal_style.paragraph_format
-        normal_paragraph_format.line_spacing = self.doc_format['cover_letter']['line_spacing']
-        normal_paragraph_format.space_before = Pt(0)
-        normal_paragraph_format.space_after = Pt(0)
+        return os.path.join(self.env_vars['COVER_LETTER_OUTPUT_PATH'], file_name)
+
+
+    def _build_cover_letter_document(self):
+        """
+        build the cover letter document in memory from the cover_letter_text
+        :return: docx Document
+        """
+        # clone the styled base document; margins and styles are applied once
+        # per doc_format version
+        cover_letter_doc = base_document('cover_letter', self.doc_format)
 
         # insert either header image or text based on param
         if self.doc_format['cover_letter_user_image_header']:
-            image_path = './data/assets/resume-header.png'
-            cover_letter_doc.add_picture(image_path, width=Inches(6.5))
+            add_asset_picture(cover_letter_doc.add_paragraph().add_run(), HEADER_IMAGE, width=Inches(6.5))
         else:
             heading = cover_letter_doc.add_heading(
                 self.personal_info["first_name"].upper() + " " + self.personal_info["last_name"].upper(),
@@ -192,19 +274,32 @@ class GeneratedCoverLetter:
             self.personal_info["last_name"]
         )
 
-        # build cover letter output path and save
-        cover_letter_output_path = (
-            f"""
-            {self.env_vars['COVER_LETTER_OUTPUT_PATH']}
-            {self.personal_info['first_name'].lower()}-
-            {self.personal_info['last_name'].lower()}- 
-            {self.job_description['name_param']}-cover-letter.docx
-            """
-        )
-        cover_letter_output_path = re.sub(r'\s+', '', cover_letter_output_path)
-        cover_letter_doc.save(cover_letter_output_path)
+        return cover_letter_doc
+
+
+    def render_cover_letter_bytes(self):
+        """
+        render the cover letter without touching the file system
+        :return: bytes of the .docx file
+        """
+        buffer = io.BytesIO()
+        self._build_cover_letter_document().save(buffer)
+        return buffer.getvalue()
+
+
+    def write_cover_letter(self):
+        """
+        takes the cover_letter_text string from the cover_letter_gen function and
+        writes it to a .docx file at the specified path; the file appears
+        complete or not at all
+        :return: path of the written file
+        """
+        log("writing cover letter to docx file")
+        cover_letter_output_path = self.output_path()
+        write_atomically(cover_letter_output_path, self.render_cover_letter_bytes())
 
         log("cover letter saved to " + cover_letter_output_path)
+        return cover_letter_output_path
 
 # ------------------------------------------------------------------------------
 # primary cover letter generation method
@@ -1,24 +1,50 @@
 # Standard library imports
-from concurrent.futures import ThreadPoolExecutor, wait, ALL_COMPLETED
+import asyncio
+import copy
+import io
 import json
 import os
 import pickle
 import re
+import threading
 
 # Third-party imports
-import ast
-from docx import Document
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Pt, Inches, RGBColor
+from docx.shared import Pt, Inches
 from dotenv import dotenv_values
 import yaml
 
 # internal imports
+from src.utils.single_content_completion import async_complete_single_content
+from src.utils.single_content_completion import cacheable_prompt
 from src.utils.single_content_completion import complete_single_content
+from src.utils.single_content_completion import forget_response
+from src.utils.single_content_completion import planned_max_tokens
+from src.utils.single_content_completion import response_cache
+from src.utils.single_content_completion import retry_policy
 from src.utils.logger import log
+from src.utils.retry_policy import TruncatedCompletionError
 from src.utils.json_verifier import is_array_of_strings
 from src.utils.json_verifier import is_array_of_objects
 from src.utils.json_verifier import is_object
+from src.utils.json_verifier import is_skill_lists
+from src.utils.json_repair import parse_model_output
+from src.utils.bm25 import BM25Index
+from src.utils.page_fit import PageFitEstimator
+from src.utils.atomic_write import write_atomically
+from src.utils.asset_registry import HEADER_IMAGE
+from src.utils.asset_registry import RULE_LINE
+from src.utils.asset_registry import add_asset_picture
+from src.utils.checkpoint import EmployerOutputStore
+from src.utils.checkpoint import RunCheckpoint
+from src.utils.docx_template import TABLE_HEADER_STYLE
+from src.utils.docx_template import base_document
+from src.utils.checkpoint import fingerprint
+from src.utils.experience_verifier import experience_tokens
+from src.utils.experience_verifier import verify_experience_locally
+from src.utils.task_graph import TaskGraph
+from src.utils.task_graph import task_label
+from src.utils.token_estimator import trim_to_budget
 
 # ------------------------------------------------------------------------------
 # define primary class
@@ -30,17 +56,73 @@ class GeneratedResume:
     :param job_description: load the job description data
     :param role_title_overrides: a list of role titles to override the ones generated by the model
     :param model_config: configuration file that holds model specific information
+    :param resume_run: if True, continue from the checkpoint of an earlier run
+        with the same inputs, skipping the chat completions it completed
     """
+    # chat completion stages in the order they run; every completion within a
+    # stage only depends on the outputs of earlier stages
+    PIPELINE_STAGES = (
+        'extract_skills',
+        'select_all_relevant_experience',
+        'select_most_relevant_experience',
+        'verify_experience',
+        'format_experience_and_hard_skills',
+        'generate_role_titles'
+    )
+    # per-employer chat completions and the liminal key each one writes
+    EMPLOYER_TASK_OUTPUTS = {
+        'select_all_relevant_experience': 'all_relevant_experience',
+        'select_most_relevant_experience': 'most_relevant_experience',
+        'verify_experience': 'verified_experience',
+        'format_experience': 'formatted_experience',
+        'generate_role_title': 'role_title',
+    }
+    # validator and description of the expected output of each chat completion
+    # whose output is JSON
+    OUTPUT_SCHEMAS = {
+        'extract_tech_skills': (is_array_of_strings, "a JSON array of strings"),
+        'extract_tech_tools': (is_array_of_strings, "a JSON array of strings"),
+        'extract_soft_skills': (is_array_of_strings, "a JSON array of strings"),
+        'extract_skills': (
+            is_skill_lists,
+            'a JSON object with "tech_skills", "tech_tools" and "soft_skills" arrays of strings'
+        ),
+        'select_all_relevant_experience': (is_array_of_objects, "a JSON array of objects"),
+        'select_most_relevant_experience': (is_array_of_objects, "a JSON array of objects"),
+        'verify_experience': (is_array_of_objects, "a JSON array of objects"),
+        'extract_hard_skills': (is_object, "a JSON object of string values"),
+        'format_experience': (is_array_of_strings, "a JSON array of strings"),
+    }
+    # model config keys read by the per-employer chat completions
+    EMPLOYER_PROMPT_KEYS = (
+        'anthropic_model_version',
+        'select_all_experience_prompt',
+        'select_candidate_experience_prompt',
+        'select_most_relevant_experience_prompt',
+        'select_most_relevant_candidate_experience_prompt',
+        'verify_experience_prompt',
+        'format_experience_prompt',
+        'generate_role_title_prompt',
+        'json_form_clause',
+        'input_token_budget',
+        'stage_max_tokens',
+        'max_tokens_ceiling',
+        'corrective_reask',
+        'corrective_reask_prompt',
+        'local_experience_verifier',
+    )
+
     def __init__(
         self,
         job_description=None,
         role_title_overrides=None,
         model_config=None,
+        resume_run=False,
     ):
         log("initializing GeneratedResume object")
         # ingested file parameters
         self.env_vars = dotenv_values(".env")
-        with open('config/model_v1.3.4.yaml', 'r') as file:
+        with open('config/model_v1.3.6.yaml', 'r') as file:
             self.model_config: object = yaml.safe_load(file)
         with open('config/doc_format.yaml', 'r') as file:
             self.doc_format = yaml.safe_load(file)
@@ -58,8 +140,44 @@ class GeneratedResume:
         self.gen_tech_skills = None
         self.professional_experience_count = len(self.professional_experience_input)
         self.professional_experience_output = []  # will hold the final output to be given to resume writer
+        # checkpoint of the completed chat completions, keyed by the run's inputs
+        self.resume_run = resume_run
+        self.completed_tasks = set()
+        # guards the intermediate state against being checkpointed mid-update
+        self._state_lock = threading.Lock()
+        self.checkpoint = RunCheckpoint(
+            self.env_vars.get('CHECKPOINT_PATH', './data/checkpoints/'),
+            fingerprint(
+                self.job_description,
+                self.professional_experience_input,
+                self.role_title_overrides,
+                self.model_config
+            ),
+            name=(self.job_description or {}).get('name_param') or 'resume'
+        )
+        # outputs of each employer's chain from the last completed run for this
+        # job description, reused for employers whose inputs are unchanged
+        self.employer_outputs = EmployerOutputStore(
+            self.env_vars.get('EMPLOYER_OUTPUT_PATH', './data/employer_outputs/'),
+            fingerprint(self.job_description),
+            name=(self.job_description or {}).get('name_param') or 'resume'
+        )
+        self.previous_employer_outputs = {}
+        self.employer_fingerprints = {}
         log("GeneratedResume object initialized")
 
+    def __getstate__(self):
+        # locks cannot be pickled, e.g. by pickle_resume; unpickled resumes get
+        # a new one
+        state = self.__dict__.copy()
+        del state['_state_lock']
+        state.pop('_async_checkpoint_lock', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._state_lock = threading.Lock()
+
     def _set_gen_resume_components(self):
         try:
             if os.path.exists(self.env_vars['RESUME_INPUT_PATH']):
@@ -96,6 +214,11 @@ class GeneratedResume:
         self.hard_skills = resume_input['hard_skills']
         for experience in self.professional_experience_input:
             self.professional_experience_liminal.append({"employer": experience["employer"]})
+        # relevance index over each employer's experience entries, queried once the skills are extracted
+        self.experience_indices = [
+            BM25Index([experience_tokens(entry) for entry in experience.get('experience') or []])
+            for experience in self.professional_experience_input
+        ]
 
 # ------------------------------------------------------------------------------
 # helper functions to be used by other functions in this class
@@ -104,29 +227,116 @@ class GeneratedResume:
     @staticmethod
     def add_line(doc):
         """
-        Add a horizontal line to the document
+        Add a horizontal line to the document; the margins are set by the base
+        document template
         :param doc:
         :return:
         """
-        sections = doc.sections
-        for section in sections:
-            section.left_margin = Inches(1)
         p = doc.add_paragraph()
         run = p.add_run()
-        run.add_picture('./data/assets/black-line.png', width=Inches(6.375))
+        add_asset_picture(run, RULE_LINE, width=Inches(6.375))
         font = run.font
         font.size = Pt(1)
         p_format = p.paragraph_format
         p_format.left_indent = Inches(-0.03125)
 
+    @staticmethod
+    def _style_table_header(hdr_cells):
+        """
+        Apply the named table header style to the two header cells of a table,
+        left aligning the first cell and right aligning the second
+        :param hdr_cells: cells of the table's header row
+        """
+        for cell, alignment in zip(hdr_cells, (WD_ALIGN_PARAGRAPH.LEFT, WD_ALIGN_PARAGRAPH.RIGHT)):
+            paragraph = cell.paragraphs[0]
+            paragraph.style = TABLE_HEADER_STYLE
+            paragraph.alignment = alignment
+
+    def _candidate_experience(self, i):
+        """
+        Pre-rank an employer's experience entries against the extracted skills and
+        keep the candidate_count best, in their input order, so that selection
+        prompts do not grow with the length of the career history
+        :param i: index of the professional experience input
+        :return: list of experience entries
+        """
+        experience = self.professional_experience_input[i]['experience']
+        candidate_count = self.model_config['candidate_count']
+        if candidate_count is None or not isinstance(experience, list) or len(experience) <= candidate_count[i]:
+            return experience
+
+        skills = self.gen_tech_skills + self.gen_tech_tools + self.gen_soft_skills
+        indices = self.experience_indices[i].top_k(experience_tokens(" ".join(skills)), candidate_count[i])
+        log(f"sending {len(indices)} of {len(experience)} experience entries for employer {i}")
+        return [experience[index] for index in indices]
+
+    def _experience_selection_prompt(self, i, template_name, candidate_template_name):
+        """
+        Build a prompt that selects from an employer's experience entries; the full
+        experience list is the same for every job description and is cached with
+        the prompt prefix, while a pre-ranked subset changes with the extracted
+        skills and is sent after the prefix with the candidate template
+        :param i: index of the professional experience input
+        :param template_name: prompt template for the full experience list
+        :param candidate_template_name: prompt template for a pre-ranked subset
+        :return: formatted prompt
+        """
+        experience = self._candidate_experience(i)
+        prompt_inputs = {
+            "experience": experience,
+            "skills": self.gen_tech_skills + self.gen_tech_tools + self.gen_soft_skills,
+            "experience_count": self.model_config['experience_count'][i],
+            "json_form_clause":self.model_config['json_form_clause']
+        }
+        if experience is self.professional_experience_input[i]['experience']:
+            return self._format_prompt(template_name, prompt_inputs)
+        return self._format_prompt(candidate_template_name, prompt_inputs)
+
+    def _format_prompt(self, template_name, prompt_inputs):
+        """
+        Insert the prompt inputs into a prompt template from the model config;
+        templates split into a prefix and a suffix are returned as content blocks
+        with the prefix marked for provider-side prompt caching. If the input
+        budget action is 'trim', the last items of the longest list input are
+        dropped until the prompt fits max_input_tokens
+        :param template_name: key of the prompt template in the model config
+        :param prompt_inputs: values to insert into the template
+        :return: prompt string or list of content blocks
+        """
+        template = self.model_config[template_name]
+
+        def build_prompt(inputs):
+            if isinstance(template, dict):
+                return cacheable_prompt(
+                    template['prefix'].format_map(inputs),
+                    template['suffix'].format_map(inputs)
+                )
+            return template.format_map(inputs)
+
+        input_token_budget = self.model_config['input_token_budget']
+        if input_token_budget['action'] != 'trim' or input_token_budget['max_input_tokens'] is None:
+            return build_prompt(prompt_inputs)
+
+        prompt, dropped = trim_to_budget(
+            build_prompt,
+            prompt_inputs,
+            input_token_budget['max_input_tokens']
+        )
+        if dropped:
+            log(f"Warning: dropped {dropped} list items from {template_name} to fit the input budget")
+        return prompt
+
 # ------------------------------------------------------------------------------
-# helper functions that specifically perform chat completions
+# helper functions that build the prompt for each chat completion
+#
+# every chat completion is split into a prompt builder and an output store so
+# that the same stage logic can be driven by the threaded and asyncio pipelines
 # ------------------------------------------------------------------------------
 
-    def _extract_tech_skills(self):
+    def _tech_skills_prompt(self):
         """
-        Extract the technical skills required within this job description
-        :write: self.gen_tech_skills
+        Build the prompt to extract the technical skills required within this job description
+        :return: formatted prompt
         """
         log("extracting tech skills")
 
@@ -135,35 +345,17 @@ class GeneratedResume:
             raise ValueError("Error: role_description is not populated")
 
         # extract prompt from config and insert prompt inputs
-        prompt = self.model_config['tech_skills_extraction_prompt']
         prompt_inputs = {
             "role_description": self.job_description['role_description'],
             "json_form_clause":self.model_config['json_form_clause']
         }
-        prompt = prompt.format_map(prompt_inputs)
+        return self._format_prompt('tech_skills_extraction_prompt', prompt_inputs)
 
-        gen_tech_skills = complete_single_content(prompt)
 
-        # convert the query result to an object, and raise error if it fails
-        try:
-            if not is_array_of_strings(ast.literal_eval(gen_tech_skills)):
-                raise ValueError(
-                    "Error: _extract_tech_skills output is not array of strings"
-                    f"Output: {gen_tech_skills}"
-                )
-            self.gen_tech_skills = ast.literal_eval(gen_tech_skills)
-        except Exception as e:
-            raise ValueError(
-                "Error: _extract_tech_skills output not valid json object" +
-                f"Error: {e} " +
-                f"Output: {gen_tech_skills}"
-            )
-
-
-    def _extract_tech_tools(self):
+    def _tech_tools_prompt(self):
         """
-        Extract the technical tools required within this job description
-        :write: self.gen_tech_tools
+        Build the prompt to extract the technical tools required within this job description
+        :return: formatted prompt
         """
         log("extracting tech tools")
 
@@ -171,36 +363,18 @@ class GeneratedResume:
         if self.job_description['role_description'] is None or self.job_description['role_description'] == "":
             raise ValueError("Error: role_description is not populated")
 
-        prompt =self.model_config['tech_tools_extraction_prompt']
         prompt_inputs = {
             "role_description": self.job_description['role_description'],
             "key_skills": self.job_description['key_skills'],
             "json_form_clause":self.model_config['json_form_clause']
         }
-        prompt = prompt.format_map(prompt_inputs)
+        return self._format_prompt('tech_tools_extraction_prompt', prompt_inputs)
 
-        gen_tech_tools = complete_single_content(prompt)
 
-        # convert the query result to an object, and raise error if it fails
-        try:
-            if not is_array_of_strings(ast.literal_eval(gen_tech_tools)):
-                raise ValueError(
-                    "Error: _extract_tech_tools output is not array of strings"
-                    f"Output: {gen_tech_tools}"
-                )
-            self.gen_tech_tools = ast.literal_eval(gen_tech_tools)
-        except Exception as e:
-            raise ValueError(
-                "Error: _extract_tech_tools output not valid json object" +
-                f"Error: {e} " +
-                f"Output: {gen_tech_tools}"
-            )
-
-
-    def _extract_soft_skills(self):
+    def _soft_skills_prompt(self):
         """
-        Extract the soft skills required within this job description
-        :write: self.gen_soft_skills
+        Build the prompt to extract the soft skills required within this job description
+        :return: formatted prompt
         """
         log("extracting soft skills")
 
@@ -208,36 +382,38 @@ class GeneratedResume:
         if self.job_description['role_description'] is None or self.job_description['role_description'] == "":
             raise ValueError("Error: role_description is not populated")
 
-        prompt =self.model_config['soft_skills_extraction_prompt']
         prompt_inputs = {
             "role_description": self.job_description['role_description'],
             "json_form_clause":self.model_config['json_form_clause']
         }
-        prompt = prompt.format_map(prompt_inputs)
+        return self._format_prompt('soft_skills_extraction_prompt', prompt_inputs)
 
-        gen_soft_skills = complete_single_content(prompt)
 
-        # convert the query result to an object, and raise error if it fails
-        try:
-            if not is_array_of_strings(ast.literal_eval(gen_soft_skills)):
-                raise ValueError(
-                    "Error: _extract_soft_skills output is not array of strings"
-                    f"Output: {gen_soft_skills}"
-                )
-            self.gen_soft_skills = ast.literal_eval(gen_soft_skills)
-        except Exception as e:
-            raise ValueError(
-                "Error: _extract_soft_skills output is not valid json object" +
-                f"Error: {e} " +
-                f"Output: {gen_soft_skills}"
-            )
+    def _skills_prompt(self):
+        """
+        Build the prompt to extract the technical skills, technical tools and soft
+        skills required within this job description in a single chat completion
+        :return: formatted prompt
+        """
+        log("extracting tech skills, tech tools, and soft skills")
+
+        # determine if role_description is populated
+        if self.job_description['role_description'] is None or self.job_description['role_description'] == "":
+            raise ValueError("Error: role_description is not populated")
+
+        prompt_inputs = {
+            "role_description": self.job_description['role_description'],
+            "key_skills": self.job_description['key_skills'],
+            "json_form_clause":self.model_config['json_form_clause']
+        }
+        return self._format_prompt('skills_extraction_prompt', prompt_inputs)
 
 
-    def _select_all_relevant_experience(self, i):
+    def _select_all_relevant_experience_prompt(self, i):
         """
-        Select all relevant experiences from the professional experience input
+        Build the prompt to select all relevant experiences from the professional experience input
         :param i: index of the professional experience input
-        :write: self.professional_experience_liminal[i]['all_relevant_experience']
+        :return: formatted prompt
         """
         log(f"selecting all relevant experience for employer {i}")
 
@@ -251,40 +427,18 @@ class GeneratedResume:
         if self.gen_soft_skills is None or self.gen_soft_skills == "":
             raise ValueError("Error: soft skills not populated")
 
-        prompt =self.model_config['select_all_experience_prompt']
-        prompt_inputs = {
-            "experience": self.professional_experience_input[i]['experience'],
-            "skills": self.gen_tech_skills + self.gen_tech_tools + self.gen_soft_skills,
-            "experience_count": self.model_config['experience_count'][i],
-            "json_form_clause":self.model_config['json_form_clause']
-        }
-        prompt = prompt.format_map(prompt_inputs)
-
-        # run query
-        all_relevant_experience = complete_single_content(prompt)
-
-        # convert the query to an object, and raise error if it fails
-        try:
-            if not is_array_of_objects(ast.literal_eval(all_relevant_experience)):
-                raise ValueError(
-                    "Error: _select_all_relevant_experience output is not array of objects"
-                    f"Output: {all_relevant_experience}"
-                )
-            self.professional_experience_liminal[i]['all_relevant_experience'] = \
-                ast.literal_eval(all_relevant_experience)
-        except Exception as e:
-            raise ValueError(
-                "Error: _select_all_relevant_experiences output is not valid json object" +
-                f"Error: {e} " +
-                f"Output: {all_relevant_experience}"
-            )
+        return self._experience_selection_prompt(
+            i,
+            'select_all_experience_prompt',
+            'select_candidate_experience_prompt'
+        )
 
 
-    def _select_most_relevant_experience(self, i):
+    def _select_most_relevant_experience_prompt(self, i):
         """
-        Select the most relevant experiences from the professional experience input
+        Build the prompt to select the most relevant experiences from the professional experience input
         :param i: index of the professional experience input
-        :write: self.professional_experience_liminal[i]['most_relevant_experience']
+        :return: formatted prompt
         """
         log(f"selecting most relevant experience for employer {i}")
 
@@ -292,40 +446,18 @@ class GeneratedResume:
         if self.professional_experience_liminal[i]['all_relevant_experience'] is None or self.professional_experience_liminal[i]['all_relevant_experience'] == "":
             raise ValueError("Error: all_relevant_experience not populated")
 
-        prompt =self.model_config['select_most_relevant_experience_prompt']
-        prompt_inputs = {
-            "experience": self.professional_experience_input[i]['experience'],
-            "skills": self.gen_tech_skills + self.gen_tech_tools + self.gen_soft_skills,
-            "experience_count": self.model_config['experience_count'][i],
-            "json_form_clause":self.model_config['json_form_clause']
-        }
-        prompt = prompt.format_map(prompt_inputs)
-
-        # execute query
-        most_relevant_experience = complete_single_content(prompt)
-
-        # convert the query to an object, and raise error if it fails
-        try:
-            if not is_array_of_objects(ast.literal_eval(most_relevant_experience)):
-                raise ValueError(
-                    "Error: _select_most_relevant_experience output is not array of objects"
-                    f"Output: {most_relevant_experience}"
-                )
-            self.professional_experience_liminal[i][
-               'most_relevant_experience'] = \
-               ast.literal_eval(most_relevant_experience)
-        except Exception as e:
-            raise ValueError(
-               "Error: _select_most_relevant_experience output not valid json object" +
-               f"Error: {e} " +
-               f"Output: {most_relevant_experience}"
-            )
+        return self._experience_selection_prompt(
+            i,
+            'select_most_relevant_experience_prompt',
+            'select_most_relevant_candidate_experience_prompt'
+        )
 
 
-    def _verify_experience(self, i):
+    def _verify_experience_prompt(self, i):
         """
-        Verify that the experience is contained with the original resume.json file
-        :return:
+        Build the prompt to verify that the experience is contained with the original resume.json file
+        :param i: index of the professional experience input
+        :return: formatted prompt
         """
         log(f"verifying experience for employer {i}")
 
@@ -334,7 +466,6 @@ class GeneratedResume:
             self.professional_experience_liminal[i]['most_relevant_experience'] == "":
             raise ValueError("Error: most_relevant_experience not populated")
 
-        prompt =self.model_config['verify_experience_prompt']
         prompt_inputs = {
             "original_experience": self.professional_experience_input[i]['experience'],
             "extracted_experience": self.professional_experience_liminal[i]['most_relevant_experience'],
@@ -342,30 +473,14 @@ class GeneratedResume:
             "experience_count": self.model_config['experience_count'][i],
             "json_form_clause":self.model_config['json_form_clause']
         }
-        prompt = prompt.format_map(prompt_inputs)
-
-        # execute query
-        verified_experience = complete_single_content(prompt)
-
-        # convert the query to an object, and raise error if it fails
-        try:
-            if not is_array_of_objects(ast.literal_eval(verified_experience)):
-                raise ValueError(
-                    "Error: _verify_experience output is not an array of objects"
-                    f"Output: {verified_experience}"
-                )
-            self.professional_experience_liminal[i][
-               'verified_experience'] = \
-               ast.literal_eval(verified_experience)
-        except Exception as e:
-            raise ValueError(
-               "Error: _verify_experience output is a valid JSON object" +
-               f"Error: {e} " +
-               f"Output: {verified_experience}"
-            )
+        return self._format_prompt('verify_experience_prompt', prompt_inputs)
 
 
-    def _extract_hard_skills(self):
+    def _hard_skills_prompt(self):
+        """
+        Build the prompt to extract the hard skills from all verified experience
+        :return: formatted prompt
+        """
         # ensure the exists of all required data points
         log("extracting hard skills")
 
@@ -384,32 +499,19 @@ class GeneratedResume:
             all_experience += self.professional_experience_liminal[i][
                                             'verified_experience']
 
-        prompt =self.model_config['extract_hard_skills_prompt']
         prompt_inputs = {
             "experience": all_experience,
             "skills": self.gen_tech_skills + self.gen_tech_tools,
         }
-        prompt = prompt.format_map(prompt_inputs)
-
-        hard_skills = complete_single_content(prompt)
-
-        try:
-            if not is_object(ast.literal_eval(hard_skills)):
-                raise ValueError(
-                    "Error: _extract_hard_skills output not an object" +
-                    f"Output: {hard_skills}"
-                )
-            hard_skills = ast.literal_eval(hard_skills)
-            self.hard_skills.update(hard_skills)
-        except Exception as e:
-            raise ValueError(
-                "Error: _extract_hard_skills output not valid json object" +
-                f"Error: {e} " +
-                f"Output: {hard_skills}"
-            )
+        return self._format_prompt('extract_hard_skills_prompt', prompt_inputs)
 
 
-    def _format_experience(self, i):
+    def _format_experience_prompt(self, i):
+        """
+        Build the prompt to format the verified experience into resume bullets
+        :param i: index of the professional experience input
+        :return: formatted prompt
+        """
         log(f"formatting experience for employer {i}")
 
         # ensure the exists of all required data points
@@ -421,182 +523,596 @@ class GeneratedResume:
             raise ValueError(
                 "Error: verified_experience not populated")
 
-        prompt =self.model_config['format_experience_prompt']
         prompt_inputs = {
             "experience": self.professional_experience_liminal[i]['verified_experience'],
             "skills": self.gen_tech_skills + self.gen_tech_tools + self.gen_soft_skills
         }
-        prompt = prompt.format_map(prompt_inputs)
+        return self._format_prompt('format_experience_prompt', prompt_inputs)
+
+
+    def _role_title_prompt(self, i):
+        """
+        Build the prompt to generate the title of the role
+        :param i: index of the professional experience input
+        :return: formatted prompt
+        """
+        log(f"generating role title for employer {i}")
+
+        prompt_inputs = {
+            "experience": self.professional_experience_liminal[i]['formatted_experience']
+        }
+        return self._format_prompt('generate_role_title_prompt', prompt_inputs)
 
-        # execute query
-        formatted_experience = complete_single_content(prompt)
+# ------------------------------------------------------------------------------
+# helper functions that parse and store each chat completion output
+# ------------------------------------------------------------------------------
 
-        # convert the query to an object, and raise error if it fails
+    def _parse_output(self, task_name, output):
+        """
+        Parse a chat completion output and check it against the output schema of
+        its chat completion
+        :param task_name: name of the chat completion, a key of OUTPUT_SCHEMAS
+        :param output: chat completion output
+        :return: parsed output
+        :raise ValueError: if the output holds no parsable value, or the value does
+            not match the schema
+        """
+        is_valid, description = self.OUTPUT_SCHEMAS[task_name]
         try:
-            if not is_array_of_strings(ast.literal_eval(formatted_experience)):
-                raise ValueError(
-                    "Error: _format_experience output is not an array of strings" +
-                    f"Output: {formatted_experience}"
-                )
-            self.professional_experience_liminal[i]['formatted_experience'] = \
-                ast.literal_eval(formatted_experience)
-        except Exception as e:
+            value = parse_model_output(output)
+        except ValueError as e:
             raise ValueError(
-                "Error: _format_experience output is not a valid json object" +
+                f"Error: {task_name} output is not valid json. " +
                 f"Error: {e} " +
-                f"Output: {formatted_experience}"
+                f"Output: {output}"
+            ) from e
+        if not is_valid(value):
+            raise ValueError(
+                f"Error: {task_name} output is not {description}. " +
+                f"Output: {output}"
             )
+        return value
 
 
-    def _generate_role_title(self, i):
+    def _store_tech_skills(self, gen_tech_skills):
         """
-		calls the OpenAI chat completion API and returns the title of the role
-		:write: self.professional_experience_liminal[i]['role_title']
-		"""
-        log(f"generating role title for employer {i}")
+        :param gen_tech_skills: chat completion output
+        :write: self.gen_tech_skills
+        """
+        self.gen_tech_skills = self._parse_output('extract_tech_skills', gen_tech_skills)
 
-        prompt =self.model_config['generate_role_title_prompt']
-        prompt_inputs = {
-            "experience": self.professional_experience_liminal[i]['formatted_experience']
-        }
-        prompt = prompt.format_map(prompt_inputs)
 
-        role_title = complete_single_content(prompt)
+    def _store_tech_tools(self, gen_tech_tools):
+        """
+        :param gen_tech_tools: chat completion output
+        :write: self.gen_tech_tools
+        """
+        self.gen_tech_tools = self._parse_output('extract_tech_tools', gen_tech_tools)
+
 
-        self.professional_experience_liminal[i]["role_title"] = role_title
+    def _store_soft_skills(self, gen_soft_skills):
+        """
+        :param gen_soft_skills: chat completion output
+        :write: self.gen_soft_skills
+        """
+        self.gen_soft_skills = self._parse_output('extract_soft_skills', gen_soft_skills)
+
+
+    def _store_skills(self, gen_skills):
+        """
+        :param gen_skills: chat completion output
+        :write: self.gen_tech_skills, self.gen_tech_tools, self.gen_soft_skills
+        """
+        skills = self._parse_output('extract_skills', gen_skills)
+        self.gen_tech_skills = skills['tech_skills']
+        self.gen_tech_tools = skills['tech_tools']
+        self.gen_soft_skills = skills['soft_skills']
+
+
+    def _store_all_relevant_experience(self, i, all_relevant_experience):
+        """
+        :param i: index of the professional experience input
+        :param all_relevant_experience: chat completion output
+        :write: self.professional_experience_liminal[i]['all_relevant_experience']
+        """
+        self.professional_experience_liminal[i]['all_relevant_experience'] = \
+            self._parse_output('select_all_relevant_experience', all_relevant_experience)
 
 
+    def _store_most_relevant_experience(self, i, most_relevant_experience):
+        """
+        :param i: index of the professional experience input
+        :param most_relevant_experience: chat completion output
+        :write: self.professional_experience_liminal[i]['most_relevant_experience']
+        """
+        self.professional_experience_liminal[i]['most_relevant_experience'] = \
+            self._parse_output('select_most_relevant_experience', most_relevant_experience)
+
+
+    def _store_verified_experience(self, i, verified_experience):
+        """
+        :param i: index of the professional experience input
+        :param verified_experience: chat completion output
+        :write: self.professional_experience_liminal[i]['verified_experience']
+        """
+        self.professional_experience_liminal[i]['verified_experience'] = \
+            self._parse_output('verify_experience', verified_experience)
+
+
+    def _store_hard_skills(self, hard_skills):
+        """
+        :param hard_skills: chat completion output
+        :write: self.hard_skills
+        """
+        self.hard_skills.update(self._parse_output('extract_hard_skills', hard_skills))
+
+
+    def _store_formatted_experience(self, i, formatted_experience):
+        """
+        :param i: index of the professional experience input
+        :param formatted_experience: chat completion output
+        :write: self.professional_experience_liminal[i]['formatted_experience']
+        """
+        self.professional_experience_liminal[i]['formatted_experience'] = \
+            self._parse_output('format_experience', formatted_experience)
+
+
+    def _store_role_title(self, i, role_title):
+        """
+        :param i: index of the professional experience input
+        :param role_title: chat completion output
+        :write: self.professional_experience_liminal[i]['role_title']
+        """
+        self.professional_experience_liminal[i]["role_title"] = role_title
+
 # ------------------------------------------------------------------------------
-# sub-functions over the over-arching generate_resume function below
-#
-# these functions will generally be called together, but due to API consumption
-# need to be externally callable for testing
+# helper functions that specifically perform chat completions
 # ------------------------------------------------------------------------------
 
-    def generate_resume_content(self):
+    def _complete_locally(self, task_name, args):
         """
-         Generates a resume based on a job description and a list of experiences
-         :return:
-         """
-        log("generating resume content")
+        Complete a task without a chat completion when a local check can settle
+        it: per-employer tasks whose employer is unchanged since the previous
+        run reuse that run's output, and the experience verification only needs
+        the LLM when a selected entry does not match the resume input
+        :param task_name: name of the chat completion
+        :param args: employer index for per-employer stages
+        :return: True if the task was completed locally
+        """
+        if self._reuse_employer_output(task_name, args):
+            return True
+
+        verifier_config = self.model_config['local_experience_verifier']
+        if task_name != 'verify_experience' or not verifier_config['enabled']:
+            return False
+
+        i, = args
+        verified_experience = verify_experience_locally(
+            self.professional_experience_liminal[i]['most_relevant_experience'],
+            self.professional_experience_input[i]['experience'],
+            self.model_config['experience_count'][i],
+            verifier_config['min_similarity']
+        )
+        if verified_experience is None:
+            log(f"local verification did not match all experience for employer {i}; using the LLM verifier")
+            return False
 
-        # extract key skills required for the role
-        with ThreadPoolExecutor() as executor:
-            futures = [
-                executor.submit(self._extract_tech_skills),
-                executor.submit(self._extract_tech_tools),
-                executor.submit(self._extract_soft_skills)
-            ]
-            # Wait for all to complete
-            for future in futures:
-                future.result()
-
-        # select all relevant experiences based on key skills
-        with ThreadPoolExecutor() as executor:
-            indices = range(self.professional_experience_count)
-            futures = {
-                executor.submit(self._select_all_relevant_experience, i)
-                for i in indices
-            }
+        log(f"experience for employer {i} verified locally")
+        self.professional_experience_liminal[i]['verified_experience'] = verified_experience
+        return True
+
+
+    def _employer_fingerprint(self, i):
+        """
+        Fingerprint everything an employer's chain of chat completions reads: the
+        employer's input, the extracted skills, and the prompt templates and
+        settings of the chain; computed once the skills are extracted
+        :param i: index of the professional experience input
+        :return: hex digest
+        """
+        if i not in self.employer_fingerprints:
+            candidate_count = self.model_config['candidate_count']
+            self.employer_fingerprints[i] = fingerprint(
+                self.professional_experience_input[i],
+                self.gen_tech_skills,
+                self.gen_tech_tools,
+                self.gen_soft_skills,
+                {key: self.model_config[key] for key in self.EMPLOYER_PROMPT_KEYS},
+                self.model_config['experience_count'][i],
+                candidate_count[i] if candidate_count is not None else None,
+                self.role_title_overrides[i]
+            )
+        return self.employer_fingerprints[i]
 
-            wait(futures, return_when=ALL_COMPLETED)
 
-            for future in futures:
-                future.result()
+    def _reuse_employer_output(self, task_name, args):
+        """
+        Reuse the output of a per-employer chat completion from the previous run
+        when the employer's fingerprint is unchanged
+        :param task_name: name of the chat completion
+        :param args: employer index for per-employer stages
+        :return: True if the output was reused
+        """
+        output_key = self.EMPLOYER_TASK_OUTPUTS.get(task_name)
+        if output_key is None or not self.previous_employer_outputs:
+            return False
 
-        # select the most relevant experiences based off of the key skills
-        with ThreadPoolExecutor() as executor:
-            indices = range(self.professional_experience_count)
-            futures = {
-                executor.submit(self._select_most_relevant_experience, i)
-                for i in indices
+        i, = args
+        previous = self.previous_employer_outputs.get(self._employer_fingerprint(i))
+        if previous is None or output_key not in previous:
+            return False
+
+        if task_name == 'select_all_relevant_experience':
+            log(f"employer {i} is unchanged since the previous run; reusing its outputs")
+        self.professional_experience_liminal[i][output_key] = copy.deepcopy(previous[output_key])
+        return True
+
+
+    def _load_previous_employer_outputs(self):
+        """
+        Load the employer outputs of the previous run for this job description,
+        unless incremental regeneration is disabled or the response cache is
+        bypassed
+        :write: self.previous_employer_outputs
+        """
+        if not self.model_config['incremental_regeneration'] or response_cache.bypass:
+            return
+        self.previous_employer_outputs = self.employer_outputs.load()
+        if self.previous_employer_outputs:
+            log(f"loaded outputs of {len(self.previous_employer_outputs)} employers "
+                f"from the previous run of this job description")
+
+
+    def _save_employer_outputs(self):
+        """
+        Store the outputs of every employer's chain of the completed run
+        """
+        if not self.model_config['incremental_regeneration']:
+            return
+        self.employer_outputs.save({
+            self._employer_fingerprint(i): {
+                key: self.professional_experience_liminal[i][key]
+                for key in self.EMPLOYER_TASK_OUTPUTS.values()
+                if key in self.professional_experience_liminal[i]
             }
+            for i in range(self.professional_experience_count)
+        })
+
+
+    def _corrective_prompt(self, task_name, prompt, output, error):
+        """
+        Build the single corrective re-ask of a chat completion whose output could
+        not be parsed or did not match its schema
+        :param task_name: name of the chat completion
+        :param prompt: original prompt string or content blocks
+        :param output: rejected chat completion output
+        :param error: error raised by the output store
+        :return: prompt string or content blocks, or None if corrective re-asks
+            are disabled or the chat completion has no output schema
+        """
+        if not self.model_config['corrective_reask'] or task_name not in self.OUTPUT_SCHEMAS:
+            return None
+        log(f"{task_name} output rejected, asking once more for a correction: {str(error)[:200]}")
+        correction = self.model_config['corrective_reask_prompt'].format(
+            description=self.OUTPUT_SCHEMAS[task_name][1],
+            output=output
+        )
+        if isinstance(prompt, list):
+            return prompt + [{"type": "text", "text": correction}]
+        return prompt + "\n" + correction
+
+
+    def _raised_max_tokens(self, task_name, error):
+        """
+        Double the max_tokens budget of a chat completion whose response was
+        truncated, up to max_tokens_ceiling in the model config
+        :param task_name: name of the chat completion
+        :param error: TruncatedCompletionError of the truncated response
+        :return: raised max tokens
+        :raise TruncatedCompletionError: if the budget is already at the ceiling
+        """
+        ceiling = self.model_config['max_tokens_ceiling']
+        if error.max_tokens >= ceiling:
+            raise TruncatedCompletionError(
+                f"Error: {task_name} response truncated at max_tokens={error.max_tokens}, "
+                f"the max_tokens_ceiling; raise stage_max_tokens or max_tokens_ceiling",
+                error.max_tokens
+            ) from error
+        max_tokens = min(2 * error.max_tokens, ceiling)
+        log(f"{task_name} response truncated at max_tokens={error.max_tokens}, asking again with {max_tokens}")
+        return max_tokens
+
+
+    def _complete(self, prompt, task_name, employer_index, max_tokens):
+        """
+        Request a chat completion, raising its max_tokens budget while the
+        response is truncated
+        :param prompt: prompt string or content blocks
+        :param task_name: name of the chat completion
+        :param employer_index: employer index of per-employer stages, or None
+        :param max_tokens: max tokens of the first request
+        :return: tuple of the chat completion output and the max tokens of the
+            request that returned it
+        """
+        while True:
+            try:
+                output = complete_single_content(prompt, max_tokens=max_tokens, stage=task_name, employer_index=employer_index)
+                return output, max_tokens
+            except TruncatedCompletionError as e:
+                max_tokens = self._raised_max_tokens(task_name, e)
+
+
+    async def _async_complete(self, prompt, task_name, employer_index, max_tokens):
+        """
+        Async counterpart of _complete
+        :param prompt: prompt string or content blocks
+        :param task_name: name of the chat completion
+        :param employer_index: employer index of per-employer stages, or None
+        :param max_tokens: max tokens of the first request
+        :return: tuple of the chat completion output and the max tokens of the
+            request that returned it
+        """
+        while True:
+            try:
+                output = await async_complete_single_content(prompt, max_tokens=max_tokens, stage=task_name, employer_index=employer_index)
+                return output, max_tokens
+            except TruncatedCompletionError as e:
+                max_tokens = self._raised_max_tokens(task_name, e)
+
+
+    def _complete_stage(self, task_name, build_prompt, store_output, *args):
+        """
+        Run a single chat completion on the calling thread
+        :param task_name: name of the chat completion, recorded in the telemetry
+        :param build_prompt: prompt builder method of the stage
+        :param store_output: output store method of the stage
+        :param args: employer index for per-employer stages
+        """
+        with self._state_lock:
+            completed_locally = self._complete_locally(task_name, args)
+        if completed_locally:
+            self._checkpoint_task(task_name, args)
+            return
+        prompt = build_prompt(*args)
+        employer_index = args[0] if args else None
+        output, max_tokens = self._complete(prompt, task_name, employer_index, planned_max_tokens(task_name))
+        try:
+            with self._state_lock:
+                store_output(*args, output)
+        except ValueError as e:
+            # a rejected output is not replayed from the response cache by reruns
+            forget_response(prompt, max_tokens, stage=task_name)
+            corrective_prompt = self._corrective_prompt(task_name, prompt, output, e)
+            if corrective_prompt is None:
+                raise
+            output, max_tokens = self._complete(corrective_prompt, task_name, employer_index, max_tokens)
+            try:
+                with self._state_lock:
+                    store_output(*args, output)
+            except ValueError:
+                forget_response(corrective_prompt, max_tokens, stage=task_name)
+                raise
+        self._checkpoint_task(task_name, args)
+
+
+    async def _async_complete_stage(self, task_name, build_prompt, store_output, *args):
+        """
+        Run a single chat completion on the event loop
+        :param task_name: name of the chat completion, recorded in the telemetry
+        :param build_prompt: prompt builder method of the stage
+        :param store_output: output store method of the stage
+        :param args: employer index for per-employer stages
+        """
+        if self._complete_locally(task_name, args):
+            await self._async_checkpoint_task(task_name, args)
+            return
+        prompt = build_prompt(*args)
+        employer_index = args[0] if args else None
+        output, max_tokens = await self._async_complete(prompt, task_name, employer_index, planned_max_tokens(task_name))
+        try:
+            store_output(*args, output)
+        except ValueError as e:
+            # a rejected output is not replayed from the response cache by reruns
+            await asyncio.to_thread(forget_response, prompt, max_tokens, stage=task_name)
+            corrective_prompt = self._corrective_prompt(task_name, prompt, output, e)
+            if corrective_prompt is None:
+                raise
+            output, max_tokens = await self._async_complete(corrective_prompt, task_name, employer_index, max_tokens)
+            try:
+                store_output(*args, output)
+            except ValueError:
+                await asyncio.to_thread(forget_response, corrective_prompt, max_tokens, stage=task_name)
+                raise
+        await self._async_checkpoint_task(task_name, args)
 
-            wait(futures, return_when=ALL_COMPLETED)
-
-            for future in futures:
-                future.result()
-
-        # verify experience against ingested data source
-        verify_futures = {}
-
-        with ThreadPoolExecutor() as executor:
-            # First, create all the futures explicitly with a loop
-            for i in range(self.professional_experience_count):
-                future = executor.submit(self._verify_experience, i)
-                verify_futures[i] = future
-
-            # Now wait for all futures to complete
-            wait(verify_futures.values(), return_when=ALL_COMPLETED)
-
-            # Check results one by one
-            for i, future in verify_futures.items():
-                try:
-                    future.result()
-                except Exception as e:
-                    log(f"Error in verification step for employer {i}: {e}")
-                    raise
-
-        log("Verification process complete")
-
-        # with ThreadPoolExecutor() as executor:
-        #     indices = range(self.professional_experience_count)
-        #     verify_futures = {
-        #         i: executor.submit(self._verify_experience, i)
-        #         for i in indices
-        #     }
-        #
-        #     # Wait for all verifications to complete
-        #     wait(verify_futures.values(), return_when=ALL_COMPLETED)
-        #
-        #     # Check for any exceptions
-        #     for i, future in verify_futures.items():
-        #         try:
-        #             future.result()
-        #         except Exception as e:
-        #             log(f"Error in verification step for employer {i}: {e}")
-        #             raise
-
-        # extract hard skills and format experiences
-        success = True  # Track if all operations completed successfully
-
-        with ThreadPoolExecutor() as executor:
-            format_futures = {
-                executor.submit(self._format_experience, i)
+# ------------------------------------------------------------------------------
+# helper functions shared by the threaded and asyncio pipelines
+# ------------------------------------------------------------------------------
+
+    def _stage_tasks(self, stage):
+        """
+        List the chat completions that make up a pipeline stage; prompts are only
+        built when the stage starts, since each stage reads the previous stage's
+        outputs
+        :param stage: name of a stage in PIPELINE_STAGES
+        :return: list of (task_name, build_prompt, store_output, args) tuples
+        """
+        indices = range(self.professional_experience_count)
+
+        if stage == 'extract_skills' and self.model_config['fused_skill_extraction']:
+            return [('extract_skills', self._skills_prompt, self._store_skills, ())]
+        if stage == 'extract_skills':
+            return [
+                ('extract_tech_skills', self._tech_skills_prompt, self._store_tech_skills, ()),
+                ('extract_tech_tools', self._tech_tools_prompt, self._store_tech_tools, ()),
+                ('extract_soft_skills', self._soft_skills_prompt, self._store_soft_skills, ())
+            ]
+        if stage == 'select_all_relevant_experience':
+            return [
+                ('select_all_relevant_experience', self._select_all_relevant_experience_prompt, self._store_all_relevant_experience, (i,))
                 for i in indices
-            }
-            hard_skills_future = executor.submit(self._extract_hard_skills)
-
-            wait([*format_futures, hard_skills_future],
-                 return_when=ALL_COMPLETED)
-
-            # Check results
-            for future in [*format_futures, hard_skills_future]:
-                try:
-                    future.result()
-                except Exception as e:
-                    log(f"Error in formatting/hard skills extraction: {e}")
-                    success = False
-
-        if not success:
-            raise RuntimeError(
-                "Failed to complete formatting and hard skills extraction")
-
-        # assign role titles for all employers
-        with ThreadPoolExecutor() as executor:
-            futures = []
-            for i in range(len(self.professional_experience_liminal)):
-                if self.role_title_overrides[i] is not None:
-                    self.professional_experience_liminal[i]['role_title'] = \
-                    self.role_title_overrides[i]
-                else:
-                    futures.append(
-                        executor.submit(self._generate_role_title, i))
-
-            wait(futures, return_when=ALL_COMPLETED)
-            for future in futures:
-                future.result()
+            ]
+        if stage == 'select_most_relevant_experience':
+            return [
+                ('select_most_relevant_experience', self._select_most_relevant_experience_prompt, self._store_most_relevant_experience, (i,))
+                for i in indices
+            ]
+        if stage == 'verify_experience':
+            return [
+                ('verify_experience', self._verify_experience_prompt, self._store_verified_experience, (i,))
+                for i in indices
+            ]
+        if stage == 'format_experience_and_hard_skills':
+            return [
+                ('format_experience', self._format_experience_prompt, self._store_formatted_experience, (i,))
+                for i in indices
+            ] + [('extract_hard_skills', self._hard_skills_prompt, self._store_hard_skills, ())]
+        if stage == 'generate_role_titles':
+            return [
+                ('generate_role_title', self._role_title_prompt, self._store_role_title, (i,))
+                for i in self._apply_role_title_overrides()
+            ]
+        raise ValueError(f"Error: unknown pipeline stage {stage}")
+
+
+    def _task_dependencies(self, task_name, args):
+        """
+        List the chat completions whose outputs a chat completion reads
+        :param task_name: name of the chat completion
+        :param args: employer index for per-employer stages
+        :return: list of task keys, each a tuple of a task name and its args
+        """
+        if task_name in ('extract_skills', 'extract_tech_skills', 'extract_tech_tools', 'extract_soft_skills'):
+            return []
+        if task_name == 'select_all_relevant_experience':
+            return [(skill_task,) for skill_task, _, _, _ in self._stage_tasks('extract_skills')]
+        if task_name == 'select_most_relevant_experience':
+            return [('select_all_relevant_experience', *args)]
+        if task_name == 'verify_experience':
+            return [('select_most_relevant_experience', *args)]
+        if task_name == 'format_experience':
+            return [('verify_experience', *args)]
+        if task_name == 'extract_hard_skills':
+            return [('verify_experience', i) for i in range(self.professional_experience_count)]
+        if task_name == 'generate_role_title':
+            return [('format_experience', *args)]
+        raise ValueError(f"Error: unknown chat completion {task_name}")
+
+
+    def _task_graph(self, make_task):
+        """
+        Build the dependency graph of every chat completion in the pipeline
+        :param make_task: function receiving (task_name, build_prompt,
+            store_output, args) and returning the callable that runs the task
+        :return: TaskGraph
+        """
+        graph = TaskGraph()
+        for stage in self.PIPELINE_STAGES:
+            for task_name, build_prompt, store_output, args in self._stage_tasks(stage):
+                graph.add(
+                    (task_name, *args),
+                    make_task(task_name, build_prompt, store_output, args),
+                    depends_on=self._task_dependencies(task_name, args),
+                    completed=task_label((task_name, *args)) in self.completed_tasks
+                )
+        return graph
+
+
+    def _checkpoint_task(self, task_name, args):
+        """
+        Record a completed chat completion and checkpoint the intermediate state
+        :param task_name: name of the chat completion
+        :param args: employer index for per-employer stages
+        """
+        # written under the lock, so that concurrent tasks neither change the
+        # state mid-write nor overwrite a newer checkpoint with an older one
+        with self._state_lock:
+            self.completed_tasks.add(task_label((task_name, *args)))
+            self.checkpoint.save(self.completed_tasks, self._checkpoint_state())
+
+
+    async def _async_checkpoint_task(self, task_name, args):
+        """
+        Async counterpart of _checkpoint_task; the state is copied on the event
+        loop and written from a worker thread, so that the checkpoint write does
+        not block the loop
+        :param task_name: name of the chat completion
+        :param args: employer index for per-employer stages
+        """
+        self.completed_tasks.add(task_label((task_name, *args)))
+        # copied once the earlier writes are done, so that checkpoints are
+        # written in completion order
+        async with self._async_checkpoint_lock:
+            completed_tasks = set(self.completed_tasks)
+            state = copy.deepcopy(self._checkpoint_state())
+            await asyncio.to_thread(self.checkpoint.save, completed_tasks, state)
+
+
+    def _checkpoint_state(self):
+        """
+        :return: the intermediate state written to checkpoints
+        """
+        return {
+            'gen_tech_skills': self.gen_tech_skills,
+            'gen_tech_tools': self.gen_tech_tools,
+            'gen_soft_skills': self.gen_soft_skills,
+            'hard_skills': self.hard_skills,
+            'professional_experience_liminal': self.professional_experience_liminal,
+        }
+
+
+    def _restore_checkpoint(self):
+        """
+        Restore the intermediate state of an earlier run with the same inputs
+        when resume_run is set
+        :write: self.completed_tasks and the state written by the completed tasks
+        """
+        if not self.resume_run:
+            return
+        checkpoint = self.checkpoint.load()
+        if checkpoint is None:
+            log("no checkpoint found for these inputs; starting a new run")
+            return
+
+        completed_tasks, state = checkpoint
+        self.completed_tasks = set(completed_tasks)
+        self.gen_tech_skills = state['gen_tech_skills']
+        self.gen_tech_tools = state['gen_tech_tools']
+        self.gen_soft_skills = state['gen_soft_skills']
+        self.hard_skills = state['hard_skills']
+        self.professional_experience_liminal = state['professional_experience_liminal']
+        log(f"resuming run from checkpoint {self.checkpoint.path}: "
+            f"{len(self.completed_tasks)} chat completions already complete")
+
+
+    def log_saved_progress(self):
+        """
+        Tell the user how to continue a failed run from its checkpoint
+        """
+        if self.completed_tasks:
+            log(f"progress saved to {self.checkpoint.path}; rerun with --resume-run to continue")
+
 
+    def _apply_role_title_overrides(self):
+        """
+        Apply the role title overrides
+        :return: indices of the employers whose role title must be generated
+        """
+        indices = []
+        for i in range(len(self.professional_experience_liminal)):
+            if self.role_title_overrides[i] is not None:
+                self.professional_experience_liminal[i]['role_title'] = \
+                self.role_title_overrides[i]
+            else:
+                indices.append(i)
+        return indices
+
+
+    def _assemble_professional_experience_output(self):
+        """
+        Assemble the final professional experience output from the liminal data
+        :write: self.professional_experience_output
+        """
         # display role_title results to user
         string_output = "Generated role titles: \n"
 
@@ -617,65 +1133,189 @@ class GeneratedResume:
              self.professional_experience_output[i]['employment_end'] = self.professional_experience_input[i]['employment_end']
              self.professional_experience_output[i]['experience'] = self.professional_experience_liminal[i]['formatted_experience']
 
+        self._fit_to_page()
+
         # inform user run was successful
         log('professional_experience output stored in GeneratedResume.professional_experience_output')
 
 
-    def write_resume(self):
-        # use still working field to determine display of pe0 employment_end
-        log("writing resume")
+    def _fit_to_page(self):
+        """
+        Trim the lowest priority bullets, i.e. the last ones of an employer, until
+        each employer is within its character_count and the rendered resume is
+        estimated to fit in page_fit.max_pages; the trimming is local and
+        deterministic, so no chat completion is repeated to fit the page
+        :write: self.professional_experience_output
+        """
+        page_fit = self.model_config['page_fit']
+        if not page_fit['enabled']:
+            return
+        min_bullets = page_fit['min_bullets']
+        output = self.professional_experience_output
+        trimmed = []
+
+        def drop_last_bullet(i):
+            trimmed.append(output[i]['employer'] + ": " + output[i]['experience'][-1])
+            # a new list, since the bullets are shared with the liminal data
+            output[i]['experience'] = output[i]['experience'][:-1]
+
+        for i, character_count in enumerate(self.model_config['character_count'][:len(output)]):
+            while (
+                len(output[i]['experience']) > min_bullets and
+                sum(len(bullet) for bullet in output[i]['experience']) > character_count
+            ):
+                drop_last_bullet(i)
+
+        estimator = PageFitEstimator(self.doc_format)
+        document = self._build_resume_document()
+        text_width, page_height = estimator.text_area(document)
+        overflow = estimator.document_height(document) - page_fit['max_pages'] * page_height
+        bullet_counts = [len(employer['experience']) for employer in output]
+        while overflow > 0:
+            candidates = [i for i in range(len(output)) if len(output[i]['experience']) > min_bullets]
+            if not candidates:
+                log(f"resume is estimated to exceed {page_fit['max_pages']} page(s) "
+                    f"with {min_bullets} bullets per employer")
+                break
+            # trim the employer that keeps the largest share of its bullets;
+            # ties go to the older employer
+            i = max(candidates, key=lambda i: (len(output[i]['experience']) / bullet_counts[i], i))
+            overflow -= estimator.paragraph_height(output[i]['experience'][-1], text_width, 'List Bullet')
+            drop_last_bullet(i)
+
+        if trimmed:
+            log(f"trimmed {len(trimmed)} bullets to fit the page: \n" + "\n".join(trimmed))
+
+# ------------------------------------------------------------------------------
+# sub-functions over the over-arching generate_resume function below
+#
+# these functions will generally be called together, but due to API consumption
+# need to be externally callable for testing
+# ------------------------------------------------------------------------------
+
+    def generate_resume_content(self, max_workers=None):
+        """
+         Generates a resume based on a job description and a list of experiences;
+         each employer's chain of chat completions advances as soon as its own
+         inputs are ready, on a thread pool sized by max_concurrency
+         :param max_workers: size of the thread pool, when several resumes share
+             the max_concurrency budget
+         :return:
+         """
+        log("generating resume content")
+        graph = self.resume_task_graph()
+        with retry_policy.run():
+            try:
+                graph.run(max_workers=max_workers or self.model_config['max_concurrency'])
+            except RuntimeError:
+                self.log_saved_progress()
+                raise
+        self.finish_resume_content()
+
+
+    def resume_task_graph(self):
+        """
+        Restore the state of earlier runs and build the task graph of the resume
+        content for the threaded pipeline; callers may add tasks of their own
+        that depend on its tasks before running it, and must call
+        finish_resume_content once it completes
+        :return: TaskGraph
+        """
+        self._restore_checkpoint()
+        self._load_previous_employer_outputs()
+        return self._task_graph(
+            lambda task_name, build_prompt, store_output, args:
+                lambda: self._complete_stage(task_name, build_prompt, store_output, *args)
+        )
 
-        if self.doc_format['currently_employed']:
-            self.professional_experience_output[0]['employment_end'] = ""
-
-        # open and format doc
-        resume_doc = Document()
-
-        section = resume_doc.sections[0]
-        section.top_margin = Inches(1)
-        section.bottom_margin = Inches(1)
-        section.left_margin = Inches(1)
-        section.right_margin = Inches(1)
-
-        # set document styles
-        # header 1; will be used for "Professional Experience", "Education", etc.
-        h1_style = resume_doc.styles['Heading 1']
-        h1_font = h1_style.font
-        h1_font.name = self.doc_format['h1']['font_name']
-        h1_font.size = Pt(self.doc_format['h1']['font_size'])
-        h1_font.color.rgb = RGBColor(
-            self.doc_format['h1']['font_color'][0],
-            self.doc_format['h1']['font_color'][1],
-            self.doc_format['h1']['font_color'][2]
+
+    def finish_resume_content(self):
+        """
+        Store the outputs of a completed resume task graph and assemble the
+        professional experience output
+        :write: self.professional_experience_output
+        """
+        self.checkpoint.remove()
+        self._save_employer_outputs()
+        self._assemble_professional_experience_output()
+
+
+    def verified_experience_output(self):
+        """
+        Professional experience built from the verified experience, available as
+        soon as verification finishes, before the bullets are formatted and role
+        titles generated; role titles are only included when overridden
+        :return: list of dicts, one per employer
+        """
+        output = []
+        for i, experience_input in enumerate(self.professional_experience_input):
+            employer = {
+                'employer': experience_input['employer'],
+                'employment_start': experience_input['employment_start'],
+                'employment_end': experience_input['employment_end'],
+                'experience': self.professional_experience_liminal[i]['verified_experience'],
+            }
+            if self.role_title_overrides[i] is not None:
+                employer['role_title'] = self.role_title_overrides[i]
+            output.append(employer)
+        return output
+
+
+    async def async_generate_resume_content(self):
+        """
+        Generates a resume based on a job description and a list of experiences;
+        runs the same task graph as generate_resume_content, but drives every chat
+        completion from the running event loop instead of a thread pool; the
+        checkpoint, employer output and response cache files are read and
+        written from worker threads, so that their IO does not block the loop
+        :return:
+        """
+        log("generating resume content asynchronously")
+        await asyncio.to_thread(self._restore_checkpoint)
+        await asyncio.to_thread(self._load_previous_employer_outputs)
+        self._async_checkpoint_lock = asyncio.Lock()
+
+        graph = self._task_graph(
+            lambda task_name, build_prompt, store_output, args:
+                lambda: self._async_complete_stage(task_name, build_prompt, store_output, *args)
         )
-        h1_paragraph_format = h1_style.paragraph_format
-        h1_paragraph_format.line_spacing = self.doc_format['h1']['line_spacing']
-        h1_paragraph_format.space_before = Pt(0)
-        h1_paragraph_format.space_after = Pt(0)
-
-        ## normal text; will be used for all other text
-        normal_style = resume_doc.styles['Normal']
-        normal_font = normal_style.font
-        normal_font.name = self.doc_format['normal']['font_name']
-        normal_font.size = Pt(self.doc_format['normal']['font_size'])
-        normal_font.color.rgb = RGBColor(
-            self.doc_format['normal']['font_color'][0],
-            self.doc_format['normal']['font_color'][1],
-            self.doc_format['normal']['font_color'][2]
+        with retry_policy.run():
+            try:
+                await graph.async_run()
+            except RuntimeError:
+                self.log_saved_progress()
+                raise
+        await asyncio.to_thread(self.finish_resume_content)
+
+
+    def output_path(self, suffix):
+        """
+        path of a resume output file in the RESUME_OUTPUT_PATH directory
+        :param suffix: file name suffix, e.g. 'resume.docx'
+        :return: file path
+        """
+        file_name = re.sub(
+            r'\s+',
+            '',
+            f"{self.personal_info['first_name'].lower()}-"
+            f"{self.personal_info['last_name'].lower()}-"
+            f"{self.job_description['name_param']}-{suffix}"
         )
-        normal_paragraph_format = normal_style.paragraph_format
-        normal_paragraph_format.line_spacing = self.doc_format['normal']['line_spacing']
-        normal_paragraph_format.space_before = Pt(0)
-        normal_paragraph_format.space_after = Pt(0)
+        return os.path.join(self.env_vars['RESUME_OUTPUT_PATH'], file_name)
 
-        # sub_header formatting
-        sub_header_font_size = normal_font.size
-        sub_header_bold = True
+
+    def _build_resume_document(self):
+        """
+        build the resume document in memory
+        :return: docx Document
+        """
+        # clone the styled base document; margins and styles are applied once
+        # per doc_format version
+        resume_doc = base_document('resume', self.doc_format)
 
         # insert either header image or text based on param
         if self.doc_format['use_image_header']:
-            image_path = './data/assets/resume-header.png'
-            resume_doc.add_picture(image_path, width=Inches(6.5))
+            add_asset_picture(resume_doc.add_paragraph().add_run(), HEADER_IMAGE, width=Inches(6.5))
         elif not self.doc_format['use_image_header']:
              # Add heading and set alignment to center
             name_line = resume_doc.add_heading(
@@ -709,23 +1349,19 @@ class GeneratedResume:
 
         # write text from model
         for i in range(len(self.professional_experience_output)):
+            # use still working field to determine display of pe0 employment_end;
+            # the output itself is left unchanged so that rendering is repeatable
+            employment_end = self.professional_experience_output[i]['employment_end']
+            if i == 0 and self.doc_format['currently_employed']:
+                employment_end = ""
+
             table = resume_doc.add_table(rows=1, cols=2)
             table.columns[0].width = Inches(4.5)
             table.columns[1].width = Inches(2.0)
             hdr_cells = table.rows[0].cells
             hdr_cells[0].text = self.professional_experience_output[i]['role_title'] + ", " + self.professional_experience_output[i]['employer']
-            hdr_cells[1].text = self.professional_experience_output[i]['employment_start'] + "-" + self.professional_experience_output[i][
-                'employment_end']
-            left_paragraph = hdr_cells[0].paragraphs[0]
-            left_paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-            right_paragraph = hdr_cells[1].paragraphs[0]
-            right_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            for cell in hdr_cells:
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        run.font.bold = sub_header_bold
-                        run.font.size = sub_header_font_size
-                        run.font.name = 'Arial'
+            hdr_cells[1].text = self.professional_experience_output[i]['employment_start'] + "-" + employment_end
+            self._style_table_header(hdr_cells)
             for j in range(len(self.professional_experience_output[i]['experience'])):
                 resume_doc.add_paragraph(self.professional_experience_output[i]['experience'][j],
                                          style='List Bullet')
@@ -750,16 +1386,7 @@ class GeneratedResume:
             self.education['education_start'] + "-" +
             self.education['education_end']
         )
-        left_paragraph = hdr_cells[0].paragraphs[0]
-        left_paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        right_paragraph = hdr_cells[1].paragraphs[0]
-        right_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        for cell in hdr_cells:
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.font.bold = sub_header_bold
-                    run.font.size = sub_header_font_size
-                    run.font.name = 'Arial'
+        self._style_table_header(hdr_cells)
 
         ## add minor
         resume_doc.add_paragraph(
@@ -785,16 +1412,7 @@ class GeneratedResume:
             self.military_experience['service_start'] + "-" +
             self.military_experience['service_end']
         )
-        left_paragraph = hdr_cells[0].paragraphs[0]
-        left_paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        right_paragraph = hdr_cells[1].paragraphs[0]
-        right_paragraph.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        for cell in hdr_cells:
-            for paragraph in cell.paragraphs:
-                for run in paragraph.runs:
-                    run.font.bold = sub_header_bold
-                    run.font.size = sub_header_font_size
-                    run.font.name = self.doc_format['normal']['font_name']
+        self._style_table_header(hdr_cells)
 
         resume_doc.add_paragraph("")
 
@@ -808,19 +1426,31 @@ class GeneratedResume:
                 style='List Bullet'
             )
 
-        # build file output path and save doc
-        resume_output_path = (
-            f"""
-            {self.env_vars['COVER_LETTER_OUTPUT_PATH']}
-            {self.personal_info['first_name'].lower()}-
-            {self.personal_info['last_name'].lower()}- 
-            {self.job_description['name_param']}-resume.docx
-            """
-        )
-        resume_output_path = re.sub(r'\s+', '', resume_output_path)
-        resume_doc.save(resume_output_path)
+        return resume_doc
+
+
+    def render_resume_bytes(self):
+        """
+        render the resume without touching the file system, e.g. to upload it
+        :return: bytes of the .docx file
+        """
+        buffer = io.BytesIO()
+        self._build_resume_document().save(buffer)
+        return buffer.getvalue()
+
+
+    def write_resume(self):
+        """
+        render the resume and write it to the RESUME_OUTPUT_PATH directory; the
+            file appears complete or not at all
+        :return: path of the written file
+        """
+        log("writing resume")
+        resume_output_path = self.output_path('resume.docx')
+        write_atomically(resume_output_path, self.render_resume_bytes())
 
         log('generated resume successfully written to: "' + resume_output_path + '"')
+        return resume_output_path
 
 
     # def check_qualifications(self):
@@ -867,9 +1497,9 @@ class GeneratedResume:
 # primary function
 # ------------------------------------------------------------------------------
 
-    def generate_resume(self):
+    def generate_resume(self, max_workers=None):
         #self.check_qualifications()
-        self.generate_resume_content()
+        self.generate_resume_content(max_workers)
         self.write_resume()
 
 # ------------------------------------------------------------------------------
@@ -881,15 +1511,7 @@ class GeneratedResume:
         pickle the resume object for later use
         """
         log("pickling resume object")
-        resume_pickle_path = (
-            f"""
-            {self.env_vars['COVER_LETTER_OUTPUT_PATH']}
-            {self.personal_info['first_name'].lower()}-
-            {self.personal_info['last_name'].lower()}- 
-            {self.job_description['name_param']}-resume.pkl
-            """
-        )
-        resume_pickle_path = re.sub(r'\s+', '', resume_pickle_path)
+        resume_pickle_path = self.output_path('resume.pkl')
 
         with open(resume_pickle_path, 'wb') as output:
             # noinspection PyTypeChecker
@@ -0,0 +1,103 @@
+# internal imports
+from src.core.generated_cover_letter import GeneratedCoverLetter
+from src.core.generated_resume import GeneratedResume
+from src.utils.logger import log
+from src.utils.single_content_completion import retry_policy
+
+# ------------------------------------------------------------------------------
+# define primary class
+# ------------------------------------------------------------------------------
+
+class OrchestratedRun:
+    """
+    This class generates the resume and cover letter of a job as one task graph,
+    so that the cover letter overlaps the resume pipeline instead of following
+    it: the company info call starts with the first resume calls, the cover
+    letter body starts once every employer's experience is verified, and both
+    documents are rendered concurrently. The cover letter body is written from
+    the verified experience rather than the formatted bullets
+    :param job_description: job description dict
+    :param role_title_overrides: a list of role titles to override the ones
+        generated by the model
+    :param resume_run: if True, continue the resume from the checkpoint of an
+        earlier run with the same inputs
+    """
+    def __init__(
+        self,
+        job_description,
+        role_title_overrides=None,
+        resume_run=False
+    ):
+        log("initializing OrchestratedRun object")
+        self.generated_resume = GeneratedResume(
+            job_description=job_description,
+            role_title_overrides=role_title_overrides,
+            resume_run=resume_run
+        )
+        self.generated_cover_letter = GeneratedCoverLetter(
+            job_description=job_description,
+            personal_info=self.generated_resume.personal_info,
+            resume=None
+        )
+        log("OrchestratedRun object initialized")
+
+# ------------------------------------------------------------------------------
+# helper methods
+# ------------------------------------------------------------------------------
+
+    def _write_resume(self):
+        self.generated_resume.finish_resume_content()
+        self.generated_resume.write_resume()
+
+    def _generate_cover_letter_body(self):
+        self.generated_cover_letter.resume = self.generated_resume.verified_experience_output()
+        self.generated_cover_letter.generate_cover_letter_content()
+
+    def _task_graph(self):
+        """
+        extend the resume task graph with the cover letter and rendering tasks
+        :return: TaskGraph
+        """
+        resume = self.generated_resume
+        graph = resume.resume_task_graph()
+        resume_tasks = list(graph.tasks)
+        verify_tasks = [('verify_experience', i) for i in range(resume.professional_experience_count)]
+
+        graph.add(('company_info',), self.generated_cover_letter.fetch_company_info)
+        graph.add(
+            ('cover_letter_body',),
+            self._generate_cover_letter_body,
+            depends_on=[('company_info',)] + verify_tasks
+        )
+        graph.add(('write_resume',), self._write_resume, depends_on=resume_tasks)
+        graph.add(
+            ('write_cover_letter',),
+            self.generated_cover_letter.write_cover_letter,
+            depends_on=[('cover_letter_body',)]
+        )
+        return graph
+
+# ------------------------------------------------------------------------------
+# primary method
+# ------------------------------------------------------------------------------
+
+    def run(self, max_workers=None):
+        """
+        generate and write the resume and cover letter
+        :param max_workers: size of the thread pool, when several jobs share the
+            max_concurrency budget
+        :raise RuntimeError: if any task failed; the other document is still
+            written when its own tasks succeeded
+        """
+        log("generating resume and cover letter as one task graph")
+        graph = self._task_graph()
+        with retry_policy.run():
+            try:
+                graph.run(max_workers=max_workers or self.generated_resume.model_config['max_concurrency'])
+            except RuntimeError:
+                self.generated_resume.log_saved_progress()
+                raise
+
+# ------------------------------------------------------------------------------
+# end of orchestrated_run.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,135 @@
+# standard library imports
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import weakref
+
+# 3rd party imports
+import anthropic
+from dotenv import load_dotenv
+import httpx
+import yaml
+
+# custom/internal imports
+from src.utils.logger import log
+
+load_dotenv()
+
+with open('config/model_v1.3.6.yaml', 'r') as file:
+    model_config = yaml.safe_load(file)
+
+# ------------------------------------------------------------------------------
+# process-wide client
+#
+# a single client is shared by every thread in the process so that all API calls
+# reuse the same pool of keep-alive connections instead of opening a new pool,
+# and performing a new TLS handshake, for every call
+# ------------------------------------------------------------------------------
+
+_client = None
+_http_client = None
+_client_lock = threading.Lock()
+
+
+def _build_client():
+    """
+    build the Anthropic client with a connection pool sized to the pipeline's
+        concurrency
+    :return: anthropic.Anthropic client
+    """
+    global _http_client
+    pool_size = model_config['max_concurrency']
+    _http_client = anthropic.DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=model_config['client_pool']['keepalive_expiry']
+        )
+    )
+    log(f"Anthropic client created with a pool of {pool_size} connections")
+    # retries are handled by the retry policy of the completion functions
+    return anthropic.Anthropic(http_client=_http_client, max_retries=0)
+
+
+def get_client():
+    """
+    return the process-wide Anthropic client, creating it on first use
+    :return: anthropic.Anthropic client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _build_client()
+    return _client
+
+
+def prewarm_client(connections=None):
+    """
+    open keep-alive connections to the API ahead of the first completion call so
+        that the TLS handshakes are not paid for inside the pipeline
+    :param connections: number of connections to open; defaults to the
+        client_pool.prewarm_connections setting of the model config
+    :return: number of connections successfully opened
+    """
+    if connections is None:
+        connections = model_config['client_pool']['prewarm_connections']
+    if not connections:
+        return 0
+
+    client = get_client()
+    base_url = str(client.base_url)
+
+    def open_connection():
+        try:
+            # any response completes the handshake and leaves the connection in the pool
+            _http_client.head(base_url)
+            return True
+        except httpx.HTTPError as e:
+            log(f"connection pre-warming failed: {e}")
+            return False
+
+    # requests are issued concurrently so each one holds its own connection
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        opened = sum(executor.map(lambda _: open_connection(), range(connections)))
+
+    log(f"pre-warmed {opened} of {connections} API connections")
+    return opened
+
+# ------------------------------------------------------------------------------
+# event loop clients
+#
+# async clients hold connections bound to the event loop they were created on,
+# so one client is kept per running loop rather than one per process
+# ------------------------------------------------------------------------------
+
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """
+    return the async Anthropic client of the running event loop, creating it on
+        first use
+    :return: anthropic.AsyncAnthropic client
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool_size = model_config['max_async_concurrency']
+        client = anthropic.AsyncAnthropic(
+            max_retries=0,
+            http_client=anthropic.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=model_config['client_pool']['keepalive_expiry']
+                )
+            )
+        )
+        _async_clients[loop] = client
+        log(f"async Anthropic client created with a pool of {pool_size} connections")
+    return client
+
+# ------------------------------------------------------------------------------
+# end of anthropic_client.py
+# ------------------------------------------------------------------------------
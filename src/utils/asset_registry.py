@@ -0,0 +1,84 @@
+# standard library imports
+import io
+import os
+import threading
+import weakref
+
+# 3rd party imports
+from docx.image.exceptions import UnrecognizedImageError
+from docx.image.image import Image
+from docx.oxml.shape import CT_Inline
+from docx.shape import InlineShape
+
+# custom/internal imports
+from src.utils.logger import log
+
+ASSET_DIR = './data/assets/'
+
+# names of the image assets used by the document writers
+RULE_LINE = 'black-line.png'
+HEADER_IMAGE = 'resume-header.png'
+
+# parsed images, keyed by asset path; each file is read once per process
+_assets = {}
+# relationship id of each asset's image part, per document story part
+_document_images = weakref.WeakKeyDictionary()
+_assets_lock = threading.Lock()
+
+# ------------------------------------------------------------------------------
+# primary functions
+# ------------------------------------------------------------------------------
+
+def load_asset(name, asset_dir=ASSET_DIR):
+    """
+    image asset, read and validated on first use and kept in memory afterwards
+    :param name: file name of the asset
+    :param asset_dir: directory of the asset files
+    :return: python-docx Image
+    :raise ValueError: if the asset is missing or not a supported image
+    """
+    path = os.path.join(asset_dir, name)
+    with _assets_lock:
+        image = _assets.get(path)
+        if image is None:
+            try:
+                with open(path, 'rb') as file:
+                    image = Image.from_blob(file.read())
+            except FileNotFoundError as e:
+                raise ValueError(f"Error: image asset {path} not found") from e
+            except UnrecognizedImageError as e:
+                raise ValueError(f"Error: image asset {path} is not a supported image") from e
+            _assets[path] = image
+            log(f"image asset {path} loaded")
+    return image
+
+
+def add_asset_picture(run, name, width=None, height=None, asset_dir=ASSET_DIR):
+    """
+    add an image asset to the end of a run, like python-docx's Run.add_picture;
+        the image part is added to the document once and shared by every
+        picture of the asset, and neither the file nor the image is read again
+    :param run: python-docx Run
+    :param name: file name of the asset
+    :param width: picture width; scales the height if it is not given
+    :param height: picture height; scales the width if it is not given
+    :param asset_dir: directory of the asset files
+    :return: python-docx InlineShape
+    """
+    image = load_asset(name, asset_dir)
+    part = run.part
+    with _assets_lock:
+        images = _document_images.setdefault(part, {})
+        rId = images.get(name)
+        if rId is None:
+            rId, _ = part.get_or_add_image(io.BytesIO(image.blob))
+            images[name] = rId
+
+    cx, cy = image.scaled_dimensions(width, height)
+    inline = CT_Inline.new_pic_inline(part.next_id, rId, name, cx, cy)
+    run._r.add_drawing(inline)
+    return InlineShape(inline)
+
+# ------------------------------------------------------------------------------
+# end of asset_registry.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,43 @@
+# standard library imports
+import os
+import tempfile
+
+# process umask, read once at import since reading it means setting it; files
+# get the same permissions as files created with open()
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# ------------------------------------------------------------------------------
+# primary function
+# ------------------------------------------------------------------------------
+
+def write_atomically(path, data):
+    """
+    write a file through a hidden temporary file in the same directory that is
+        renamed into place once complete, so that a half-written file is never
+        visible at the path, e.g. to a job syncing the output directory
+    :param path: output file path
+    :param data: bytes to write
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory,
+        prefix='.' + os.path.basename(path) + '.',
+        suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp creates the file readable by its owner only
+        os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+# ------------------------------------------------------------------------------
+# end of atomic_write.py
+# ------------------------------------------------------------------------------
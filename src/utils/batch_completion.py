@@ -0,0 +1,173 @@
+# standard library imports
+import itertools
+import time
+from types import SimpleNamespace
+
+# custom/internal imports
+from src.utils.anthropic_client import get_client
+from src.utils.logger import log
+from src.utils.single_content_completion import message_content
+from src.utils.single_content_completion import model_config
+from src.utils.single_content_completion import response_cache
+
+# ------------------------------------------------------------------------------
+# batch completion function
+# ------------------------------------------------------------------------------
+
+def complete_batch(
+    requests,
+    client=None,
+    poll_interval=None,
+    max_wait=None
+):
+    """
+    Submits many prompts through the Anthropic Message Batches API, waits for the
+    batch to finish, and returns the text component of each response. Prompts
+    with a cached response are not submitted, and new responses are written to
+    the response cache.
+
+    :param requests: list of (custom_id, content, max_tokens) tuples, where
+        content is a prompt string or content blocks built by cacheable_prompt;
+        custom_id must be unique within the batch and match ^[a-zA-Z0-9_-]{1,64}$
+    :param client: Anthropic client, or a LocalBatchEndpoint for offline runs;
+        defaults to the process-wide client
+    :param poll_interval: seconds between batch status checks; defaults to the
+        message_batches.poll_interval_seconds setting of the model config
+    :param max_wait: seconds to wait for the batch to end before it is
+        cancelled and its requests are reported as errors; defaults to the
+        message_batches.max_wait_seconds setting of the model config
+    :return: tuple of dicts mapping custom_id to response text, and custom_id
+        to error message for requests that did not succeed
+    """
+    if client is None:
+        client = get_client()
+    if poll_interval is None:
+        poll_interval = model_config['message_batches']['poll_interval_seconds']
+    if max_wait is None:
+        max_wait = model_config['message_batches']['max_wait_seconds']
+
+    responses = {}
+    errors = {}
+    cache_keys = {}
+    batch_requests = []
+
+    for custom_id, content, max_tokens in requests:
+        cache_key = response_cache.make_key(
+            model_config['anthropic_model_version'],
+            content,
+            max_tokens
+        )
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            responses[custom_id] = cached_response
+            continue
+        cache_keys[custom_id] = cache_key
+        batch_requests.append({
+            "custom_id": custom_id,
+            "params": {
+                "model": model_config['anthropic_model_version'],
+                "max_tokens": max_tokens,
+                "messages": [
+                    {
+                        "role": "user",
+                        "content": message_content(content)}
+                ]
+            }
+        })
+
+    log(f"{len(responses)} of {len(requests)} batch requests served from cache")
+    if not batch_requests:
+        return responses, errors
+
+    batch = client.beta.messages.batches.create(requests=batch_requests)
+    log(f"submitted message batch {batch.id} with {len(batch_requests)} requests")
+
+    start_time = time.time()
+    while batch.processing_status != 'ended':
+        if time.time() - start_time >= max_wait:
+            client.beta.messages.batches.cancel(batch.id)
+            log(f"message batch {batch.id} did not end within {max_wait} seconds; cancelled it")
+            for custom_id in cache_keys:
+                errors[custom_id] = f"batch {batch.id} cancelled after {max_wait} seconds"
+            return responses, errors
+        time.sleep(poll_interval)
+        batch = client.beta.messages.batches.retrieve(batch.id)
+    log(f"message batch {batch.id} ended after {time.time() - start_time:.1f} seconds")
+
+    for result in client.beta.messages.batches.results(batch.id):
+        if result.result.type == 'succeeded' and result.result.message.stop_reason == 'max_tokens':
+            # a truncated response is not cached, since its output is incomplete
+            errors[result.custom_id] = "response truncated at max_tokens"
+        elif result.result.type == 'succeeded':
+            text = result.result.message.content[0].text
+            responses[result.custom_id] = text
+            response_cache.set(cache_keys[result.custom_id], text)
+        elif result.result.type == 'errored':
+            errors[result.custom_id] = str(result.result.error)
+        else:
+            errors[result.custom_id] = f"request {result.result.type}"
+
+    # requests missing from the results are reported rather than silently dropped
+    for custom_id in cache_keys:
+        if custom_id not in responses and custom_id not in errors:
+            errors[custom_id] = "request missing from batch results"
+
+    return responses, errors
+
+# ------------------------------------------------------------------------------
+# local stand-in for the Message Batches API
+# ------------------------------------------------------------------------------
+
+class LocalBatchEndpoint:
+    """
+    Offline stand-in for the Message Batches API with the same create, retrieve
+    and results methods, reachable through the same beta.messages.batches path.
+    Requests are answered by a local responder function instead of the API
+    :param responder: function receiving a request's params dict and returning
+        the response text; exceptions it raises become errored results
+    :param polls_until_ended: number of retrieve calls before a batch ends
+    """
+    def __init__(self, responder, polls_until_ended=1):
+        self.responder = responder
+        self.polls_until_ended = polls_until_ended
+        self.submitted = []
+        self.cancelled = []
+        self._batches = {}
+        self._ids = itertools.count()
+        self.beta = SimpleNamespace(messages=SimpleNamespace(batches=self))
+
+    def create(self, requests):
+        batch_id = f"msgbatch_local_{next(self._ids)}"
+        requests = list(requests)
+        self.submitted.append(requests)
+        self._batches[batch_id] = {'requests': requests, 'polls': 0}
+        return SimpleNamespace(id=batch_id, processing_status='in_progress')
+
+    def retrieve(self, batch_id):
+        batch = self._batches[batch_id]
+        batch['polls'] += 1
+        if batch['polls'] >= self.polls_until_ended:
+            status = 'ended'
+        else:
+            status = 'in_progress'
+        return SimpleNamespace(id=batch_id, processing_status=status)
+
+    def cancel(self, batch_id):
+        self.cancelled.append(batch_id)
+        return SimpleNamespace(id=batch_id, processing_status='canceling')
+
+    def results(self, batch_id):
+        for request in self._batches[batch_id]['requests']:
+            try:
+                text = self.responder(request['params'])
+                result = SimpleNamespace(
+                    type='succeeded',
+                    message=SimpleNamespace(content=[SimpleNamespace(text=text)], stop_reason='end_turn')
+                )
+            except Exception as e:
+                result = SimpleNamespace(type='errored', error=str(e))
+            yield SimpleNamespace(custom_id=request['custom_id'], result=result)
+
+# ------------------------------------------------------------------------------
+# end of batch_completion.py
+# ------------------------------------------------------------------------------
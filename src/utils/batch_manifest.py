@@ -0,0 +1,69 @@
+# standard library imports
+import os
+from urllib.parse import urlparse
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+# job description flat files are looked up here when not found relative to the
+# manifest, matching --job-description
+JOB_DESCRIPTION_DIR = './data/input/job_description/'
+
+
+def classify_entry(entry, base_dir='.'):
+    """
+    determine the input source of a batch entry
+    :param entry: job posting URL or job description file path
+    :param base_dir: directory that relative file paths are resolved against
+    :return: tuple of the source ('linkedin', 'otta' or 'flat') and the URL or
+        file path
+    """
+    parsed = urlparse(entry)
+    if parsed.scheme in ('http', 'https'):
+        host = parsed.netloc.lower()
+        if host.endswith('linkedin.com'):
+            return 'linkedin', entry
+        if host.endswith('welcometothejungle.com') or host.endswith('otta.com'):
+            return 'otta', entry
+        raise ValueError(f"Error: unsupported job posting URL in batch: {entry}")
+
+    for candidate in (os.path.join(base_dir, entry), os.path.join(JOB_DESCRIPTION_DIR, entry)):
+        if os.path.isfile(candidate):
+            return 'flat', candidate
+    raise ValueError(f"Error: job description file not found: {entry}")
+
+# ------------------------------------------------------------------------------
+# primary function
+# ------------------------------------------------------------------------------
+
+def read_batch_manifest(path):
+    """
+    list the jobs of a batch, given either a directory of job description flat
+        files or a manifest file with one job description file path or job
+        posting URL per line; blank lines and lines starting with # are ignored
+    :param path: directory or manifest file path
+    :return: list of (source, URL or file path) tuples in manifest order
+    """
+    if os.path.isdir(path):
+        return [
+            ('flat', os.path.join(path, file_name))
+            for file_name in sorted(os.listdir(path))
+            if file_name.endswith('.json')
+        ]
+
+    if not os.path.isfile(path):
+        raise ValueError(f"Error: batch manifest not found: {path}")
+
+    base_dir = os.path.dirname(path)
+    entries = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                entries.append(classify_entry(line, base_dir))
+    return entries
+
+# ------------------------------------------------------------------------------
+# end of batch_manifest.py
+# ------------------------------------------------------------------------------
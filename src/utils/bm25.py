@@ -0,0 +1,70 @@
+# standard library imports
+from collections import Counter
+import math
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class BM25Index:
+    """
+    In-process Okapi BM25 index over a fixed list of tokenized documents, used
+    to rank experience entries against the skills of a job description
+    :param documents: list of token lists, one per document
+    :param k1: term frequency saturation
+    :param b: document length normalization
+    """
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_frequencies = [Counter(tokens) for tokens in documents]
+        self.lengths = [len(tokens) for tokens in documents]
+        self.average_length = sum(self.lengths) / len(documents) if documents else 0.0
+
+        document_frequency = Counter()
+        for frequencies in self.term_frequencies:
+            document_frequency.update(frequencies.keys())
+        count = len(documents)
+        # the +1 keeps the idf of terms found in most documents positive
+        self.idf = {
+            term: math.log((count - frequency + 0.5) / (frequency + 0.5) + 1)
+            for term, frequency in document_frequency.items()
+        }
+
+    def __len__(self):
+        return len(self.term_frequencies)
+
+    def scores(self, query_tokens):
+        """
+        score every document against a query
+        :param query_tokens: list of query tokens; repeated tokens count once
+        :return: list of scores, one per document
+        """
+        query_terms = [term for term in set(query_tokens) if term in self.idf]
+        scores = []
+        for frequencies, length in zip(self.term_frequencies, self.lengths):
+            normalization = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            score = 0.0
+            for term in query_terms:
+                frequency = frequencies.get(term, 0)
+                if frequency:
+                    score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + normalization)
+            scores.append(score)
+        return scores
+
+    def top_k(self, query_tokens, k):
+        """
+        indices of the k best scoring documents, returned in document order so
+            that the priority order of the documents is preserved; ties go to
+            the earlier document
+        :param query_tokens: list of query tokens
+        :param k: number of documents to return
+        :return: sorted list of document indices
+        """
+        scores = self.scores(query_tokens)
+        ranked = sorted(range(len(scores)), key=lambda index: (-scores[index], index))
+        return sorted(ranked[:k])
+
+# ------------------------------------------------------------------------------
+# end of bm25.py
+# ------------------------------------------------------------------------------
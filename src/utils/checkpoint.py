@@ -0,0 +1,166 @@
+# standard library imports
+import hashlib
+import json
+import os
+import threading
+
+# custom/internal imports
+from src.utils.atomic_write import write_atomically
+from src.utils.logger import log
+
+# version of the on-disk checkpoint format; checkpoints of another version are
+# ignored rather than misread
+CHECKPOINT_FORMAT_VERSION = 1
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+def fingerprint(*inputs):
+    """
+    stable hash of the inputs of a run; a checkpoint is only resumed by a run
+        with the same inputs
+    :param inputs: JSON serializable values
+    :return: hex digest
+    """
+    serialized = json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+def _write_json_atomically(path, data):
+    """
+    write a JSON file atomically, so that a crash mid-write never leaves a
+        truncated file behind
+    :param path: output file path
+    :param data: JSON serializable value
+    """
+    write_atomically(path, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+def _read_json(path, fingerprint_key):
+    """
+    read a JSON file written by _write_json_atomically, ignoring files of
+        another format version or fingerprint
+    :param path: file path
+    :param fingerprint_key: expected fingerprint of the file
+    :return: file contents, or None if no usable file exists
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log(f"ignoring unreadable file {path}: {e}")
+        return None
+
+    if data.get('format_version') != CHECKPOINT_FORMAT_VERSION:
+        log(f"ignoring {path} with format version {data.get('format_version')}")
+        return None
+    if data.get('fingerprint') != fingerprint_key:
+        log(f"ignoring {path} written for different inputs")
+        return None
+    return data
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class RunCheckpoint:
+    """
+    Versioned JSON checkpoint of a generation run, holding the completed tasks
+    and the intermediate state they produced. The checkpoint is rewritten
+    atomically after every completed task, so an interrupted or failed run can
+    be resumed without repeating the calls that already succeeded
+    :param checkpoint_dir: directory holding the checkpoint files
+    :param run_fingerprint: fingerprint of the run's inputs
+    :param name: readable prefix of the checkpoint file name
+    """
+    def __init__(self, checkpoint_dir, run_fingerprint, name='run'):
+        self.fingerprint = run_fingerprint
+        self.path = os.path.join(checkpoint_dir, f"{name}-{run_fingerprint[:16]}.json")
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks cannot be pickled; unpickled checkpoints get a new one
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def save(self, completed_tasks, state):
+        """
+        write the checkpoint
+        :param completed_tasks: names of the completed tasks
+        :param state: JSON serializable dict of intermediate state
+        """
+        checkpoint = {
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'completed_tasks': sorted(completed_tasks),
+            'state': state,
+        }
+        with self._lock:
+            _write_json_atomically(self.path, checkpoint)
+
+    def load(self):
+        """
+        read the checkpoint
+        :return: tuple of the completed task names and the state, or None if no
+            usable checkpoint exists
+        """
+        checkpoint = _read_json(self.path, self.fingerprint)
+        if checkpoint is None:
+            return None
+        return checkpoint['completed_tasks'], checkpoint['state']
+
+    def remove(self):
+        """delete the checkpoint once the run no longer needs it"""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+class EmployerOutputStore:
+    """
+    Outputs of each employer's chat completion chain from the last completed run
+    for a job description, keyed by a fingerprint of everything the chain reads.
+    A later run for the same job description reuses the outputs of every
+    employer whose fingerprint is unchanged, and only regenerates the rest
+    :param store_dir: directory holding the store files
+    :param job_fingerprint: fingerprint of the job description
+    :param name: readable prefix of the store file name
+    """
+    def __init__(self, store_dir, job_fingerprint, name='resume'):
+        self.fingerprint = job_fingerprint
+        self.path = os.path.join(store_dir, f"{name}-{job_fingerprint[:16]}-employers.json")
+
+    def save(self, employer_outputs):
+        """
+        write the outputs of a completed run, replacing the previous run's
+        :param employer_outputs: dict mapping employer fingerprint to a JSON
+            serializable dict of that employer's outputs
+        """
+        _write_json_atomically(self.path, {
+            'format_version': CHECKPOINT_FORMAT_VERSION,
+            'fingerprint': self.fingerprint,
+            'employers': employer_outputs,
+        })
+
+    def load(self):
+        """
+        read the outputs of the previous run
+        :return: dict mapping employer fingerprint to outputs; empty if no usable
+            store exists
+        """
+        store = _read_json(self.path, self.fingerprint)
+        if store is None:
+            return {}
+        return store['employers']
+
+# ------------------------------------------------------------------------------
+# end of checkpoint.py
+# ------------------------------------------------------------------------------
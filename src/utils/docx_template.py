@@ -0,0 +1,117 @@
+# standard library imports
+import io
+import threading
+
+# 3rd party imports
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.shared import Pt, Inches, RGBColor
+
+# custom/internal imports
+from src.utils.checkpoint import fingerprint
+from src.utils.logger import log
+
+# name of the paragraph style of the bold header cells of resume tables, e.g.
+# role title and employer on the left, employment dates on the right
+TABLE_HEADER_STYLE = 'Table Header'
+
+# serialized base documents, keyed by document kind and doc_format fingerprint
+_templates = {}
+_templates_lock = threading.Lock()
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+def _set_margins(document, inches=1):
+    section = document.sections[0]
+    section.top_margin = Inches(inches)
+    section.bottom_margin = Inches(inches)
+    section.left_margin = Inches(inches)
+    section.right_margin = Inches(inches)
+
+
+def _set_style(style, style_format):
+    """
+    apply a text format block of doc_format.yaml to a style
+    :param style: python-docx style
+    :param style_format: dict with font_name, font_size, font_color and line_spacing
+    """
+    font = style.font
+    font.name = style_format['font_name']
+    font.size = Pt(style_format['font_size'])
+    font.color.rgb = RGBColor(*style_format['font_color'])
+    paragraph_format = style.paragraph_format
+    paragraph_format.line_spacing = style_format['line_spacing']
+    paragraph_format.space_before = Pt(0)
+    paragraph_format.space_after = Pt(0)
+
+
+def _build_resume_template(doc_format):
+    """
+    build the empty, styled base document of a resume
+    :param doc_format: contents of doc_format.yaml
+    :return: docx Document
+    """
+    document = Document()
+    _set_margins(document)
+    # header 1; used for "Professional Experience", "Education", etc.
+    _set_style(document.styles['Heading 1'], doc_format['h1'])
+    # normal text; used for all other text
+    _set_style(document.styles['Normal'], doc_format['normal'])
+
+    table_header = document.styles.add_style(TABLE_HEADER_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    table_header.base_style = document.styles['Normal']
+    table_header.font.bold = True
+    table_header.font.name = doc_format['normal']['font_name']
+    table_header.font.size = Pt(doc_format['normal']['font_size'])
+    return document
+
+
+def _build_cover_letter_template(doc_format):
+    """
+    build the empty, styled base document of a cover letter
+    :param doc_format: contents of doc_format.yaml
+    :return: docx Document
+    """
+    document = Document()
+    _set_margins(document)
+    _set_style(document.styles['Normal'], doc_format['cover_letter'])
+    return document
+
+
+_BUILDERS = {
+    'resume': _build_resume_template,
+    'cover_letter': _build_cover_letter_template,
+}
+
+# ------------------------------------------------------------------------------
+# primary function
+# ------------------------------------------------------------------------------
+
+def base_document(kind, doc_format):
+    """
+    new document cloned from the styled base document of a kind; the base
+        document is built and serialized once per doc_format version, so the
+        style setup is not repeated for every render
+    :param kind: 'resume' or 'cover_letter'
+    :param doc_format: contents of doc_format.yaml
+    :return: docx Document
+    """
+    if kind not in _BUILDERS:
+        raise ValueError(f"Error: unknown document template {kind}")
+
+    key = (kind, fingerprint(doc_format))
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            buffer = io.BytesIO()
+            _BUILDERS[kind](doc_format).save(buffer)
+            template = buffer.getvalue()
+            _templates[key] = template
+            log(f"{kind} base document template built")
+    return Document(io.BytesIO(template))
+
+# ------------------------------------------------------------------------------
+# end of docx_template.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,93 @@
+# standard library imports
+from difflib import SequenceMatcher
+import re
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+_TOKENS = re.compile(r"[a-z0-9]+")
+
+
+def experience_tokens(experience):
+    """
+    normalize an experience entry to a list of lowercase word tokens; objects are
+        read in key order so that key order and formatting do not matter
+    :param experience: experience object, e.g. {"what": ..., "how": ..., "result": ...},
+        or string
+    :return: list of tokens
+    """
+    if isinstance(experience, dict):
+        text = " ".join(str(experience[key]) for key in sorted(experience))
+    else:
+        text = str(experience)
+    return _TOKENS.findall(text.lower())
+
+
+def similarity(tokens_a, tokens_b):
+    """
+    order-aware similarity of two token lists
+    :param tokens_a: list of tokens
+    :param tokens_b: list of tokens
+    :return: similarity between 0 and 1
+    """
+    return SequenceMatcher(None, tokens_a, tokens_b, autojunk=False).ratio()
+
+# ------------------------------------------------------------------------------
+# primary function
+# ------------------------------------------------------------------------------
+
+def verify_experience_locally(
+    extracted_experience,
+    original_experience,
+    experience_count,
+    min_similarity=0.85
+):
+    """
+    verify that every extracted experience entry comes from the original
+        experience, first by normalized exact match and then by fuzzy token
+        similarity; each original entry can only be matched once
+    :param extracted_experience: list of experience entries selected by the model
+    :param original_experience: list of experience entries from the resume input
+    :param experience_count: number of entries the selection must contain
+    :param min_similarity: minimum similarity of a fuzzy match
+    :return: list of the matched original entries, in the order they were
+        extracted, or None if any entry is unmatched or too few or too many
+        entries were selected, in which case the selection needs the LLM verifier
+    """
+    if not isinstance(extracted_experience, list):
+        return None
+    if len(extracted_experience) < min(experience_count, len(original_experience)):
+        return None
+    if len(extracted_experience) > experience_count:
+        return None
+
+    original_tokens = [experience_tokens(entry) for entry in original_experience]
+    exact = {}
+    for index, tokens in enumerate(original_tokens):
+        exact.setdefault(tuple(tokens), []).append(index)
+
+    used = set()
+    verified = []
+    for entry in extracted_experience:
+        tokens = experience_tokens(entry)
+        candidates = [index for index in exact.get(tuple(tokens), []) if index not in used]
+        if candidates:
+            match = candidates[0]
+        else:
+            scores = [
+                (similarity(tokens, original), index)
+                for index, original in enumerate(original_tokens)
+                if index not in used
+            ]
+            score, match = max(scores, default=(0.0, None))
+            if score < min_similarity:
+                return None
+        used.add(match)
+        # the original entry is kept so that no model rewording reaches the resume
+        verified.append(original_experience[match])
+    return verified
+
+# ------------------------------------------------------------------------------
+# end of experience_verifier.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,266 @@
+# standard library imports
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import threading
+import time
+
+# custom/internal imports
+from src.utils.logger import log
+from src.utils.telemetry import percentile
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class HedgePolicy:
+    """
+    Hedged requests for chat completion calls. When a request is still running
+    after the hedge delay of its stage, a duplicate request is sent and the first
+    successful response is used; the other request is cancelled, or, in the
+    threaded engine where a running request cannot be interrupted, left to finish
+    in the background with its response discarded. Hedges are limited to a
+    fraction of all requests so that the extra spend is capped
+    :param enabled: if False, requests are sent once without hedging
+    :param delay_percentile: percentile of a stage's observed request latencies
+        used as its hedge delay
+    :param delay_seconds: hedge delay of stages with fewer than min_samples
+        observed latencies; None disables hedging for those stages
+    :param min_delay: lower bound of the hedge delay in seconds
+    :param min_samples: observed latencies a stage needs before its percentile
+        is used
+    :param max_extra_fraction: maximum number of hedges as a fraction of all
+        requests sent
+    :param max_samples: latencies kept per stage; older ones are dropped
+    :param max_workers: threads available to the threaded engine's requests
+    :param clock: monotonic clock, replaceable for testing
+    """
+    def __init__(
+        self,
+        enabled=False,
+        delay_percentile=90,
+        delay_seconds=None,
+        min_delay=1.0,
+        min_samples=5,
+        max_extra_fraction=0.1,
+        max_samples=200,
+        max_workers=8,
+        clock=time.monotonic
+    ):
+        self.enabled = enabled
+        self.delay_percentile = delay_percentile
+        self.delay_seconds = delay_seconds
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_extra_fraction = max_extra_fraction
+        self.max_samples = max_samples
+        self.max_workers = max_workers
+        self._clock = clock
+        self._latencies = {}
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def from_config(cls, hedging, max_concurrency):
+        """
+        build a policy from the hedging block of the model config
+        :param hedging: dict of hedging settings
+        :param max_concurrency: concurrent API calls of the pipeline; every call
+            may need a second thread for its hedge
+        :return: HedgePolicy
+        """
+        return cls(
+            enabled=hedging['enabled'],
+            delay_percentile=hedging['delay_percentile'],
+            delay_seconds=hedging.get('delay_seconds'),
+            min_delay=hedging['min_delay_seconds'],
+            min_samples=hedging['min_samples'],
+            max_extra_fraction=hedging['max_extra_fraction'],
+            max_workers=2 * max_concurrency
+        )
+
+# ------------------------------------------------------------------------------
+# hedge decisions
+# ------------------------------------------------------------------------------
+
+    def observe(self, stage, latency):
+        """
+        add the latency of a successful request
+        :param stage: pipeline stage that sent the request
+        :param latency: seconds from sending the request until its response
+        """
+        with self._lock:
+            samples = self._latencies.setdefault(stage, deque(maxlen=self.max_samples))
+            samples.append(latency)
+
+    def delay(self, stage):
+        """
+        seconds to wait for a request of a stage before hedging it
+        :param stage: pipeline stage name
+        :return: hedge delay in seconds, or None if the stage is not hedged
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            samples = list(self._latencies.get(stage, ()))
+        if len(samples) >= self.min_samples:
+            delay = percentile(samples, self.delay_percentile)
+        else:
+            delay = self.delay_seconds
+        if delay is None:
+            return None
+        return max(self.min_delay, delay)
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _acquire_hedge(self, stage, delay):
+        """
+        take a hedge from the extra spend budget
+        :param stage: pipeline stage of the request to hedge
+        :param delay: hedge delay that elapsed, for the log
+        :return: True if the hedge may be sent
+        """
+        with self._lock:
+            if self.hedges + 1 > self.max_extra_fraction * self.requests:
+                return False
+            self.hedges += 1
+            self.requests += 1
+        log(f"{stage or 'unlabeled'} request still running after {delay:.2f} seconds; sending a hedge")
+        return True
+
+    def _timed(self, stage, send):
+        """
+        wrap a request so that its latency is observed when it succeeds
+        :param stage: pipeline stage sending the request
+        :param send: function sending the request
+        :return: function without arguments
+        """
+        def send_timed():
+            started = self._clock()
+            result = send()
+            self.observe(stage, self._clock() - started)
+            return result
+        return send_timed
+
+    def _async_timed(self, stage, send):
+        async def send_timed():
+            started = self._clock()
+            result = await send()
+            self.observe(stage, self._clock() - started)
+            return result
+        return send_timed
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='hedged-request'
+                )
+            return self._executor
+
+# ------------------------------------------------------------------------------
+# public methods
+# ------------------------------------------------------------------------------
+
+    def run(self, stage, send):
+        """
+        send a request, hedging it if it is still running after the stage's
+            hedge delay
+        :param stage: pipeline stage sending the request
+        :param send: function sending the request and returning its response;
+            called once more for a hedge, from another thread
+        :return: tuple of the first successful response and whether a hedge
+            was sent
+        :raise Exception: the error of the request, or of the first failed
+            request if the request and its hedge both failed
+        """
+        delay = self.delay(stage)
+        self._count_request()
+        send_timed = self._timed(stage, send)
+        if delay is None:
+            return send_timed(), False
+
+        executor = self._get_executor()
+        primary = executor.submit(send_timed)
+        try:
+            return primary.result(timeout=delay), False
+        except FutureTimeoutError:
+            pass
+        if not self._acquire_hedge(stage, delay):
+            return primary.result(), False
+
+        pending = {primary, executor.submit(send_timed)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        # a request that has not started yet is dropped; a
+                        # running one finishes and its response is discarded
+                        other.cancel()
+                    if future is not primary:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result(), True
+                error = error or future.exception()
+        raise error
+
+    async def async_run(self, stage, send):
+        """
+        async counterpart of run; the slower request is cancelled
+        :param stage: pipeline stage sending the request
+        :param send: coroutine function sending the request and returning its
+            response; awaited once more for a hedge
+        :return: tuple of the first successful response and whether a hedge
+            was sent
+        :raise Exception: the error of the request, or of the first failed
+            request if the request and its hedge both failed
+        """
+        delay = self.delay(stage)
+        self._count_request()
+        send_timed = self._async_timed(stage, send)
+        if delay is None:
+            return await send_timed(), False
+
+        primary = asyncio.ensure_future(send_timed())
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result(), False
+            if not self._acquire_hedge(stage, delay):
+                return await primary, False
+
+            pending.add(asyncio.ensure_future(send_timed()))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            with self._lock:
+                                self.hedge_wins += 1
+                        return task.result(), True
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def log_summary(self):
+        """log the number of hedges sent and won in the run"""
+        if self.hedges:
+            log(f"{self.hedges} of {self.requests} requests were hedged; "
+                f"the hedge responded first {self.hedge_wins} times")
+
+# ------------------------------------------------------------------------------
+# end of hedge_policy.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,139 @@
+# standard library imports
+import ast
+import json
+import re
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+_CODE_FENCE = re.compile(r"```[A-Za-z]*[ \t]*\n?(.*?)```", re.DOTALL)
+_BARE_WORD = re.compile(r"[A-Za-z_]\w*")
+_JSON_LITERALS = {'true': 'True', 'false': 'False', 'null': 'None'}
+
+
+def strip_code_fences(text):
+    """
+    take the contents of the first markdown code fence, if any
+    :param text: model output
+    :return: fenced contents, or the text unchanged
+    """
+    match = _CODE_FENCE.search(text)
+    return match.group(1) if match else text
+
+
+def _balanced_end(text, start):
+    """
+    find the end of the bracketed value opening at text[start]; brackets inside
+        single or double quoted strings are ignored
+    :param text: text to scan
+    :param start: index of an opening [ or {
+    :return: index after the closing bracket, or None if it is never closed
+    """
+    depth = 0
+    quote = None
+    i = start
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if char == '\\':
+                i += 1
+            elif char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char in '[{':
+            depth += 1
+        elif char in ']}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def _to_python_literals(text):
+    """
+    replace the JSON literals true, false and null outside of strings with their
+        Python equivalents, so that ast.literal_eval accepts mixed output
+    :param text: JSON or Python literal text
+    :return: Python literal text
+    """
+    output = []
+    quote = None
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            output.append(char)
+            if char == '\\' and i + 1 < len(text):
+                output.append(text[i + 1])
+                i += 1
+            elif char == quote:
+                quote = None
+            i += 1
+            continue
+        if char in '"\'':
+            quote = char
+            output.append(char)
+            i += 1
+            continue
+        match = _BARE_WORD.match(text, i)
+        if match:
+            output.append(_JSON_LITERALS.get(match.group(), match.group()))
+            i = match.end()
+            continue
+        output.append(char)
+        i += 1
+    return "".join(output)
+
+
+def _parse_literal(text):
+    """
+    parse text as JSON, falling back to a Python literal
+    :param text: candidate value text
+    :return: parsed value
+    :raise ValueError: if the text is neither
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(_to_python_literals(text))
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError) as e:
+        raise ValueError(f"not a JSON or Python literal: {e}") from e
+
+# ------------------------------------------------------------------------------
+# primary function
+# ------------------------------------------------------------------------------
+
+def parse_model_output(text):
+    """
+    parse the JSON value of a chat completion output in a single pass; code
+        fences and prose around the value are ignored, and both JSON and Python
+        literal syntax are accepted
+    :param text: chat completion output
+    :return: parsed value of the whole output, or else of the first balanced
+        array or object in it that parses
+    :raise ValueError: if the output holds no parsable value
+    """
+    text = strip_code_fences(str(text)).strip()
+    try:
+        return _parse_literal(text)
+    except ValueError as e:
+        error = e
+
+    for match in re.finditer(r"[\[{]", text):
+        end = _balanced_end(text, match.start())
+        if end is None:
+            continue
+        try:
+            return _parse_literal(text[match.start():end])
+        except ValueError:
+            continue
+    raise ValueError(f"no JSON value found in model output ({error})")
+
+# ------------------------------------------------------------------------------
+# end of json_repair.py
+# ------------------------------------------------------------------------------
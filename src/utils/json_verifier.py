@@ -37,4 +37,14 @@ def is_object(data):
 
 	# Check if all keys are strings and all values are also strings
 	return all(isinstance(key, str) and isinstance(value, str) for key, value in
-			   data.items())
\ No newline at end of file
+			   data.items())
+
+
+def is_skill_lists(data):
+	# First check if it's a dictionary
+	if not isinstance(data, dict):
+		return False
+
+	# Check that each skill list is present and an array of strings
+	return all(is_array_of_strings(data.get(key)) for key in
+			   ('tech_skills', 'tech_tools', 'soft_skills'))
@@ -0,0 +1,195 @@
+# standard library imports
+import math
+
+# 3rd party imports
+from docx.shared import Inches, Pt
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+# custom/internal imports
+from src.utils.docx_template import TABLE_HEADER_STYLE
+
+# character widths of Helvetica in thousandths of an em, from its Adobe font
+# metrics; Arial shares Helvetica's metrics
+_HELVETICA_WIDTHS = {
+    ' ': 278, '!': 278, '"': 355, '#': 556, '$': 556, '%': 889, '&': 667, "'": 191,
+    '(': 333, ')': 333, '*': 389, '+': 584, ',': 278, '-': 333, '.': 278, '/': 278,
+    ':': 278, ';': 278, '<': 584, '=': 584, '>': 584, '?': 556, '@': 1015,
+    '[': 278, '\\': 278, ']': 278, '^': 469, '_': 556, '`': 333,
+    '{': 334, '|': 260, '}': 334, '~': 584,
+    'A': 667, 'B': 667, 'C': 722, 'D': 722, 'E': 667, 'F': 611, 'G': 778, 'H': 722,
+    'I': 278, 'J': 500, 'K': 667, 'L': 556, 'M': 833, 'N': 722, 'O': 778, 'P': 667,
+    'Q': 778, 'R': 722, 'S': 667, 'T': 611, 'U': 722, 'V': 667, 'W': 944, 'X': 667,
+    'Y': 667, 'Z': 611,
+    'a': 556, 'b': 556, 'c': 500, 'd': 556, 'e': 556, 'f': 278, 'g': 556, 'h': 556,
+    'i': 222, 'j': 222, 'k': 500, 'l': 222, 'm': 833, 'n': 556, 'o': 556, 'p': 556,
+    'q': 556, 'r': 333, 's': 500, 't': 278, 'u': 556, 'v': 500, 'w': 722, 'x': 500,
+    'y': 500, 'z': 500,
+}
+_HELVETICA_WIDTHS.update({digit: 556 for digit in '0123456789'})
+_FONT_WIDTHS = {'Arial': _HELVETICA_WIDTHS, 'Helvetica': _HELVETICA_WIDTHS}
+
+# width of characters missing from the tables, and of every character of fonts
+# without a table, in thousandths of an em
+_DEFAULT_WIDTH = 556
+# bold glyphs are wider than regular ones, by about this factor for Helvetica
+_BOLD_FACTOR = 1.07
+# height of a single spaced line as a multiple of the font size, i.e. the
+# ascent plus descent of Arial
+_LINE_HEIGHT = 1.15
+# indent of the List Bullet style of the default python-docx template
+_BULLET_INDENT = Inches(0.25)
+# left plus right cell margin of the default table style
+_CELL_MARGINS = Inches(0.16)
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class PageFitEstimator:
+    """
+    Estimates the page usage of a rendered document without opening it in a
+    word processor: every paragraph is word wrapped with the font metrics of its
+    doc_format.yaml text format and the width available to it, table rows take
+    the height of their tallest cell, and pictures take their own height. The
+    estimate is deterministic, so outputs can be trimmed to fit before writing
+    :param doc_format: contents of doc_format.yaml
+    :param text_format: doc_format.yaml block of normal text, e.g. 'normal' for
+        resumes or 'cover_letter' for cover letters
+    """
+    def __init__(self, doc_format, text_format='normal'):
+        self.normal = doc_format[text_format]
+        self.h1 = doc_format['h1']
+
+    def _style_format(self, style_name):
+        return self.h1 if style_name == 'Heading 1' else self.normal
+
+# ------------------------------------------------------------------------------
+# text measurement
+# ------------------------------------------------------------------------------
+
+    def text_width(self, text, style_format, bold=False):
+        """
+        width of a line of text
+        :param text: line of text
+        :param style_format: doc_format.yaml text format
+        :param bold: if True, the text is set in bold
+        :return: width in EMU
+        """
+        widths = _FONT_WIDTHS.get(style_format['font_name'], {})
+        thousandths = sum(widths.get(char, _DEFAULT_WIDTH) for char in text)
+        if bold:
+            thousandths *= _BOLD_FACTOR
+        return thousandths * Pt(style_format['font_size']) / 1000
+
+    def line_count(self, text, width, style_format, bold=False):
+        """
+        number of lines of a paragraph, word wrapped greedily like a word
+            processor; words wider than a line are broken across lines
+        :param text: paragraph text
+        :param width: width available to the paragraph in EMU
+        :param style_format: doc_format.yaml text format
+        :param bold: if True, the text is set in bold
+        :return: number of lines, at least 1
+        """
+        space = self.text_width(' ', style_format, bold)
+        lines = 0
+        for text_line in text.split('\n'):
+            lines += 1
+            used = 0
+            for word in text_line.split():
+                word_width = self.text_width(word, style_format, bold)
+                if used and used + space + word_width <= width:
+                    used += space + word_width
+                    continue
+                if used:
+                    lines += 1
+                lines += max(0, math.ceil(word_width / width) - 1)
+                used = word_width - (math.ceil(word_width / width) - 1) * width
+        return lines
+
+    def line_height(self, style_format):
+        """
+        :param style_format: doc_format.yaml text format
+        :return: height of a line in EMU
+        """
+        return Pt(style_format['font_size']) * _LINE_HEIGHT * style_format['line_spacing']
+
+    def paragraph_height(self, text, width, style_name='Normal', bold=False):
+        """
+        height of a paragraph of text
+        :param text: paragraph text
+        :param width: width of the text column in EMU, before the style's indent
+        :param style_name: paragraph style name
+        :param bold: if True, the text is set in bold
+        :return: height in EMU
+        """
+        style_format = self._style_format(style_name)
+        if style_name == 'List Bullet':
+            width -= _BULLET_INDENT
+        return self.line_count(text, width, style_format, bold) * self.line_height(style_format)
+
+# ------------------------------------------------------------------------------
+# document measurement
+# ------------------------------------------------------------------------------
+
+    def _docx_paragraph_height(self, paragraph, width):
+        extents = paragraph._p.xpath('.//wp:extent')
+        if extents:
+            return sum(int(extent.get('cy')) for extent in extents)
+        style_name = paragraph.style.name
+        return self.paragraph_height(
+            paragraph.text,
+            width,
+            style_name,
+            bold=style_name == TABLE_HEADER_STYLE
+        )
+
+    def _table_height(self, table):
+        height = 0
+        for row in table.rows:
+            cell_heights = [0]
+            for column, cell in zip(table.columns, row.cells):
+                width = column.width - _CELL_MARGINS
+                cell_heights.append(sum(self._docx_paragraph_height(p, width) for p in cell.paragraphs))
+            height += max(cell_heights)
+        return height
+
+    def text_area(self, document):
+        """
+        :param document: docx Document
+        :return: tuple of the width and height of the first section's text
+            area, inside its margins, in EMU
+        """
+        section = document.sections[0]
+        return (
+            section.page_width - section.left_margin - section.right_margin,
+            section.page_height - section.top_margin - section.bottom_margin
+        )
+
+    def document_height(self, document):
+        """
+        height of a document's content laid out on one continuous page
+        :param document: docx Document
+        :return: height in EMU
+        """
+        width, _ = self.text_area(document)
+        height = 0
+        for element in document.element.body.iterchildren():
+            if element.tag.endswith('}p'):
+                height += self._docx_paragraph_height(Paragraph(element, document), width)
+            elif element.tag.endswith('}tbl'):
+                height += self._table_height(Table(element, document))
+        return height
+
+    def pages(self, document):
+        """
+        :param document: docx Document
+        :return: estimated number of pages, as a fraction of pages
+        """
+        _, page_height = self.text_area(document)
+        return self.document_height(document) / page_height
+
+# ------------------------------------------------------------------------------
+# end of page_fit.py
+# ------------------------------------------------------------------------------
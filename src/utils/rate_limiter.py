@@ -0,0 +1,176 @@
+# standard library imports
+import asyncio
+import threading
+import time
+
+# custom/internal imports
+from src.utils.logger import log
+
+# ------------------------------------------------------------------------------
+# helper class
+# ------------------------------------------------------------------------------
+
+class _TokenBucket:
+    """
+    Token bucket that refills continuously at its per-minute limit. The level may
+    go negative: a negative level is capacity already promised to callers that
+    are still waiting for it
+    :param per_minute: capacity of the bucket and amount refilled every minute
+    :param now: current clock reading
+    """
+    def __init__(self, per_minute, now):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = now
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount, now):
+        """
+        debit the bucket
+        :param amount: amount to debit
+        :param now: current clock reading
+        :return: seconds until the debited amount has been refilled
+        """
+        self._refill(now)
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def give(self, amount, now):
+        """
+        credit the bucket, e.g. when fewer tokens were used than reserved
+        :param amount: amount to credit; may be negative
+        :param now: current clock reading
+        """
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class RateLimiter:
+    """
+    Process-wide limiter that budgets requests, input tokens and output tokens
+    per minute. Each caller reserves its estimated usage against every budget on
+    arrival and then waits until all budgets have refilled enough to cover it;
+    since later reservations queue behind earlier ones, callers are served in
+    arrival order and throughput settles just under the configured limits
+    :param requests_per_minute: request limit; None disables the budget
+    :param input_tokens_per_minute: input token limit; None disables the budget
+    :param output_tokens_per_minute: output token limit; None disables the budget
+    :param clock: monotonic clock, replaceable for testing
+    """
+    def __init__(
+        self,
+        requests_per_minute=None,
+        input_tokens_per_minute=None,
+        output_tokens_per_minute=None,
+        clock=time.monotonic
+    ):
+        self._clock = clock
+        self._lock = threading.Lock()
+        now = clock()
+        self._buckets = {}
+        for name, per_minute in (
+            ('requests', requests_per_minute),
+            ('input_tokens', input_tokens_per_minute),
+            ('output_tokens', output_tokens_per_minute)
+        ):
+            if per_minute:
+                self._buckets[name] = _TokenBucket(per_minute, now)
+
+    @classmethod
+    def from_config(cls, rate_limits):
+        """
+        build a limiter from the rate_limits block of the model config
+        :param rate_limits: dict of per-minute limits; missing or null limits are
+            not enforced
+        :return: RateLimiter
+        """
+        rate_limits = rate_limits or {}
+        return cls(
+            requests_per_minute=rate_limits.get('requests_per_minute'),
+            input_tokens_per_minute=rate_limits.get('input_tokens_per_minute'),
+            output_tokens_per_minute=rate_limits.get('output_tokens_per_minute')
+        )
+
+# ------------------------------------------------------------------------------
+# public methods
+# ------------------------------------------------------------------------------
+
+    def reserve(self, input_tokens, output_tokens):
+        """
+        reserve capacity for one request without blocking
+        :param input_tokens: estimated input tokens of the request
+        :param output_tokens: output tokens reserved for the response, normally
+            the request's max_tokens
+        :return: seconds the caller must wait before sending the request
+        """
+        amounts = {
+            'requests': 1,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens
+        }
+        with self._lock:
+            now = self._clock()
+            wait = 0.0
+            for name, bucket in self._buckets.items():
+                wait = max(wait, bucket.take(amounts[name], now))
+        return wait
+
+    def acquire(self, input_tokens, output_tokens):
+        """
+        block the calling thread until the request fits within the limits
+        :param input_tokens: estimated input tokens of the request
+        :param output_tokens: output tokens reserved for the response
+        """
+        wait = self.reserve(input_tokens, output_tokens)
+        if wait > 0:
+            log(f"rate limit reached; waiting {wait:.2f} seconds")
+            time.sleep(wait)
+
+    async def async_acquire(self, input_tokens, output_tokens):
+        """
+        async counterpart of acquire that yields the event loop while waiting
+        :param input_tokens: estimated input tokens of the request
+        :param output_tokens: output tokens reserved for the response
+        """
+        wait = self.reserve(input_tokens, output_tokens)
+        if wait > 0:
+            log(f"rate limit reached; waiting {wait:.2f} seconds")
+            await asyncio.sleep(wait)
+
+    def settle(self, reserved_input, reserved_output, used_input, used_output):
+        """
+        correct a reservation once the actual usage of a request is known; tokens
+        reserved but not used are returned to the budgets
+        :param reserved_input: input tokens passed to reserve
+        :param reserved_output: output tokens passed to reserve
+        :param used_input: input tokens reported by the API
+        :param used_output: output tokens reported by the API
+        """
+        with self._lock:
+            now = self._clock()
+            if 'input_tokens' in self._buckets:
+                self._buckets['input_tokens'].give(reserved_input - used_input, now)
+            if 'output_tokens' in self._buckets:
+                self._buckets['output_tokens'].give(reserved_output - used_output, now)
+
+    def release(self, reserved_input, reserved_output):
+        """
+        return the tokens reserved for a request that failed without reporting
+        its usage, e.g. a rate limited, overloaded or timed out request, so that
+        retries are not delayed by reservations that were never used; the
+        request itself still counts against the request budget
+        :param reserved_input: input tokens passed to reserve
+        :param reserved_output: output tokens passed to reserve
+        """
+        self.settle(reserved_input, reserved_output, 0, 0)
+
+# ------------------------------------------------------------------------------
+# end of rate_limiter.py
+# ------------------------------------------------------------------------------
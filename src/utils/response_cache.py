@@ -0,0 +1,158 @@
+# standard library imports
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+# custom/internal imports
+from src.utils.logger import log
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class ResponseCache:
+    """
+    On-disk, content-addressed cache for chat completion responses. Each entry
+    is stored as its own json file named by the hash of the request, and the
+    least recently used entries are evicted once the cache exceeds its size cap
+    :param cache_dir: directory holding the cached responses
+    :param max_size_bytes: size cap for the cache directory
+    :param enabled: if False, nothing is read from or written to the cache
+    :param bypass: if True, cached responses are ignored but new responses are
+        still written, refreshing the cache
+    """
+    def __init__(
+        self,
+        cache_dir,
+        max_size_bytes,
+        enabled=True,
+        bypass=False
+    ):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.enabled = enabled
+        self.bypass = bypass
+        self._lock = threading.Lock()
+
+# ------------------------------------------------------------------------------
+# helper methods
+# ------------------------------------------------------------------------------
+
+    @staticmethod
+    def make_key(model, content, max_tokens):
+        """
+        build the content-addressed key for a request
+        :param model: model version the request is sent to
+        :param content: prompt text of the request
+        :param max_tokens: max tokens allowed for the response
+        :return: hex digest identifying the request
+        """
+        payload = json.dumps([model, str(content), max_tokens], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _evict(self):
+        """
+        remove least recently used entries until the cache fits its size cap;
+            recency is tracked through each entry's modification time
+        """
+        entries = []
+        total_size = 0
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+# ------------------------------------------------------------------------------
+# public methods
+# ------------------------------------------------------------------------------
+
+    def get(self, key):
+        """
+        look up a cached response
+        :param key: key built by make_key
+        :return: cached response text, or None on a miss
+        """
+        if not self.enabled or self.bypass:
+            return None
+
+        path = self._entry_path(key)
+        with self._lock:
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    entry = json.load(file)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError) as e:
+                log(f"discarding unreadable response cache entry {key}: {e}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                return None
+            # mark entry as recently used
+            os.utime(path)
+
+        return entry['response']
+
+    def set(self, key, response):
+        """
+        store a response and evict old entries if the cache is over its cap
+        :param key: key built by make_key
+        :param response: response text to store
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write to a temp file first so readers never see a partial entry
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'key': key, 'response': response}, file, ensure_ascii=False)
+            os.replace(temp_path, self._entry_path(key))
+            self._evict()
+
+    def delete(self, key):
+        """
+        remove a cached response, e.g. one whose output was rejected
+        :param key: key built by make_key
+        """
+        with self._lock:
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        """remove every entry from the cache"""
+        with self._lock:
+            if not os.path.isdir(self.cache_dir):
+                return
+            for file_name in os.listdir(self.cache_dir):
+                if file_name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, file_name))
+
+# ------------------------------------------------------------------------------
+# end of response_cache.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,239 @@
+# standard library imports
+from contextlib import contextmanager
+import email.utils
+import random
+import threading
+import time
+
+# 3rd party imports
+import anthropic
+
+# custom/internal imports
+from src.utils.logger import log
+
+# ------------------------------------------------------------------------------
+# errors raised by the completion functions
+# ------------------------------------------------------------------------------
+
+class CompletionError(RuntimeError):
+    """a chat completion failed with an error that is not retried"""
+
+
+class RetriesExhaustedError(CompletionError):
+    """a chat completion failed on every attempt allowed by the retry policy"""
+
+
+class DeadlineExceededError(CompletionError):
+    """a chat completion could not finish within its call or run deadline"""
+
+
+class TruncatedCompletionError(CompletionError):
+    """a chat completion stopped at its max_tokens budget before its output was complete"""
+
+    def __init__(self, message, max_tokens):
+        super().__init__(message)
+        self.max_tokens = max_tokens
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+# request timeout, conflict, rate limit, server errors, and overloaded
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+
+def is_retryable(error):
+    """
+    determine whether an API error is transient and worth retrying
+    :param error: exception raised by the API call
+    :return: True for rate limit, overloaded, server, connection and timeout
+        errors
+    """
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    # APITimeoutError is a subclass of APIConnectionError
+    return isinstance(error, anthropic.APIConnectionError)
+
+
+def retry_after(error):
+    """
+    read the wait requested by the server through the retry-after-ms or
+        retry-after response headers
+    :param error: exception raised by the API call
+    :return: seconds to wait, or None if the server did not ask for a wait
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    try:
+        return float(headers.get('retry-after-ms')) / 1000
+    except (TypeError, ValueError):
+        pass
+
+    header = headers.get('retry-after')
+    try:
+        return float(header)
+    except (TypeError, ValueError):
+        pass
+
+    # retry-after may also be an HTTP date
+    date_tuple = email.utils.parsedate_tz(header) if header else None
+    if date_tuple is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date_tuple) - time.time())
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class RetryPolicy:
+    """
+    Retry policy for chat completion calls. Transient errors are retried with
+    full-jitter exponential backoff, or after the wait requested by the server's
+    retry-after header, as long as the call stays within both its own deadline
+    and the deadline of the run; any other error is raised immediately. The run
+    deadline only applies inside run, or after start_run, so that a long-lived
+    process does not time out every call once run_deadline has passed since the
+    policy was created
+    :param max_attempts: attempts allowed per call, including the first one
+    :param base_delay: backoff before the first retry in seconds; doubles with
+        every further retry
+    :param max_delay: upper bound of the backoff in seconds
+    :param call_deadline: seconds a single call may take, including retries;
+        None disables the deadline
+    :param run_deadline: seconds all calls of a run may take from the start of
+        the run; None disables the deadline
+    :param clock: monotonic clock, replaceable for testing
+    :param jitter: function returning a random float in [0, 1), replaceable
+        for testing
+    """
+    def __init__(
+        self,
+        max_attempts=6,
+        base_delay=1.0,
+        max_delay=60.0,
+        call_deadline=None,
+        run_deadline=None,
+        clock=time.monotonic,
+        jitter=random.random
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.call_deadline = call_deadline
+        self.run_deadline = run_deadline
+        self._clock = clock
+        self._jitter = jitter
+        self.run_started = None
+        self._active_runs = 0
+        self._run_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, retry_policy):
+        """
+        build a policy from the retry_policy block of the model config
+        :param retry_policy: dict of retry settings; null deadlines are not
+            enforced
+        :return: RetryPolicy
+        """
+        return cls(
+            max_attempts=retry_policy['max_attempts'],
+            base_delay=retry_policy['base_delay_seconds'],
+            max_delay=retry_policy['max_delay_seconds'],
+            call_deadline=retry_policy.get('call_deadline_seconds'),
+            run_deadline=retry_policy.get('run_deadline_seconds')
+        )
+
+# ------------------------------------------------------------------------------
+# public methods
+# ------------------------------------------------------------------------------
+
+    def start_run(self):
+        """start the run deadline from now"""
+        self.run_started = self._clock()
+
+    @contextmanager
+    def run(self):
+        """
+        apply the run deadline to the calls made within a generation run; runs
+            nested in or overlapping a run that is already in progress, e.g. the
+            jobs of a batch, share its deadline, and the deadline is lifted once
+            the last of them ends
+        """
+        with self._run_lock:
+            if self._active_runs == 0:
+                self.start_run()
+            self._active_runs += 1
+        try:
+            yield
+        finally:
+            with self._run_lock:
+                self._active_runs -= 1
+                if self._active_runs == 0:
+                    self.run_started = None
+
+    def start_call(self):
+        """
+        start the deadline of a new call
+        :return: clock reading to pass to remaining and backoff
+        """
+        return self._clock()
+
+    def remaining(self, call_started):
+        """
+        seconds left before the earlier of the call and run deadlines; used as the
+            request timeout so that a hanging request cannot overrun them
+        :param call_started: clock reading returned by start_call
+        :return: seconds left, or None if no deadline is configured
+        :raise DeadlineExceededError: if a deadline has already passed
+        """
+        deadlines = []
+        if self.call_deadline is not None:
+            deadlines.append(call_started + self.call_deadline)
+        if self.run_deadline is not None and self.run_started is not None:
+            deadlines.append(self.run_started + self.run_deadline)
+        if not deadlines:
+            return None
+
+        left = min(deadlines) - self._clock()
+        if left <= 0:
+            raise DeadlineExceededError("Error: chat completion deadline exceeded")
+        return left
+
+    def backoff(self, error, attempt, call_started):
+        """
+        decide how to handle a failed attempt
+        :param error: exception raised by the attempt
+        :param attempt: zero-based index of the failed attempt
+        :param call_started: clock reading returned by start_call
+        :return: seconds to wait before the next attempt
+        :raise CompletionError: if the error is not retryable
+        :raise RetriesExhaustedError: if no attempts are left
+        :raise DeadlineExceededError: if the wait would overrun a deadline
+        """
+        if not is_retryable(error):
+            raise CompletionError(f"Error: chat completion failed: {error}") from error
+        if attempt + 1 >= self.max_attempts:
+            raise RetriesExhaustedError(
+                f"Error: chat completion failed after {self.max_attempts} attempts: {error}"
+            ) from error
+
+        delay = retry_after(error)
+        if delay is None:
+            delay = self._jitter() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+        left = self.remaining(call_started)
+        if left is not None and delay >= left:
+            raise DeadlineExceededError(
+                f"Error: chat completion deadline exceeded while retrying: {error}"
+            ) from error
+
+        log(f"{type(error).__name__} on attempt {attempt + 1}/{self.max_attempts}; "
+            f"retrying in {delay:.2f} seconds")
+        return delay
+
+# ------------------------------------------------------------------------------
+# end of retry_policy.py
+# ------------------------------------------------------------------------------
@@ -1,10 +1,12 @@
 # internal library imports
+import asyncio
+import itertools
 import logging
+import os
 import time
 
 # 3rd party imports
-import anthropic
-from anthropic import InternalServerError
+from anthropic import NOT_GIVEN
 from dotenv import load_dotenv
 import yaml
 
@@ -16,36 +18,286 @@ import yaml
 
 
 
+from src.utils.anthropic_client import get_async_client
+from src.utils.anthropic_client import get_client
+from src.utils.hedge_policy import HedgePolicy
 from src.utils.logger import log
+from src.utils.rate_limiter import RateLimiter
+from src.utils.response_cache import ResponseCache
+from src.utils.retry_policy import CompletionError
+from src.utils.retry_policy import RetryPolicy
+from src.utils.retry_policy import TruncatedCompletionError
+from src.utils.single_flight import SingleFlight
+from src.utils.telemetry import Telemetry
+from src.utils.token_estimator import estimate_tokens
+from src.utils.token_estimator import prompt_text
 
 load_dotenv()
 
-with open('config/model_v1.3.4.yaml', 'r') as file:
+with open('config/model_v1.3.6.yaml', 'r') as file:
     model_config = yaml.safe_load(file)
 
+# process-wide response cache shared by every completion call
+response_cache = ResponseCache(
+    cache_dir=os.getenv('RESPONSE_CACHE_PATH', './data/cache/'),
+    max_size_bytes=model_config['response_cache']['max_size_mb'] * 1024 * 1024,
+    enabled=model_config['response_cache']['enabled'],
+    bypass=model_config['response_cache']['bypass']
+)
 
+# process-wide limiter keeping all completion calls under the org's rate limits
+rate_limiter = RateLimiter.from_config(model_config['rate_limits'])
 
+# process-wide collector of one structured record per completion call
+telemetry = Telemetry(pricing=model_config['pricing'])
 
+# process-wide retry policy; its run deadline starts when the module is loaded
+retry_policy = RetryPolicy.from_config(model_config['retry_policy'])
 
+# process-wide hedging of slow requests, with its own per-stage latency samples
+hedge_policy = HedgePolicy.from_config(model_config['hedging'], model_config['max_concurrency'])
 
-def complete_single_content(
-    content,
-    max_tokens=2048
-):
+# process-wide table of calls in flight, so that identical concurrent calls are
+# answered by a single API request
+in_flight = SingleFlight()
+
+
+# ------------------------------------------------------------------------------
+# prompt content helpers
+#
+# content passed to the completion functions is either a prompt string or a list
+# of text content blocks, as built by cacheable_prompt
+# ------------------------------------------------------------------------------
+
+def cacheable_prompt(prefix, suffix):
     """
-    Calls the Anthropic chat completion API and returns the text component of the
-    API response. Includes retry logic for overloaded server errors.
+    build prompt content whose stable prefix is marked for provider-side prompt
+        caching; repeated calls sharing the prefix read it from the provider's
+        cache instead of processing it again
+    :param prefix: leading part of the prompt that repeats across calls
+    :param suffix: trailing part of the prompt that varies between calls
+    :return: list of text content blocks
+    """
+    return [
+        {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": suffix}
+    ]
+
 
+def message_content(content):
+    """
+    convert prompt content to the content field of a user message
+    :param content: prompt string or list of text content blocks
+    :return: content accepted by the messages API
+    """
+    if isinstance(content, list):
+        return content
+    return str(content)
+
+# ------------------------------------------------------------------------------
+# helper functions shared by the sync and async completion functions
+# ------------------------------------------------------------------------------
+
+def _cached_response(content, max_tokens, use_cache):
+    """
+    build the cache key of a request and look up its cached response
     :param content: string to be passed to the API
     :param max_tokens: max tokens for allowed response
+    :param use_cache: if False, the cache lookup is skipped
+    :return: tuple of the cache key and the cached response, or None on a miss
+    """
+    cache_key = response_cache.make_key(
+        model_config['anthropic_model_version'],
+        content,
+        max_tokens
+    )
+    if use_cache:
+        cached_response = response_cache.get(cache_key)
+        if cached_response is not None:
+            log(f"response served from cache: {prompt_text(content)[:60].replace('\n', ' ')}...")
+            return cache_key, cached_response
+    return cache_key, None
+
+
+def forget_response(content, max_tokens=None, stage=None):
+    """
+    remove the cached response of a request whose output was rejected by its
+        caller, e.g. truncated or unparsable JSON, so that later runs request a
+        new response instead of replaying the rejected one
+    :param content: prompt string, or content blocks built by cacheable_prompt
+    :param max_tokens: max tokens of the request; defaults to the stage's budget
+        from stage_max_tokens in the model config
+    :param stage: pipeline stage that made the request
+    """
+    if max_tokens is None:
+        max_tokens = planned_max_tokens(stage)
+    response_cache.delete(response_cache.make_key(
+        model_config['anthropic_model_version'],
+        content,
+        max_tokens
+    ))
+
+
+def planned_max_tokens(stage):
+    """
+    max_tokens budget of a pipeline stage from stage_max_tokens in the model config
+    :param stage: pipeline stage name, or None
+    :return: max tokens for the response
+    """
+    stage_max_tokens = model_config['stage_max_tokens']
+    return stage_max_tokens.get(stage, stage_max_tokens['default'])
+
+
+def _preflight_input_tokens(content, stage):
+    """
+    estimate the input tokens of a prompt for rate limit budgeting, and warn
+        when the prompt exceeds the configured input budget
+    :param content: string to be passed to the API
+    :param stage: pipeline stage making the call
+    :return: estimated token count
+    """
+    input_tokens = estimate_tokens(content)
+    max_input_tokens = model_config['input_token_budget']['max_input_tokens']
+    if max_input_tokens is not None and input_tokens > max_input_tokens:
+        log(f"Warning: {stage or 'unlabeled'} prompt is an estimated {input_tokens} "
+            f"tokens, over the input budget of {max_input_tokens}")
+    return input_tokens
+
+
+def _prompt_cache_usage(completion):
+    """
+    read the prompt cache token counts of a completion; prompt tokens written to
+        the provider's cache are cache misses, prompt tokens read from it are hits
+    :param completion: message returned by the API
+    :return: tuple of cache write tokens and cache read tokens
+    """
+    return (
+        getattr(completion.usage, 'cache_creation_input_tokens', None) or 0,
+        getattr(completion.usage, 'cache_read_input_tokens', None) or 0
+    )
+
+
+def _log_completion(content, completion, duration):
+    """
+    log the duration, token usage, prompt and output of a completed API call
+    :param content: prompt content passed to the API
+    :param completion: message returned by the API
+    :param duration: API call duration in seconds
+    """
+    content = prompt_text(content)
+    cache_write_tokens, cache_read_tokens = _prompt_cache_usage(completion)
+    print_output = (
+f"""query returned from Anthropic API
+API call duration:    {duration}
+input tokens:         {completion.usage.input_tokens}
+output tokens:        {completion.usage.output_tokens}
+cache write tokens:   {cache_write_tokens}
+cache read tokens:    {cache_read_tokens}
+"""
+    )
+
+    if model_config['verbose_prompt']:
+        print_output += f"prompt:               {content.replace('\n', ' ')}\n"
+    else:
+        print_output += f"prompt:               {content[:60].replace('\n', ' ')}...\n"
+    if model_config['verbose_output']:
+        print_output += f"output:               {completion.content[0].text.replace('\n', ' ')}"
+    else:
+        print_output += f"output:               {completion.content[0].text[:60].replace('\n', ' ')}..."
+
+    log(print_output)
+
+
+def _record_completion(stage, employer_index, completion, duration, retries, use_cache, hedged=False):
+    """
+    add the telemetry record of a completed API call
+    :param stage: pipeline stage that made the call
+    :param employer_index: index of the employer for per-employer stages
+    :param completion: message returned by the API
+    :param duration: seconds from the call until its response was available,
+        including retries
+    :param retries: number of failed attempts before the call succeeded
+    :param use_cache: whether the response cache was consulted before the call
+    :param hedged: whether a hedge was sent for the request that succeeded
+    """
+    cache_write_tokens, cache_read_tokens = _prompt_cache_usage(completion)
+    if use_cache and response_cache.enabled and not response_cache.bypass:
+        cache_status = 'miss'
+    else:
+        cache_status = 'bypass'
+    telemetry.record(
+        stage=stage,
+        employer_index=employer_index,
+        latency=duration,
+        input_tokens=completion.usage.input_tokens,
+        output_tokens=completion.usage.output_tokens,
+        cache_write_tokens=cache_write_tokens,
+        cache_read_tokens=cache_read_tokens,
+        retries=retries,
+        cache_status=cache_status,
+        hedged=hedged
+    )
+
+def _check_truncation(completion, max_tokens, stage):
+    """
+    reject a response that stopped at its max_tokens budget; it is not cached,
+        since its output is incomplete
+    :param completion: message returned by the API
+    :param max_tokens: max tokens of the request
+    :param stage: pipeline stage that made the call
+    :raise TruncatedCompletionError: if the response was truncated
+    """
+    if completion.stop_reason == 'max_tokens':
+        raise TruncatedCompletionError(
+            f"Error: {stage or 'chat completion'} response truncated at max_tokens={max_tokens}",
+            max_tokens
+        )
+
+
+def _request_timeout(call_started):
+    """
+    timeout of the next request, so that a hanging request cannot overrun the
+        call or run deadline
+    :param call_started: clock reading returned by retry_policy.start_call
+    :return: seconds left, or NOT_GIVEN to keep the client's default timeout
+    """
+    remaining = retry_policy.remaining(call_started)
+    return NOT_GIVEN if remaining is None else remaining
+
+# ------------------------------------------------------------------------------
+# API requests shared by identical concurrent calls
+# ------------------------------------------------------------------------------
+
+def _record_coalesced(content, stage, employer_index):
+    """
+    log and record a call answered by an identical call that was already in flight
+    :param content: prompt content of the call
+    :param stage: pipeline stage that made the call
+    :param employer_index: index of the employer for per-employer stages
+    """
+    log(f"response shared with an identical call in flight: {prompt_text(content)[:60].replace('\n', ' ')}...")
+    telemetry.record(stage=stage, employer_index=employer_index, cache_status='coalesced')
+
+
+def _request_completion(content, max_tokens, use_cache, cache_key, stage, employer_index):
+    """
+    request a completion from the API with retries and hedging, and cache its text
+    :param content: prompt string, or content blocks built by cacheable_prompt
+    :param max_tokens: max tokens for allowed response
+    :param use_cache: whether the response cache was consulted before the call
+    :param cache_key: response cache key of the request
+    :param stage: pipeline stage making the call
+    :param employer_index: employer index of per-employer stages
     :return: text component of the API response
     """
-    client = anthropic.Anthropic()
+    client = get_client()
     start_time = time.time()
-    max_retries = 3
-    retry_delay = 5
+    call_started = retry_policy.start_call()
+
+    reserved_input = _preflight_input_tokens(content, stage)
 
-    for attempt in range(max_retries):
+    def send():
+        rate_limiter.acquire(reserved_input, max_tokens)
         try:
             completion = client.messages.create(
                 model=model_config['anthropic_model_version'],
@@ -53,53 +305,279 @@ def complete_single_content(
                 messages=[
                     {
                         "role": "user",
-                        "content": str(content)}
-                ]
+                        "content": message_content(content)}
+                ],
+                timeout=_request_timeout(call_started)
             )
+        except BaseException:
+            rate_limiter.release(reserved_input, max_tokens)
+            raise
 
-            end_time = time.time()
-            duration = end_time - start_time
+        rate_limiter.settle(
+            reserved_input,
+            max_tokens,
+            completion.usage.input_tokens + _prompt_cache_usage(completion)[0],
+            completion.usage.output_tokens
+        )
+        return completion
 
-            print_output = (
-f"""query returned from Anthropic API
-API call duration:    {duration}
-input tokens:         {completion.usage.input_tokens}
-output tokens:        {completion.usage.output_tokens}
-"""
-            )
+    for attempt in itertools.count():
+        try:
+            completion, hedged = hedge_policy.run(stage, send)
+            duration = time.time() - start_time
+            _log_completion(content, completion, duration)
+            _record_completion(stage, employer_index, completion, duration, attempt, use_cache, hedged)
+            _check_truncation(completion, max_tokens, stage)
 
-            if model_config['verbose_prompt']:
-                print_output += f"prompt:               {content.replace('\n', ' ')}\n"
-            else:
-                print_output += f"prompt:               {content[:60].replace('\n', ' ')}...\n"
-            if model_config['verbose_output']:
-                print_output += f"output:               {completion.content[0].text.replace('\n', ' ')}\n"
-            else:
-                print_output += f"output:               {completion.content[0].text[:60].replace('\n', ' ')}...\n"
-
-            print_output += (
-f"""API call duration:    {duration}
-input tokens:         {completion.usage.input_tokens}
-output tokens:        {completion.usage.output_tokens}"""
+            response_cache.set(cache_key, completion.content[0].text)
+
+            return completion.content[0].text
+
+        except CompletionError:
+            raise
+
+        except Exception as e:
+            time.sleep(retry_policy.backoff(e, attempt, call_started))
+
+
+async def _async_request_completion(content, max_tokens, use_cache, cache_key, stage, employer_index):
+    """
+    async counterpart of _request_completion
+    :param content: prompt string, or content blocks built by cacheable_prompt
+    :param max_tokens: max tokens for allowed response
+    :param use_cache: whether the response cache was consulted before the call
+    :param cache_key: response cache key of the request
+    :param stage: pipeline stage making the call
+    :param employer_index: employer index of per-employer stages
+    :return: text component of the API response
+    """
+    client = get_async_client()
+    start_time = time.time()
+    call_started = retry_policy.start_call()
+
+    reserved_input = _preflight_input_tokens(content, stage)
+
+    async def send():
+        await rate_limiter.async_acquire(reserved_input, max_tokens)
+        try:
+            completion = await client.messages.create(
+                model=model_config['anthropic_model_version'],
+                max_tokens=max_tokens,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": message_content(content)}
+                ],
+                timeout=_request_timeout(call_started)
             )
-            log(print_output)
+        except BaseException:
+            # also a hedge cancelled while its request was in flight
+            rate_limiter.release(reserved_input, max_tokens)
+            raise
+
+        rate_limiter.settle(
+            reserved_input,
+            max_tokens,
+            completion.usage.input_tokens + _prompt_cache_usage(completion)[0],
+            completion.usage.output_tokens
+        )
+        return completion
+
+    for attempt in itertools.count():
+        try:
+            completion, hedged = await hedge_policy.async_run(stage, send)
+            duration = time.time() - start_time
+            _log_completion(content, completion, duration)
+            _record_completion(stage, employer_index, completion, duration, attempt, use_cache, hedged)
+            _check_truncation(completion, max_tokens, stage)
+
+            # cache files are written from a worker thread to keep the event loop free
+            await asyncio.to_thread(response_cache.set, cache_key, completion.content[0].text)
 
             return completion.content[0].text
 
-        except InternalServerError as e:
-            error_dict = e.response.json() if hasattr(e, 'response') else {}
-            if error_dict.get('error', {}).get('type') == 'overloaded_error':
-                if attempt < max_retries - 1:
-                    print(
-                        f"Server overloaded. Attempt {attempt + 1}/{max_retries}. Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    continue
-                else:
-                    print("Max retries reached. Server still overloaded.")
-            else:
-                print(f"An unexpected InternalServerError occurred: {e}")
-            return None
+        except CompletionError:
+            raise
+
+        except Exception as e:
+            await asyncio.sleep(retry_policy.backoff(e, attempt, call_started))
+
+# ------------------------------------------------------------------------------
+# completion functions
+# ------------------------------------------------------------------------------
+
+def complete_single_content(
+    content,
+    max_tokens=None,
+    use_cache=True,
+    stage=None,
+    employer_index=None
+):
+    """
+    Calls the Anthropic chat completion API and returns the text component of the
+    API response. Transient errors are retried according to retry_policy, and
+    slow requests are hedged according to hedge_policy. Responses are served
+    from and written to the on-disk response cache, and a call identical to one
+    already in flight waits for that call's response instead of sending its own.
+
+    :param content: prompt string, or content blocks built by cacheable_prompt
+    :param max_tokens: max tokens for allowed response; defaults to the stage's
+        budget from stage_max_tokens in the model config
+    :param use_cache: if False, the cache lookup is skipped and the new response
+        replaces the cached one
+    :param stage: pipeline stage making the call, recorded in the telemetry
+    :param employer_index: employer index of per-employer stages, recorded in
+        the telemetry
+    :return: text component of the API response
+    :raise CompletionError: if the call fails, runs out of retries, or overruns
+        its call or run deadline; TruncatedCompletionError if the response
+        stopped at max_tokens
+    """
+    if max_tokens is None:
+        max_tokens = planned_max_tokens(stage)
+
+    cache_key, cached_response = _cached_response(content, max_tokens, use_cache)
+    if cached_response is not None:
+        telemetry.record(stage=stage, employer_index=employer_index, cache_status='hit')
+        return cached_response
+
+    response, coalesced = in_flight.run(
+        cache_key,
+        lambda: _request_completion(content, max_tokens, use_cache, cache_key, stage, employer_index)
+    )
+    if coalesced:
+        _record_coalesced(content, stage, employer_index)
+    return response
+
+
+async def async_complete_single_content(
+    content,
+    max_tokens=None,
+    use_cache=True,
+    stage=None,
+    employer_index=None
+):
+    """
+    Async counterpart of complete_single_content built on the async Anthropic
+    client; awaiting it yields the event loop instead of blocking a thread, so a
+    single loop can keep many API calls in flight. Response cache files are read
+    and written from worker threads, off the event loop.
+
+    :param content: prompt string, or content blocks built by cacheable_prompt
+    :param max_tokens: max tokens for allowed response; defaults to the stage's
+        budget from stage_max_tokens in the model config
+    :param use_cache: if False, the cache lookup is skipped and the new response
+        replaces the cached one
+    :param stage: pipeline stage making the call, recorded in the telemetry
+    :param employer_index: employer index of per-employer stages, recorded in
+        the telemetry
+    :return: text component of the API response
+    :raise CompletionError: if the call fails, runs out of retries, or overruns
+        its call or run deadline; TruncatedCompletionError if the response
+        stopped at max_tokens
+    """
+    if max_tokens is None:
+        max_tokens = planned_max_tokens(stage)
+
+    cache_key, cached_response = await asyncio.to_thread(_cached_response, content, max_tokens, use_cache)
+    if cached_response is not None:
+        telemetry.record(stage=stage, employer_index=employer_index, cache_status='hit')
+        return cached_response
+
+    response, coalesced = await in_flight.async_run(
+        cache_key,
+        lambda: _async_request_completion(content, max_tokens, use_cache, cache_key, stage, employer_index)
+    )
+    if coalesced:
+        _record_coalesced(content, stage, employer_index)
+    return response
+
+
+def stream_single_content(
+    content,
+    max_tokens=None,
+    use_cache=True,
+    stage=None,
+    employer_index=None
+):
+    """
+    Streaming counterpart of complete_single_content that yields the text of the
+    API response as it is generated. The joined deltas equal the text returned
+    by complete_single_content, and the full response is cached the same way; a
+    cached response is yielded as a single delta. Streams are not hedged, since
+    text already yielded cannot be taken back.
+
+    :param content: prompt string, or content blocks built by cacheable_prompt
+    :param max_tokens: max tokens for allowed response; defaults to the stage's
+        budget from stage_max_tokens in the model config
+    :param use_cache: if False, the cache lookup is skipped and the new response
+        replaces the cached one
+    :param stage: pipeline stage making the call, recorded in the telemetry
+    :param employer_index: employer index of per-employer stages, recorded in
+        the telemetry
+    :return: generator of text deltas
+    :raise CompletionError: if the call fails before any text is yielded, or the
+        stream is interrupted afterwards; TruncatedCompletionError if the
+        response stopped at max_tokens
+    """
+    if max_tokens is None:
+        max_tokens = planned_max_tokens(stage)
+
+    cache_key, cached_response = _cached_response(content, max_tokens, use_cache)
+    if cached_response is not None:
+        telemetry.record(stage=stage, employer_index=employer_index, cache_status='hit')
+        yield cached_response
+        return
+
+    client = get_client()
+    start_time = time.time()
+    call_started = retry_policy.start_call()
+
+    reserved_input = _preflight_input_tokens(content, stage)
+
+    for attempt in itertools.count():
+        streamed = False
+        try:
+            rate_limiter.acquire(reserved_input, max_tokens)
+            try:
+                with client.messages.stream(
+                    model=model_config['anthropic_model_version'],
+                    max_tokens=max_tokens,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": message_content(content)}
+                    ],
+                    timeout=_request_timeout(call_started)
+                ) as stream:
+                    for text in stream.text_stream:
+                        streamed = True
+                        yield text
+                    completion = stream.get_final_message()
+            except BaseException:
+                rate_limiter.release(reserved_input, max_tokens)
+                raise
+
+            rate_limiter.settle(
+                reserved_input,
+                max_tokens,
+                completion.usage.input_tokens + _prompt_cache_usage(completion)[0],
+                completion.usage.output_tokens
+            )
+            duration = time.time() - start_time
+            _log_completion(content, completion, duration)
+            _record_completion(stage, employer_index, completion, duration, attempt, use_cache)
+            _check_truncation(completion, max_tokens, stage)
+
+            response_cache.set(cache_key, completion.content[0].text)
+
+            return
+
+        except CompletionError:
+            raise
 
         except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-            return None
\ No newline at end of file
+            # a stream that already yielded text cannot be retried transparently
+            if streamed:
+                raise CompletionError(f"Error: response stream interrupted: {e}") from e
+            time.sleep(retry_policy.backoff(e, attempt, call_started))
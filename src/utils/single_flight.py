@@ -0,0 +1,99 @@
+# standard library imports
+import asyncio
+from concurrent.futures import Future
+import threading
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller makes the
+    call, and callers arriving while it is in flight wait for its result instead
+    of making their own. Threads and event loops share one table of in-flight
+    calls, so a caller on either engine can wait on a call made by the other
+    """
+    def __init__(self):
+        # maps key to the future of the call in flight
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _claim(self, key):
+        """
+        find the in-flight call of a key, or register a new one
+        :param key: hashable call key
+        :return: tuple of the call's future and whether the caller must make the call
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _release(self, key):
+        with self._lock:
+            del self._calls[key]
+
+    def in_flight(self):
+        """
+        :return: number of calls in flight
+        """
+        with self._lock:
+            return len(self._calls)
+
+# ------------------------------------------------------------------------------
+# public methods
+# ------------------------------------------------------------------------------
+
+    def run(self, key, function):
+        """
+        make a call, or wait for the identical call already in flight
+        :param key: hashable call key
+        :param function: callable run without arguments
+        :return: tuple of the call's result and whether it was shared from
+            another caller's call
+        :raise Exception: the error raised by the call, for every waiting caller
+        """
+        future, leader = self._claim(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._release(key)
+
+    async def async_run(self, key, function):
+        """
+        async counterpart of run
+        :param key: hashable call key
+        :param function: coroutine function run without arguments
+        :return: tuple of the call's result and whether it was shared from
+            another caller's call
+        :raise Exception: the error raised by the call, for every waiting caller
+        """
+        future, leader = self._claim(key)
+        if not leader:
+            return await asyncio.wrap_future(future), True
+        try:
+            result = await function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._release(key)
+
+# ------------------------------------------------------------------------------
+# end of single_flight.py
+# ------------------------------------------------------------------------------
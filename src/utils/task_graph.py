@@ -0,0 +1,192 @@
+# standard library imports
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# custom/internal imports
+from src.utils.logger import log
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+def task_label(key):
+    """
+    readable label of a task key, e.g. ('verify_experience', 0) -> verify_experience[0]
+    :param key: task key; a tuple of the task name and its arguments
+    :return: label string
+    """
+    if isinstance(key, tuple):
+        name, *args = key
+        return name + "".join(f"[{arg}]" for arg in args)
+    return str(key)
+
+
+class _SkippedTask(Exception):
+    """raised in place of a task whose dependencies failed"""
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class TaskGraph:
+    """
+    Dependency graph of tasks. Every task starts as soon as the tasks it depends
+    on have completed, rather than waiting for a whole stage of unrelated tasks,
+    so the run takes as long as its slowest chain of dependent tasks. A failed
+    task does not stop independent tasks; its dependents are skipped, and the
+    run raises once every other task has finished
+    """
+    def __init__(self):
+        # maps task key to (function, keys of the tasks it depends on)
+        self.tasks = {}
+        # keys of tasks completed by an earlier run, which are not run again
+        self.completed = set()
+
+    def add(self, key, function, depends_on=(), completed=False):
+        """
+        add a task to the graph
+        :param key: unique, hashable key of the task
+        :param function: callable run without arguments; a coroutine function
+            when the graph is run with async_run
+        :param depends_on: keys of the tasks that must complete first
+        :param completed: if True, the task already completed in an earlier run;
+            it counts as done for its dependents and is not run
+        """
+        if key in self.tasks:
+            raise ValueError(f"Error: duplicate task {task_label(key)}")
+        self.tasks[key] = (function, tuple(depends_on))
+        if completed:
+            self.completed.add(key)
+
+    def _topological_order(self):
+        """
+        order the tasks so that every task follows its dependencies
+        :return: list of task keys
+        """
+        for key, (_, depends_on) in self.tasks.items():
+            for dependency in depends_on:
+                if dependency not in self.tasks:
+                    raise ValueError(
+                        f"Error: task {task_label(key)} depends on unknown task {task_label(dependency)}"
+                    )
+
+        order = []
+        state = {}
+        for root in self.tasks:
+            # iterative depth-first search; state is 1 while on the stack, 2 when done
+            stack = [(root, iter(self.tasks[root][1]))]
+            if state.get(root) == 2:
+                continue
+            state[root] = 1
+            while stack:
+                key, dependencies = stack[-1]
+                dependency = next(dependencies, None)
+                if dependency is None:
+                    stack.pop()
+                    state[key] = 2
+                    order.append(key)
+                elif state.get(dependency) == 1:
+                    raise ValueError(f"Error: dependency cycle at task {task_label(dependency)}")
+                elif dependency not in state:
+                    state[dependency] = 1
+                    stack.append((dependency, iter(self.tasks[dependency][1])))
+        return order
+
+    def _raise_for_errors(self, errors, skipped):
+        """
+        log the failed and skipped tasks of a run and raise the first failure
+        :param errors: dict mapping task key to the exception it raised
+        :param skipped: number of tasks skipped due to failed dependencies
+        """
+        if not errors:
+            return
+        for key, error in errors.items():
+            log(f"Error in {task_label(key)} task: {error}")
+        if skipped:
+            log(f"{skipped} dependent tasks were skipped")
+        first_key = next(iter(errors))
+        raise RuntimeError(f"Failed to complete {task_label(first_key)} task") from errors[first_key]
+
+# ------------------------------------------------------------------------------
+# public methods
+# ------------------------------------------------------------------------------
+
+    def run(self, max_workers):
+        """
+        run the graph on a thread pool
+        :param max_workers: maximum number of tasks running at once
+        :raise RuntimeError: if any task failed, after all other tasks finished
+        """
+        self._topological_order()
+
+        pending = [key for key in self.tasks if key not in self.completed]
+        waiting_on = {
+            key: len(set(self.tasks[key][1]) - self.completed)
+            for key in pending
+        }
+        dependents = {key: [] for key in self.tasks}
+        for key in pending:
+            for dependency in set(self.tasks[key][1]) - self.completed:
+                dependents[dependency].append(key)
+
+        errors = {}
+        finished = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {
+                executor.submit(self.tasks[key][0]): key
+                for key, count in waiting_on.items() if count == 0
+            }
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    finished += 1
+                    try:
+                        future.result()
+                    except Exception as e:
+                        errors[key] = e
+                        continue
+                    for dependent in dependents[key]:
+                        waiting_on[dependent] -= 1
+                        if waiting_on[dependent] == 0:
+                            running[executor.submit(self.tasks[dependent][0])] = dependent
+
+        self._raise_for_errors(errors, len(pending) - finished)
+
+    async def async_run(self):
+        """
+        run the graph on the running event loop; every task function must be a
+            coroutine function
+        :raise RuntimeError: if any task failed, after all other tasks finished
+        """
+        futures = {}
+
+        async def run_task(key):
+            if key in self.completed:
+                return
+            function, depends_on = self.tasks[key]
+            results = await asyncio.gather(
+                *(futures[dependency] for dependency in depends_on),
+                return_exceptions=True
+            )
+            if any(isinstance(result, Exception) for result in results):
+                raise _SkippedTask()
+            await function()
+
+        # dependencies are scheduled before their dependents
+        for key in self._topological_order():
+            futures[key] = asyncio.ensure_future(run_task(key))
+        results = await asyncio.gather(*futures.values(), return_exceptions=True)
+
+        errors = {}
+        skipped = 0
+        for key, result in zip(futures, results):
+            if isinstance(result, _SkippedTask):
+                skipped += 1
+            elif isinstance(result, Exception):
+                errors[key] = result
+        self._raise_for_errors(errors, skipped)
+
+# ------------------------------------------------------------------------------
+# end of task_graph.py
+# ------------------------------------------------------------------------------
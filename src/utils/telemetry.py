@@ -0,0 +1,266 @@
+# standard library imports
+import json
+import math
+import os
+import threading
+import time
+
+# custom/internal imports
+from src.utils.atomic_write import write_atomically
+from src.utils.logger import log
+
+# ------------------------------------------------------------------------------
+# helper functions
+# ------------------------------------------------------------------------------
+
+def percentile(values, q):
+    """
+    nearest-rank percentile of a list of values
+    :param values: list of numbers
+    :param q: percentile between 0 and 100
+    :return: percentile value, or None for an empty list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+# cache statuses of calls that sent an API request
+API_CACHE_STATUSES = ('miss', 'bypass')
+
+
+def _prometheus_labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+# ------------------------------------------------------------------------------
+# class object definition
+# ------------------------------------------------------------------------------
+
+class Telemetry:
+    """
+    Thread-safe collector of one structured record per chat completion call,
+    with a per-stage run summary that can be exported as JSONL or in the
+    Prometheus text exposition format
+    :param pricing: dollars per million tokens, keyed by input_per_mtok,
+        output_per_mtok, cache_write_per_mtok and cache_read_per_mtok
+    """
+    def __init__(self, pricing=None):
+        self.pricing = pricing or {}
+        self.records = []
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        stage=None,
+        employer_index=None,
+        latency=0.0,
+        input_tokens=0,
+        output_tokens=0,
+        cache_write_tokens=0,
+        cache_read_tokens=0,
+        retries=0,
+        cache_status='miss',
+        hedged=False
+    ):
+        """
+        add the record of one chat completion call
+        :param stage: pipeline stage that made the call
+        :param employer_index: index of the employer for per-employer stages
+        :param latency: seconds from the call until its response was available
+        :param input_tokens: uncached input tokens reported by the API
+        :param output_tokens: output tokens reported by the API
+        :param cache_write_tokens: input tokens written to the provider's prompt cache
+        :param cache_read_tokens: input tokens read from the provider's prompt cache
+        :param retries: number of failed attempts before the call succeeded
+        :param cache_status: 'hit' if served by the response cache, 'miss' if the
+            API was called, 'bypass' if the cache lookup was skipped,
+            'coalesced' if answered by an identical call already in flight
+        :param hedged: whether a hedge request was sent for the call
+        """
+        record = {
+            'timestamp': time.time(),
+            'stage': stage or 'unlabeled',
+            'employer_index': employer_index,
+            'latency': latency,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'cache_write_tokens': cache_write_tokens,
+            'cache_read_tokens': cache_read_tokens,
+            'retries': retries,
+            'cache_status': cache_status,
+            'hedged': hedged,
+        }
+        with self._lock:
+            self.records.append(record)
+
+    def stage_latencies(self, stage):
+        """
+        latencies of the API calls made by a stage; calls answered without an API
+            request are excluded
+        :param stage: pipeline stage name
+        :return: list of latencies in seconds
+        """
+        with self._lock:
+            return [
+                record['latency'] for record in self.records
+                if record['stage'] == stage and record['cache_status'] in API_CACHE_STATUSES
+            ]
+
+    def _cost(self, record):
+        return (
+            record['input_tokens'] * self.pricing.get('input_per_mtok', 0) +
+            record['output_tokens'] * self.pricing.get('output_per_mtok', 0) +
+            record['cache_write_tokens'] * self.pricing.get('cache_write_per_mtok', 0) +
+            record['cache_read_tokens'] * self.pricing.get('cache_read_per_mtok', 0)
+        ) / 1_000_000
+
+# ------------------------------------------------------------------------------
+# run summary
+# ------------------------------------------------------------------------------
+
+    def summary(self):
+        """
+        aggregate the call records per stage, in order of each stage's first call
+        :return: list of dicts, one per stage
+        """
+        with self._lock:
+            records = list(self.records)
+
+        stages = {}
+        for record in records:
+            stages.setdefault(record['stage'], []).append(record)
+
+        summary = []
+        for stage, stage_records in stages.items():
+            api_records = [r for r in stage_records if r['cache_status'] in API_CACHE_STATUSES]
+            latencies = [r['latency'] for r in api_records]
+            summary.append({
+                'stage': stage,
+                'calls': len(stage_records),
+                'cache_hits': sum(1 for r in stage_records if r['cache_status'] == 'hit'),
+                'coalesced': sum(1 for r in stage_records if r['cache_status'] == 'coalesced'),
+                'retries': sum(r['retries'] for r in stage_records),
+                'hedges': sum(1 for r in stage_records if r['hedged']),
+                'latency_p50': percentile(latencies, 50),
+                'latency_p95': percentile(latencies, 95),
+                'latency_total': sum(latencies),
+                'input_tokens': sum(r['input_tokens'] for r in stage_records),
+                'output_tokens': sum(r['output_tokens'] for r in stage_records),
+                'cache_write_tokens': sum(r['cache_write_tokens'] for r in stage_records),
+                'cache_read_tokens': sum(r['cache_read_tokens'] for r in stage_records),
+                'estimated_cost': sum(self._cost(r) for r in stage_records),
+            })
+        return summary
+
+    def log_summary(self):
+        """log the per-stage summary as a table"""
+        def seconds(value):
+            return "-" if value is None else f"{value:.2f}"
+
+        lines = [
+            f"{'stage':<34}{'calls':>6}{'hits':>6}{'hedge':>6}{'p50 s':>8}{'p95 s':>8}"
+            f"{'in tok':>9}{'out tok':>9}{'cost $':>9}"
+        ]
+        for row in self.summary():
+            lines.append(
+                f"{row['stage']:<34}{row['calls']:>6}{row['cache_hits']:>6}{row['hedges']:>6}"
+                f"{seconds(row['latency_p50']):>8}{seconds(row['latency_p95']):>8}"
+                f"{row['input_tokens']:>9}{row['output_tokens']:>9}"
+                f"{row['estimated_cost']:>9.4f}"
+            )
+        log("LLM call summary:\n" + "\n".join(lines))
+
+    def export_calls_jsonl(self, path):
+        """
+        write every call record to a JSONL file
+        :param path: output file path
+        """
+        with self._lock:
+            records = list(self.records)
+        write_atomically(path, "".join(json.dumps(record) + "\n" for record in records).encode('utf-8'))
+
+    def export_summary_jsonl(self, path):
+        """
+        write the per-stage summary to a JSONL file, one line per stage
+        :param path: output file path
+        """
+        write_atomically(path, "".join(json.dumps(row) + "\n" for row in self.summary()).encode('utf-8'))
+
+    def export_prometheus(self, path):
+        """
+        write the per-stage summary in the Prometheus text exposition format
+        :param path: output file path
+        """
+        summary = self.summary()
+        prefix = 'resume_generator_llm'
+        lines = []
+
+        lines.append(f"# HELP {prefix}_calls_total Chat completion calls per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_calls_total counter")
+        for row in summary:
+            lines.append(f"{prefix}_calls_total{_prometheus_labels(stage=row['stage'])} {row['calls']}")
+
+        lines.append(f"# HELP {prefix}_cache_hits_total Calls served by the response cache per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_cache_hits_total counter")
+        for row in summary:
+            lines.append(f"{prefix}_cache_hits_total{_prometheus_labels(stage=row['stage'])} {row['cache_hits']}")
+
+        lines.append(f"# HELP {prefix}_coalesced_total Calls answered by an identical call in flight per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_coalesced_total counter")
+        for row in summary:
+            lines.append(f"{prefix}_coalesced_total{_prometheus_labels(stage=row['stage'])} {row['coalesced']}")
+
+        lines.append(f"# HELP {prefix}_retries_total Failed API attempts that were retried per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_retries_total counter")
+        for row in summary:
+            lines.append(f"{prefix}_retries_total{_prometheus_labels(stage=row['stage'])} {row['retries']}")
+
+        lines.append(f"# HELP {prefix}_hedges_total Calls that sent a hedge request per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_hedges_total counter")
+        for row in summary:
+            lines.append(f"{prefix}_hedges_total{_prometheus_labels(stage=row['stage'])} {row['hedges']}")
+
+        lines.append(f"# HELP {prefix}_latency_seconds API call latency per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_latency_seconds summary")
+        for row in summary:
+            for quantile, key in (("0.5", 'latency_p50'), ("0.95", 'latency_p95')):
+                if row[key] is not None:
+                    labels = _prometheus_labels(stage=row['stage'], quantile=quantile)
+                    lines.append(f"{prefix}_latency_seconds{labels} {row[key]}")
+            labels = _prometheus_labels(stage=row['stage'])
+            lines.append(f"{prefix}_latency_seconds_sum{labels} {row['latency_total']}")
+            lines.append(f"{prefix}_latency_seconds_count{labels} {row['calls'] - row['cache_hits'] - row['coalesced']}")
+
+        lines.append(f"# HELP {prefix}_tokens_total Tokens per pipeline stage and token type.")
+        lines.append(f"# TYPE {prefix}_tokens_total counter")
+        for row in summary:
+            for token_type in ('input', 'output', 'cache_write', 'cache_read'):
+                labels = _prometheus_labels(stage=row['stage'], type=token_type)
+                lines.append(f"{prefix}_tokens_total{labels} {row[token_type + '_tokens']}")
+
+        lines.append(f"# HELP {prefix}_cost_dollars_total Estimated API cost per pipeline stage.")
+        lines.append(f"# TYPE {prefix}_cost_dollars_total counter")
+        for row in summary:
+            lines.append(f"{prefix}_cost_dollars_total{_prometheus_labels(stage=row['stage'])} {row['estimated_cost']}")
+
+        write_atomically(path, ("\n".join(lines) + "\n").encode('utf-8'))
+
+    def export_run(self, output_dir, run_name):
+        """
+        log the run summary and export the call records, the summary and the
+        Prometheus metrics of a run; each file is written atomically, so a job
+        scraping or syncing the directory never reads a partial export
+        :param output_dir: directory to write the files to
+        :param run_name: file name prefix of the exported files
+        """
+        self.log_summary()
+        self.export_calls_jsonl(os.path.join(output_dir, f"{run_name}-calls.jsonl"))
+        self.export_summary_jsonl(os.path.join(output_dir, f"{run_name}-summary.jsonl"))
+        self.export_prometheus(os.path.join(output_dir, f"{run_name}.prom"))
+        log(f"LLM call telemetry exported to {output_dir}")
+
+# ------------------------------------------------------------------------------
+# end of telemetry.py
+# ------------------------------------------------------------------------------
@@ -0,0 +1,79 @@
+# standard library imports
+import math
+import re
+
+# ------------------------------------------------------------------------------
+# token estimation
+#
+# a local approximation of the tokenizer; it runs before every API call, so it
+# has to be cheap and needs no network round trip, at the cost of being within
+# roughly 10-20% of the count reported by the API for English prose and JSON
+# ------------------------------------------------------------------------------
+
+# words, digit runs, and single punctuation or symbol characters
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def prompt_text(content):
+    """
+    flatten prompt content to plain text
+    :param content: prompt string or list of text content blocks
+    :return: prompt text
+    """
+    if isinstance(content, list):
+        return "".join(block['text'] for block in content)
+    return str(content)
+
+
+def estimate_tokens(content):
+    """
+    estimate the number of tokens of a prompt
+    :param content: prompt string or list of text content blocks
+    :return: estimated token count
+    """
+    tokens = 0
+    for piece in _PIECES.findall(prompt_text(content)):
+        if piece[0].isalpha():
+            # common words are a single token, long words split every ~6 letters
+            tokens += 1 + (len(piece) - 1) // 6
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return tokens
+
+# ------------------------------------------------------------------------------
+# input budget
+# ------------------------------------------------------------------------------
+
+def trim_to_budget(build_prompt, prompt_inputs, max_input_tokens):
+    """
+    drop the last items of the longest list input of a prompt until the prompt
+        fits the input budget; list inputs are ordered by priority, so the
+        lowest priority items are dropped first
+    :param build_prompt: function building the prompt content from the inputs
+    :param prompt_inputs: dict of prompt inputs; it is not modified
+    :param max_input_tokens: input token budget of the prompt
+    :return: tuple of the prompt content and the number of items dropped
+    """
+    prompt_inputs = dict(prompt_inputs)
+    content = build_prompt(prompt_inputs)
+    dropped = 0
+
+    while estimate_tokens(content) > max_input_tokens:
+        list_inputs = [
+            key for key, value in prompt_inputs.items()
+            if isinstance(value, list) and len(value) > 1
+        ]
+        if not list_inputs:
+            break
+        longest = max(list_inputs, key=lambda key: estimate_tokens(str(prompt_inputs[key])))
+        prompt_inputs[longest] = prompt_inputs[longest][:-1]
+        dropped += 1
+        content = build_prompt(prompt_inputs)
+
+    return content, dropped
+
+# ------------------------------------------------------------------------------
+# end of token_estimator.py
+# ------------------------------------------------------------------------------
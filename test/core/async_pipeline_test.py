@@ -0,0 +1,62 @@
+import asyncio
+import os
+import threading
+import pytest
+from conftest import STAGE_OUTPUTS, respond_by_stage, stage_of
+from src.core.generated_resume import GeneratedResume
+from src.utils import single_content_completion
+
+
+def test_async_complete_single_content_caches_response(anthropic_client):
+	"""Test that an async completion is answered by the async client once, then from the response cache"""
+	messages = anthropic_client(lambda prompt: "an answer")
+	for _ in range(2):
+		response = asyncio.run(single_content_completion.async_complete_single_content("a question", stage='company_info'))
+		assert response == "an answer"
+	assert len(messages.requests) == 1
+	assert len(os.listdir(single_content_completion.response_cache.cache_dir)) == 1
+
+
+def test_async_generate_resume_content(job_description, anthropic_client):
+	"""Test that the async engine runs every stage through the async client, writes checkpoints off the event loop, and matches the threaded pipeline"""
+	messages = anthropic_client(respond_by_stage)
+	resume = GeneratedResume(job_description=job_description)
+	save = resume.checkpoint.save
+	save_threads = []
+	def record_save(completed_tasks, state):
+		save_threads.append(threading.current_thread())
+		save(completed_tasks, state)
+	resume.checkpoint.save = record_save
+
+	asyncio.run(resume.async_generate_resume_content())
+	async_requests = len(messages.requests)
+	assert save_threads and threading.main_thread() not in save_threads
+	assert not os.path.exists(resume.checkpoint.path)
+	assert [employer['role_title'] for employer in resume.professional_experience_output] == \
+		[STAGE_OUTPUTS['generate_role_title']] * resume.professional_experience_count
+
+	single_content_completion.response_cache.enabled = False
+	threaded = GeneratedResume(job_description=job_description)
+	threaded.model_config['incremental_regeneration'] = False
+	threaded.generate_resume_content()
+	assert threaded.professional_experience_output == resume.professional_experience_output
+	assert {stage_of(prompt) for prompt, _ in messages.requests[:async_requests]} == \
+		{stage_of(prompt) for prompt, _ in messages.requests[async_requests:]}
+
+
+def test_async_generate_cover_letter_content(job_description, anthropic_client):
+	"""Test that the async cover letter fetches the company info and body through the async client"""
+	# generated_cover_letter reads the .env when it is imported
+	from src.core.generated_cover_letter import GeneratedCoverLetter
+	messages = anthropic_client(respond_by_stage)
+	resume = GeneratedResume(job_description=job_description)
+	cover_letter = GeneratedCoverLetter(job_description, resume.personal_info, resume=[], env_vars=resume.env_vars)
+
+	asyncio.run(cover_letter.async_generate_cover_letter_content())
+	assert cover_letter.company_info == STAGE_OUTPUTS['company_info']
+	assert cover_letter.cover_letter_text == STAGE_OUTPUTS['cover_letter_body']
+	assert len(messages.requests) == 2
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
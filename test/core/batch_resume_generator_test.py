@@ -0,0 +1,117 @@
+import copy
+import json
+import pytest
+from unittest.mock import patch
+from conftest import STAGE_OUTPUTS, stage_of
+from src.core.batch_resume_generator import BatchResumeGenerator
+from src.core.generated_resume import GeneratedResume
+from src.utils.batch_completion import LocalBatchEndpoint
+from src.utils.response_cache import ResponseCache
+from src.utils.single_content_completion import prompt_text
+
+# tech skill extracted for the second job, which marks its later prompts
+SECOND_JOB_SKILL = "survival analysis"
+
+
+class StageResponder:
+	"""Answers batch requests with the canned output of their stage, and malformed output where asked to"""
+	def __init__(self, malformed=()):
+		# (stage, job, attempt) triples answered with malformed output
+		self.malformed = set(malformed)
+		self.calls = []
+
+	def __call__(self, params):
+		prompt = prompt_text(params['messages'][0]['content'])
+		stage = stage_of(prompt)
+		job = 1 if "SECOND JOB" in prompt or SECOND_JOB_SKILL in prompt else 0
+		attempt = 'reask' if "could not be used" in prompt else 'first'
+		self.calls.append((stage, job, attempt))
+		if (stage, job, attempt) in self.malformed:
+			return "here are the entries you asked for"
+		if stage == 'extract_tech_skills' and job == 1:
+			return json.dumps([SECOND_JOB_SKILL])
+		return STAGE_OUTPUTS[stage]
+
+
+@pytest.fixture
+def batch_generator(job_description, tmp_path):
+	"""Build batch generators over two jobs, answered by a LocalBatchEndpoint, without response caching"""
+	second_job = copy.deepcopy(job_description)
+	second_job['role_description'] += " SECOND JOB"
+	cache = ResponseCache(cache_dir=str(tmp_path / 'cache'), max_size_bytes=1024 * 1024, enabled=False)
+
+	def build(responder):
+		resumes = [GeneratedResume(job_description=job) for job in (job_description, second_job)]
+		endpoint = LocalBatchEndpoint(responder)
+		return BatchResumeGenerator(resumes, client=endpoint, poll_interval=0), endpoint
+
+	with patch('src.utils.batch_completion.response_cache', cache), \
+		patch('src.utils.single_content_completion.response_cache', cache):
+		yield build
+
+
+def submitted_jobs(batch):
+	return {request['custom_id'].split('-')[0] for request in batch}
+
+
+def test_stages_advance_across_jobs(batch_generator):
+	"""Test that each stage is one batch covering every job, and every job is finished"""
+	generator, endpoint = batch_generator(StageResponder())
+	completed = generator.generate_resume_content()
+
+	assert completed == generator.resumes and generator.failed_jobs == {}
+	assert len(endpoint.submitted) == len(GeneratedResume.PIPELINE_STAGES)
+	assert all(submitted_jobs(batch) == {'job0', 'job1'} for batch in endpoint.submitted)
+	assert [request['custom_id'] for request in endpoint.submitted[0]][:3] == [
+		'job0-stage0-task0', 'job0-stage0-task1', 'job0-stage0-task2'
+	]
+	assert generator.resumes[1].gen_tech_skills == [SECOND_JOB_SKILL]
+	for resume in completed:
+		assert [employer['role_title'] for employer in resume.professional_experience_output] == \
+			[STAGE_OUTPUTS['generate_role_title']] * resume.professional_experience_count
+
+
+def test_rejected_item_fails_only_its_job(batch_generator):
+	"""Test that an output rejected again after its re-ask removes only its own job from later stages"""
+	responder = StageResponder(malformed={
+		('select_most_relevant_experience', 1, 'first'),
+		('select_most_relevant_experience', 1, 'reask'),
+	})
+	generator, endpoint = batch_generator(responder)
+	completed = generator.generate_resume_content()
+
+	assert completed == generator.resumes[:1]
+	assert list(generator.failed_jobs) == [1] and isinstance(generator.failed_jobs[1], ValueError)
+	stage = GeneratedResume.PIPELINE_STAGES.index('select_most_relevant_experience')
+	assert all(submitted_jobs(batch) == {'job0'} for batch in endpoint.submitted[stage + 2:])
+	assert ('verify_experience', 1, 'first') not in responder.calls
+
+
+def test_rejected_item_recovers_with_reask(batch_generator):
+	"""Test that an output that could not be parsed is re-asked in a second batch of its stage"""
+	responder = StageResponder(malformed={('select_most_relevant_experience', 1, 'first')})
+	generator, endpoint = batch_generator(responder)
+	completed = generator.generate_resume_content()
+
+	assert completed == generator.resumes and generator.failed_jobs == {}
+	reasks = [batch for batch in endpoint.submitted if batch[0]['custom_id'].endswith('-reask')]
+	assert len(reasks) == 1
+	assert submitted_jobs(reasks[0]) == {'job1'} and len(reasks[0]) == generator.resumes[1].professional_experience_count
+	assert len(endpoint.submitted) == len(GeneratedResume.PIPELINE_STAGES) + 1
+
+
+def test_saved_employer_outputs_are_reused(batch_generator):
+	"""Test that a completed batch saves each employer's outputs, so a rerun only submits the shared stages"""
+	batch_generator(StageResponder())[0].generate_resume_content()
+
+	responder = StageResponder()
+	generator, endpoint = batch_generator(responder)
+	completed = generator.generate_resume_content()
+
+	assert len(completed) == 2
+	stages = {stage for stage, _, _ in responder.calls}
+	assert stages == {'extract_tech_skills', 'extract_tech_tools', 'extract_soft_skills', 'extract_hard_skills'}
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import shutil
+from types import SimpleNamespace
+import pytest
+from src.utils import single_content_completion
+from src.utils.response_cache import ResponseCache
+
+EXPERIENCE = [
+	{"what": "Built demand forecasting models", "how": "python, sql", "result": "cut inventory costs"},
+	{"what": "Led a team of data scientists", "how": "agile", "result": "faster delivery"},
+]
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch, request):
+	"""Copy of the config, assets, and sample inputs with a .env, as the working directory"""
+	root = request.config.rootpath
+	shutil.copytree(root / 'config', tmp_path / 'config')
+	shutil.copytree(root / 'data' / 'assets', tmp_path / 'data' / 'assets')
+	shutil.copytree(root / 'data' / 'input', tmp_path / 'data' / 'input')
+	shutil.copy(root / 'sample.env', tmp_path / '.env')
+
+	doc_format = (tmp_path / 'config' / 'doc_format.yaml').read_text()
+	(tmp_path / 'config' / 'doc_format.yaml').write_text(
+		doc_format.replace('cover_letter_user_image_header: True', 'cover_letter_user_image_header: False')
+	)
+	with open(tmp_path / 'data' / 'input' / 'resume' / 'resume_input_sample.json', 'r', encoding='utf-8') as file:
+		resume_input = json.load(file)
+	for employer in resume_input['professional_experience']:
+		employer['experience'] = [
+			{"what": responsibility, "how": "python, sql", "result": "impact"}
+			for responsibility in employer['responsibilities'][:10]
+		]
+	resume_input['personal_info']['github_url'] = 'github.com/user'
+	with open(tmp_path / 'data' / 'input' / 'resume' / 'resume_input.json', 'w', encoding='utf-8') as file:
+		json.dump(resume_input, file)
+
+	monkeypatch.chdir(tmp_path)
+	return tmp_path
+
+
+@pytest.fixture
+def job_description(sandbox):
+	with open('data/input/job_description/jd.json', 'r', encoding='utf-8') as file:
+		return json.load(file)
+
+
+STAGE_OUTPUTS = {
+	'extract_tech_skills': '["machine learning", "statistics"]',
+	'extract_tech_tools': '["python", "sql"]',
+	'extract_soft_skills': '["teamwork"]',
+	'extract_skills': json.dumps({"tech_skills": ["machine learning"], "tech_tools": ["python"], "soft_skills": ["teamwork"]}),
+	'select_all_relevant_experience': json.dumps(EXPERIENCE),
+	'select_most_relevant_experience': json.dumps(EXPERIENCE),
+	'verify_experience': json.dumps(EXPERIENCE),
+	'extract_hard_skills': json.dumps({"Programming Languages and Libraries": "Python", "Cloud, Open-Source, and Database Tools": "AWS"}),
+	'format_experience': '["Built demand forecasting models using Python.", "Led a team of data scientists."]',
+	'generate_role_title': "Data Scientist",
+	'company_info': "A company that prices short-term rentals.",
+	'cover_letter_body': "Cover letter body.",
+}
+
+
+# a phrase of each stage's prompt, checked in order
+STAGE_MARKERS = [
+	("summary about this company", 'company_info'),
+	("Write them a cover letter", 'cover_letter_body'),
+	("technical skills required", 'extract_tech_skills'),
+	("technology tools", 'extract_tech_tools'),
+	("key soft skills", 'extract_soft_skills'),
+	("select any of the elements", 'select_all_relevant_experience'),
+	("most relevant entries", 'select_most_relevant_experience'),
+	("<extracted_experience>", 'verify_experience'),
+	("categorize the extracted skills", 'extract_hard_skills'),
+	("CAR format", 'format_experience'),
+	("return only one job title", 'generate_role_title'),
+]
+
+
+def fake_completion(prompt, stage=None, employer_index=None, **kwargs):
+	"""Canned chat completion output of each pipeline stage"""
+	return STAGE_OUTPUTS[stage]
+
+
+def stage_of(prompt):
+	"""Pipeline stage of a prompt text"""
+	return next(stage for marker, stage in STAGE_MARKERS if marker in prompt)
+
+
+def respond_by_stage(prompt):
+	"""Canned chat completion output of the stage of a prompt text"""
+	return STAGE_OUTPUTS[stage_of(prompt)]
+
+
+class FakeMessages:
+	"""Stands in for the messages resource of the Anthropic client, answering each request with respond(prompt text)"""
+	def __init__(self, respond):
+		self.respond = respond
+		self.requests = []
+		# responses to requests with a smaller max_tokens are truncated
+		self.truncate_below = 0
+
+	def create(self, max_tokens, messages, **kwargs):
+		prompt = single_content_completion.prompt_text(messages[0]['content'])
+		self.requests.append((prompt, max_tokens))
+		return SimpleNamespace(
+			content=[SimpleNamespace(text=self.respond(prompt))],
+			stop_reason='max_tokens' if max_tokens < self.truncate_below else 'end_turn',
+			usage=SimpleNamespace(input_tokens=100, output_tokens=20),
+		)
+
+
+class FakeAsyncMessages:
+	"""Async counterpart of FakeMessages, sharing its responses and recorded requests"""
+	def __init__(self, messages):
+		self.messages = messages
+
+	async def create(self, max_tokens, messages, **kwargs):
+		await asyncio.sleep(0)
+		return self.messages.create(max_tokens, messages)
+
+
+@pytest.fixture
+def anthropic_client(sandbox, monkeypatch):
+	"""Answer the chat completions of the sync and async clients with respond(prompt text), with an empty response cache"""
+	cache = ResponseCache(cache_dir=str(sandbox / 'cache'), max_size_bytes=1024 * 1024)
+	monkeypatch.setattr(single_content_completion, 'response_cache', cache)
+
+	def build(respond):
+		messages = FakeMessages(respond)
+		monkeypatch.setattr(single_content_completion, 'get_client', lambda: SimpleNamespace(messages=messages))
+		monkeypatch.setattr(
+			single_content_completion,
+			'get_async_client',
+			lambda: SimpleNamespace(messages=FakeAsyncMessages(messages))
+		)
+		return messages
+	return build
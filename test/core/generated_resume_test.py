@@ -0,0 +1,239 @@
+import copy
+import json
+import os
+import pickle
+import pytest
+from src.core.generated_resume import GeneratedResume
+from src.utils.json_verifier import is_skill_lists
+from src.utils.page_fit import PageFitEstimator
+from src.utils.retry_policy import TruncatedCompletionError
+from src.utils import single_content_completion
+from conftest import EXPERIENCE, STAGE_OUTPUTS, respond_by_stage, stage_of
+
+BULLET = "Led the design of a demand forecasting platform in Python and Spark that cut inventory costs by 12% across 40 warehouses"
+
+
+@pytest.fixture
+def assembled_resume(job_description):
+	"""Build resumes whose employers have the given numbers of generated bullets, numbered by priority"""
+	def build(bullet_counts, **page_fit):
+		resume = GeneratedResume(job_description=job_description)
+		resume.model_config['page_fit'].update(page_fit)
+		resume.professional_experience_liminal = [
+			{
+				'employer': experience['employer'],
+				'role_title': 'Data Scientist',
+				'formatted_experience': [f"{k} {BULLET}" for k in range(count)],
+			}
+			for experience, count in zip(resume.professional_experience_input, bullet_counts)
+		]
+		return resume
+	return build
+
+
+def bullet_counts(resume):
+	return [len(employer['experience']) for employer in resume.professional_experience_output]
+
+
+def test_pickle_round_trip(job_description):
+	"""Test that a resume, including its checkpoint, survives pickle_resume and gets new locks"""
+	resume = GeneratedResume(job_description=job_description)
+	resume.gen_tech_skills = ["machine learning"]
+	os.makedirs('data/output', exist_ok=True)
+	resume.pickle_resume()
+
+	with open(resume.output_path('resume.pkl'), 'rb') as file:
+		restored = pickle.load(file)
+	assert restored.gen_tech_skills == ["machine learning"]
+	assert restored.checkpoint.path == resume.checkpoint.path
+	with restored._state_lock, restored.checkpoint._lock:
+		pass
+	restored.checkpoint.save(set(), {})
+	assert restored.checkpoint.load() == ([], {})
+
+
+@pytest.mark.parametrize('key, value', [
+	('stage_max_tokens', {'default': 1000}),
+	('corrective_reask', False),
+	('corrective_reask_prompt', "Return only {expected}."),
+])
+def test_employer_fingerprint_settings(job_description, key, value):
+	"""Test that a change to a setting of the per-employer chat completions invalidates their saved outputs"""
+	resume = GeneratedResume(job_description=job_description)
+	changed = GeneratedResume(job_description=job_description)
+	changed.model_config[key] = value
+	assert resume._employer_fingerprint(0) != changed._employer_fingerprint(0)
+
+
+@pytest.mark.parametrize('corrective_reask', [False, True])
+def test_rejected_output_not_replayed_from_cache(job_description, anthropic_client, corrective_reask):
+	"""Test that outputs rejected by a stage are evicted from the response cache, so a rerun requests new ones"""
+	messages = anthropic_client(lambda prompt: "python and sql")
+	resume = GeneratedResume(job_description=job_description)
+	resume.model_config['corrective_reask'] = corrective_reask
+	with pytest.raises(ValueError):
+		resume._complete_stage('extract_tech_tools', resume._tech_tools_prompt, resume._store_tech_tools)
+	assert len(messages.requests) == 1 + corrective_reask
+
+	messages.respond = lambda prompt: '["python", "sql"]'
+	resume._complete_stage('extract_tech_tools', resume._tech_tools_prompt, resume._store_tech_tools)
+	assert resume.gen_tech_tools == ["python", "sql"]
+	assert len(messages.requests) == 2 + corrective_reask
+
+	resume._complete_stage('extract_tech_tools', resume._tech_tools_prompt, resume._store_tech_tools)
+	assert len(messages.requests) == 2 + corrective_reask
+
+
+def test_truncated_output_raises_max_tokens(job_description, anthropic_client):
+	"""Test that a response truncated at max_tokens is requested again with double the budget, and not cached"""
+	messages = anthropic_client(lambda prompt: '["python", "sql"]')
+	messages.truncate_below = 1024
+	resume = GeneratedResume(job_description=job_description)
+	resume._complete_stage('extract_tech_tools', resume._tech_tools_prompt, resume._store_tech_tools)
+	assert [max_tokens for _, max_tokens in messages.requests] == [512, 1024]
+	assert resume.gen_tech_tools == ["python", "sql"]
+	assert len(os.listdir(single_content_completion.response_cache.cache_dir)) == 1
+
+
+def test_truncated_output_fails_at_ceiling(job_description, anthropic_client):
+	"""Test that a stage still truncated at max_tokens_ceiling fails instead of asking again"""
+	messages = anthropic_client(lambda prompt: '["python", "sql"]')
+	messages.truncate_below = 10 ** 6
+	resume = GeneratedResume(job_description=job_description)
+	resume.model_config['max_tokens_ceiling'] = 3000
+	with pytest.raises(TruncatedCompletionError, match="max_tokens_ceiling"):
+		resume._complete_stage('extract_tech_tools', resume._tech_tools_prompt, resume._store_tech_tools)
+	assert [max_tokens for _, max_tokens in messages.requests] == [512, 1024, 2048, 3000]
+	assert resume.gen_tech_tools is None
+
+
+def test_saved_employer_outputs_are_reused(job_description, anthropic_client):
+	"""Test that a rerun reads each employer's saved outputs, requesting only the shared stages"""
+	messages = anthropic_client(respond_by_stage)
+	single_content_completion.response_cache.enabled = False
+	first = GeneratedResume(job_description=job_description)
+	first.generate_resume_content()
+	first_requests = len(messages.requests)
+
+	resume = GeneratedResume(job_description=job_description)
+	resume.generate_resume_content()
+	assert resume.previous_employer_outputs
+	assert {stage_of(prompt) for prompt, _ in messages.requests[first_requests:]} == \
+		{'extract_tech_skills', 'extract_tech_tools', 'extract_soft_skills', 'extract_hard_skills'}
+	assert resume.professional_experience_output == first.professional_experience_output
+
+
+def test_fused_skill_extraction(job_description, anthropic_client):
+	"""Test that with fused_skill_extraction, one chat completion fills all three skill lists"""
+	messages = anthropic_client(lambda prompt: STAGE_OUTPUTS['extract_skills'])
+	resume = GeneratedResume(job_description=job_description)
+	resume.model_config['fused_skill_extraction'] = True
+	tasks = resume._stage_tasks('extract_skills')
+	assert [task[0] for task in tasks] == ['extract_skills']
+
+	task_name, build_prompt, store_output, args = tasks[0]
+	resume._complete_stage(task_name, build_prompt, store_output, *args)
+	assert len(messages.requests) == 1 and "Extract three lists" in messages.requests[0][0]
+	assert resume.gen_tech_skills == ["machine learning"]
+	assert resume.gen_tech_tools == ["python"]
+	assert resume.gen_soft_skills == ["teamwork"]
+
+
+@pytest.mark.parametrize('output', [
+	'{"tech_skills": ["machine learning"], "tech_tools": ["python"]}',
+	'{"tech_skills": ["machine learning"], "tech_tools": "python", "soft_skills": ["teamwork"]}',
+	'{"tech_skills": [1, 2], "tech_tools": ["python"], "soft_skills": ["teamwork"]}',
+	'[["machine learning"], ["python"], ["teamwork"]]',
+])
+def test_fused_skill_extraction_rejects_malformed_output(job_description, output):
+	"""Test that a fused reply without three lists of strings is rejected, leaving the skill lists unset"""
+	resume = GeneratedResume(job_description=job_description)
+	assert not is_skill_lists(json.loads(output))
+	with pytest.raises(ValueError, match="extract_skills output is not"):
+		resume._store_skills(output)
+	assert resume.gen_tech_skills is None
+
+
+SELECTION_PROMPTS = ['_select_all_relevant_experience_prompt', '_select_most_relevant_experience_prompt']
+
+
+def selection_resume(job_description, skills, candidate_count):
+	resume = GeneratedResume(job_description=job_description)
+	resume.gen_tech_skills, resume.gen_tech_tools, resume.gen_soft_skills = skills
+	resume.model_config['candidate_count'] = candidate_count
+	for employer in resume.professional_experience_liminal:
+		employer['all_relevant_experience'] = EXPERIENCE
+	return resume
+
+
+@pytest.mark.parametrize('prompt_builder', SELECTION_PROMPTS)
+def test_candidate_experience_after_cached_prefix(job_description, prompt_builder):
+	"""Test that pre-ranked candidates are sent after the cached prompt prefix, and a full experience list within it"""
+	skills = (["forecasting"], ["python"], ["teamwork"])
+	resume = selection_resume(job_description, skills, [10 ** 6] * 3)
+	experience = resume.professional_experience_input[0]['experience']
+	prefix, suffix = getattr(resume, prompt_builder)(0)
+	assert experience[0]['what'] in prefix['text'] and 'cache_control' in prefix
+
+	resume = selection_resume(job_description, skills, [3, 3, 3])
+	prefix, suffix = getattr(resume, prompt_builder)(0)
+	assert not any(entry['what'] in prefix['text'] for entry in experience)
+	assert sum(entry['what'] in suffix['text'] for entry in experience) == 3
+
+
+@pytest.mark.parametrize('prompt_builder', SELECTION_PROMPTS)
+def test_candidate_prefix_shared_across_employers_and_jobs(job_description, prompt_builder):
+	"""Test that the cached prefix of the candidate prompts is byte-identical for every employer and job"""
+	resumes = [
+		selection_resume(job_description, (["forecasting"], ["python"], ["teamwork"]), [3, 3, 3]),
+		selection_resume(job_description, (["computer vision"], ["pytorch", "aws"], ["mentoring"]), [2, 2, 2]),
+	]
+	prefixes = {
+		getattr(resume, prompt_builder)(i)[0]['text']
+		for resume in resumes
+		for i in range(resume.professional_experience_count)
+	}
+	suffixes = {getattr(resume, prompt_builder)(0)[1]['text'] for resume in resumes}
+	assert len(prefixes) == 1 and len(suffixes) == 2
+
+
+def test_fit_to_page(assembled_resume):
+	"""Test that the lowest priority bullets are trimmed until the resume fits, leaving the liminal data intact"""
+	resume = assembled_resume([12, 12, 12])
+	liminal = copy.deepcopy(resume.professional_experience_liminal)
+	resume._assemble_professional_experience_output()
+
+	assert bullet_counts(resume) == [6, 4, 2]
+	assert 0.95 < PageFitEstimator(resume.doc_format).pages(resume._build_resume_document()) <= 1
+	assert resume.professional_experience_liminal == liminal
+	for employer, employer_liminal in zip(resume.professional_experience_output, liminal):
+		kept = len(employer['experience'])
+		assert employer['experience'] == employer_liminal['formatted_experience'][:kept]
+
+
+def test_character_count_and_min_bullets(assembled_resume):
+	"""Test that each employer is trimmed to its character_count, but never below min_bullets"""
+	resume = assembled_resume([5, 5, 5], max_pages=10, min_bullets=2)
+	resume.model_config['character_count'] = [3 * len(f"0 {BULLET}"), 10, 10 ** 6]
+	resume._assemble_professional_experience_output()
+	assert bullet_counts(resume) == [3, 2, 5]
+
+
+def test_trim_order(assembled_resume):
+	"""Test that the employer keeping the largest share of its bullets is trimmed first, ties going to the older employer"""
+	resume = assembled_resume([12, 12, 12], enabled=False)
+	resume.model_config['character_count'] = [10 ** 6] * 3
+	resume._assemble_professional_experience_output()
+	estimator = PageFitEstimator(resume.doc_format)
+	document = resume._build_resume_document()
+	text_width, page_height = estimator.text_area(document)
+	height = estimator.document_height(document)
+	bullet_height = estimator.paragraph_height(f"0 {BULLET}", text_width, 'List Bullet')
+
+	resume.model_config['page_fit'].update(enabled=True, max_pages=(height - 1.5 * bullet_height) / page_height)
+	resume._fit_to_page()
+	assert bullet_counts(resume) == [12, 11, 11]
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
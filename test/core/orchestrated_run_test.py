@@ -0,0 +1,107 @@
+import json
+import os
+import pytest
+from conftest import fake_completion
+
+
+class StubCompletions:
+	"""Stands in for complete_single_content, recording the stage of every call"""
+	def __init__(self, fail_stage=None):
+		self.fail_stage = fail_stage
+		self.calls = []
+
+	def __call__(self, prompt, stage=None, employer_index=None, **kwargs):
+		self.calls.append((stage, employer_index))
+		if stage == self.fail_stage:
+			raise RuntimeError(f"{stage} failed")
+		if stage == 'select_most_relevant_experience' and employer_index == 0:
+			# entries taken verbatim from the resume input, so the local
+			# verifier completes this employer's verification
+			with open('data/input/resume/resume_input.json', 'r', encoding='utf-8') as file:
+				experience = json.load(file)['professional_experience'][0]['experience']
+			return json.dumps(experience[:7])
+		return fake_completion(prompt, stage, employer_index)
+
+	def stream(self, prompt, stage=None, **kwargs):
+		yield self(prompt, stage=stage, **kwargs)
+
+
+@pytest.fixture
+def orchestrated_run(sandbox, job_description, monkeypatch):
+	"""Build orchestrated runs in the sandbox, with chat completions stubbed and task completions recorded"""
+	# generated_cover_letter reads the .env when it is imported
+	from src.core import generated_cover_letter, generated_resume
+	from src.core.orchestrated_run import OrchestratedRun
+	from src.utils import single_content_completion
+	def no_client():
+		raise AssertionError("unstubbed chat completion")
+	monkeypatch.setattr(single_content_completion, 'get_client', no_client)
+	monkeypatch.setattr(single_content_completion, 'get_async_client', no_client)
+	events = []
+
+	def build(completions, resume_run=False):
+		monkeypatch.setattr(generated_resume, 'complete_single_content', completions)
+		monkeypatch.setattr(generated_cover_letter, 'complete_single_content', completions)
+		monkeypatch.setattr(generated_cover_letter, 'stream_single_content', completions.stream)
+		run = OrchestratedRun(job_description, resume_run=resume_run)
+		resume = run.generated_resume
+		run.generated_cover_letter.env_vars = resume.env_vars
+		run.generated_cover_letter.doc_format = resume.doc_format
+
+		checkpoint_task = resume._checkpoint_task
+		def record_task(task_name, args):
+			checkpoint_task(task_name, args)
+			events.append((task_name, *args))
+		monkeypatch.setattr(resume, '_checkpoint_task', record_task)
+		generate_body = run.generated_cover_letter.generate_cover_letter_content
+		def record_body():
+			generate_body()
+			events.append(('cover_letter_body',))
+		monkeypatch.setattr(run.generated_cover_letter, 'generate_cover_letter_content', record_body)
+		os.makedirs(resume.env_vars['RESUME_OUTPUT_PATH'], exist_ok=True)
+		return run
+
+	build.events = events
+	return build
+
+
+def test_cover_letter_waits_for_every_verification(orchestrated_run):
+	"""Test that the cover letter body starts after all verifications, local ones included, and both files are written"""
+	completions = StubCompletions()
+	run = orchestrated_run(completions)
+	run.run(max_workers=4)
+
+	events = orchestrated_run.events
+	verifications = [i for i, event in enumerate(events) if event[0] == 'verify_experience']
+	assert len(verifications) == run.generated_resume.professional_experience_count
+	assert ('verify_experience', 0) not in completions.calls
+	assert events.index(('cover_letter_body',)) > max(verifications)
+	assert os.path.exists(run.generated_resume.output_path('resume.docx'))
+	assert os.path.exists(run.generated_cover_letter.output_path())
+
+
+def test_failed_cover_letter_still_writes_resume(orchestrated_run):
+	"""Test that a failed cover letter raises after the resume is written"""
+	run = orchestrated_run(StubCompletions(fail_stage='cover_letter_body'))
+	with pytest.raises(RuntimeError):
+		run.run(max_workers=4)
+	assert os.path.exists(run.generated_resume.output_path('resume.docx'))
+	assert not os.path.exists(run.generated_cover_letter.output_path())
+
+
+def test_resume_run_repeats_only_unfinished_tasks(orchestrated_run):
+	"""Test that a resumed run skips the checkpointed resume completions and writes both documents"""
+	with pytest.raises(RuntimeError):
+		orchestrated_run(StubCompletions(fail_stage='extract_hard_skills')).run(max_workers=4)
+
+	completions = StubCompletions()
+	run = orchestrated_run(completions, resume_run=True)
+	run.run(max_workers=4)
+	resumed_stages = {stage for stage, _ in completions.calls}
+	assert resumed_stages == {'extract_hard_skills', 'company_info', 'cover_letter_body'}
+	assert os.path.exists(run.generated_resume.output_path('resume.docx'))
+	assert os.path.exists(run.generated_cover_letter.output_path())
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,37 @@
+import pytest
+from docx import Document
+from docx.shared import Inches
+from src.utils import asset_registry
+from src.utils.asset_registry import RULE_LINE, add_asset_picture, load_asset
+
+
+def test_asset_is_read_once(monkeypatch):
+	"""Test that an asset is read from disk on first use only"""
+	load_asset(RULE_LINE)
+	def fail_open(*args, **kwargs):
+		raise AssertionError('asset read again')
+	monkeypatch.setattr('builtins.open', fail_open)
+	assert load_asset(RULE_LINE) is load_asset(RULE_LINE)
+
+
+def test_document_shares_one_image_part():
+	"""Test that every picture of an asset in a document uses the same image part"""
+	document = Document()
+	shapes = [add_asset_picture(document.add_paragraph().add_run(), RULE_LINE, width=Inches(6.375)) for _ in range(4)]
+	image_parts = [rel for rel in document.part.rels.values() if rel.reltype.endswith("/image")]
+	assert len(image_parts) == 1
+	assert {shape.width for shape in shapes} == {Inches(6.375)}
+
+
+def test_invalid_assets(tmp_path):
+	"""Test that missing files and non-image files raise ValueError"""
+	with pytest.raises(ValueError):
+		load_asset('missing.png', asset_dir=str(tmp_path))
+	(tmp_path / 'notes.png').write_text('not an image')
+	with pytest.raises(ValueError):
+		load_asset('notes.png', asset_dir=str(tmp_path))
+	assert not any(path.endswith('notes.png') for path in asset_registry._assets)
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,28 @@
+import os
+import pytest
+from src.utils.atomic_write import write_atomically
+
+
+def test_write_creates_directory_and_file(tmp_path):
+	"""Test that the file is written with its full contents and no temporary file is left"""
+	path = os.path.join(str(tmp_path), 'output', 'resume.docx')
+	write_atomically(path, b'first')
+	write_atomically(path, b'second')
+	with open(path, 'rb') as file:
+		assert file.read() == b'second'
+	assert os.listdir(os.path.dirname(path)) == ['resume.docx']
+
+
+def test_failed_write_leaves_previous_file(tmp_path):
+	"""Test that a write that fails midway neither replaces the file nor leaves a partial file"""
+	path = os.path.join(str(tmp_path), 'resume.docx')
+	write_atomically(path, b'complete')
+	with pytest.raises(TypeError):
+		write_atomically(path, 'not bytes')
+	with open(path, 'rb') as file:
+		assert file.read() == b'complete'
+	assert os.listdir(str(tmp_path)) == ['resume.docx']
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,82 @@
+import pytest
+from unittest.mock import patch
+from src.utils.batch_completion import complete_batch
+from src.utils.batch_completion import LocalBatchEndpoint
+from src.utils.response_cache import ResponseCache
+
+
+def echo_responder(params):
+	"""Answer each request with its prompt in upper case"""
+	content = params['messages'][0]['content']
+	if content == "fail":
+		raise ValueError("invalid request")
+	return content.upper()
+
+
+@pytest.fixture
+def cache(tmp_path):
+	"""Replace the process-wide response cache with an empty one"""
+	cache = ResponseCache(cache_dir=str(tmp_path), max_size_bytes=1024 * 1024)
+	with patch('src.utils.batch_completion.response_cache', cache):
+		yield cache
+
+
+def test_complete_batch_returns_all_responses(cache):
+	"""Test that every request in a batch is answered by custom_id"""
+	endpoint = LocalBatchEndpoint(echo_responder, polls_until_ended=3)
+	responses, errors = complete_batch(
+		[("a", "first", 2048), ("b", "second", 512)],
+		client=endpoint,
+		poll_interval=0
+	)
+	assert responses == {"a": "FIRST", "b": "SECOND"}
+	assert errors == {}
+	assert len(endpoint.submitted) == 1
+	assert endpoint.submitted[0][1]['params']['max_tokens'] == 512
+
+
+def test_complete_batch_reports_errors(cache):
+	"""Test that failed requests are reported without losing the others"""
+	endpoint = LocalBatchEndpoint(echo_responder)
+	responses, errors = complete_batch(
+		[("ok", "fine", 2048), ("bad", "fail", 2048)],
+		client=endpoint,
+		poll_interval=0
+	)
+	assert responses == {"ok": "FINE"}
+	assert "invalid request" in errors["bad"]
+
+
+def test_complete_batch_skips_cached_prompts(cache):
+	"""Test that cached prompts are not submitted and new responses are cached"""
+	endpoint = LocalBatchEndpoint(echo_responder)
+	complete_batch([("a", "first", 2048)], client=endpoint, poll_interval=0)
+	responses, errors = complete_batch(
+		[("a", "first", 2048), ("b", "second", 2048)],
+		client=endpoint,
+		poll_interval=0
+	)
+	assert responses == {"a": "FIRST", "b": "SECOND"}
+	assert [request['custom_id'] for request in endpoint.submitted[1]] == ["b"]
+
+	# a fully cached batch is never submitted
+	complete_batch([("a", "first", 2048)], client=endpoint, poll_interval=0)
+	assert len(endpoint.submitted) == 2
+
+
+def test_complete_batch_cancels_after_max_wait(cache):
+	"""Test that a batch still running after max_wait is cancelled and its requests fail"""
+	endpoint = LocalBatchEndpoint(echo_responder, polls_until_ended=10 ** 6)
+	responses, errors = complete_batch(
+		[("a", "first", 2048), ("b", "second", 2048)],
+		client=endpoint,
+		poll_interval=0,
+		max_wait=0
+	)
+	assert responses == {}
+	assert set(errors) == {"a", "b"} and "cancelled" in errors["a"]
+	assert endpoint.cancelled == ["msgbatch_local_0"]
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,50 @@
+import pytest
+from src.utils.batch_manifest import classify_entry, read_batch_manifest
+
+
+def test_classify_urls():
+	"""Test that job posting URLs are routed to their scraper"""
+	assert classify_entry("https://www.linkedin.com/jobs/view/123")[0] == 'linkedin'
+	assert classify_entry("https://app.welcometothejungle.com/jobs/TI0RfVik")[0] == 'otta'
+	with pytest.raises(ValueError):
+		classify_entry("https://example.com/jobs/1")
+
+
+def test_read_directory(tmp_path):
+	"""Test that a directory yields its job description files in name order"""
+	for name in ("b.json", "a.json", "notes.txt"):
+		(tmp_path / name).write_text("{}")
+	assert read_batch_manifest(str(tmp_path)) == [
+		('flat', str(tmp_path / "a.json")),
+		('flat', str(tmp_path / "b.json")),
+	]
+
+
+def test_read_manifest(tmp_path):
+	"""Test that manifest lines are resolved relative to the manifest"""
+	(tmp_path / "jd-1.json").write_text("{}")
+	manifest = tmp_path / "sweep.txt"
+	manifest.write_text(
+		"# weekly sweep\n"
+		"jd-1.json\n"
+		"\n"
+		"https://www.linkedin.com/jobs/view/123\n"
+	)
+	assert read_batch_manifest(str(manifest)) == [
+		('flat', str(tmp_path / "jd-1.json")),
+		('linkedin', "https://www.linkedin.com/jobs/view/123"),
+	]
+
+
+def test_missing_entries_fail_early(tmp_path):
+	"""Test that a missing file is reported before any job runs"""
+	manifest = tmp_path / "sweep.txt"
+	manifest.write_text("missing.json\n")
+	with pytest.raises(ValueError):
+		read_batch_manifest(str(manifest))
+	with pytest.raises(ValueError):
+		read_batch_manifest(str(tmp_path / "nope.txt"))
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
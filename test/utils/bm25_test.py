@@ -0,0 +1,35 @@
+import pytest
+from src.utils.bm25 import BM25Index
+
+DOCUMENTS = [
+	"led weekly stand ups for the team".split(),
+	"built churn models in python with scikit learn".split(),
+	"migrated etl pipelines to airflow and dbt".split(),
+	"built python dashboards".split(),
+]
+
+
+def test_scores_rank_matching_documents():
+	"""Test that documents sharing rare query terms score highest"""
+	index = BM25Index(DOCUMENTS)
+	scores = index.scores(["python", "scikit"])
+	assert scores[1] > scores[3] > 0
+	assert scores[0] == scores[2] == 0
+
+
+def test_top_k_keeps_document_order():
+	"""Test that the top documents are returned in their original order"""
+	index = BM25Index(DOCUMENTS)
+	assert index.top_k(["airflow", "python"], 3) == [1, 2, 3]
+	assert index.top_k(["unknown"], 2) == [0, 1]
+
+
+def test_empty_index():
+	"""Test that an index without documents returns no results"""
+	index = BM25Index([])
+	assert len(index) == 0
+	assert index.top_k(["python"], 5) == []
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,60 @@
+import json
+import pytest
+from src.utils.checkpoint import CHECKPOINT_FORMAT_VERSION, EmployerOutputStore, RunCheckpoint, fingerprint
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+	return RunCheckpoint(str(tmp_path), fingerprint({"role": "data scientist"}, [1, 2]), name='jd')
+
+
+def test_fingerprint_is_stable():
+	"""Test that equal inputs give equal fingerprints regardless of key order"""
+	assert fingerprint({"a": 1, "b": 2}) == fingerprint({"b": 2, "a": 1})
+	assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+
+def test_save_and_load(checkpoint):
+	"""Test that the completed tasks and state round trip"""
+	assert checkpoint.load() is None
+	checkpoint.save({"verify_experience[1]", "extract_tech_skills"}, {"gen_tech_skills": ["python"]})
+	completed_tasks, state = checkpoint.load()
+	assert completed_tasks == ["extract_tech_skills", "verify_experience[1]"]
+	assert state == {"gen_tech_skills": ["python"]}
+	checkpoint.remove()
+	assert checkpoint.load() is None
+
+
+def test_mismatched_checkpoints_are_ignored(checkpoint, tmp_path):
+	"""Test that checkpoints of other inputs, other versions, or corrupt files are not resumed"""
+	checkpoint.save(set(), {})
+	with open(checkpoint.path, 'r', encoding='utf-8') as file:
+		saved = json.load(file)
+
+	saved['fingerprint'] = 'other'
+	with open(checkpoint.path, 'w', encoding='utf-8') as file:
+		json.dump(saved, file)
+	assert checkpoint.load() is None
+
+	saved['fingerprint'] = checkpoint.fingerprint
+	saved['format_version'] = CHECKPOINT_FORMAT_VERSION + 1
+	with open(checkpoint.path, 'w', encoding='utf-8') as file:
+		json.dump(saved, file)
+	assert checkpoint.load() is None
+
+	with open(checkpoint.path, 'w', encoding='utf-8') as file:
+		file.write('{"truncated')
+	assert checkpoint.load() is None
+
+
+def test_employer_output_store(tmp_path):
+	"""Test that employer outputs round trip only for the same job description"""
+	store = EmployerOutputStore(str(tmp_path), fingerprint({"role": "data scientist"}), name='jd')
+	assert store.load() == {}
+	store.save({"abc": {"role_title": "Data Scientist"}})
+	assert store.load() == {"abc": {"role_title": "Data Scientist"}}
+	assert EmployerOutputStore(str(tmp_path), fingerprint({"role": "analyst"}), name='jd').load() == {}
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,44 @@
+import pytest
+import yaml
+from docx.shared import Pt
+from src.utils import docx_template
+from src.utils.docx_template import TABLE_HEADER_STYLE, base_document
+
+
+@pytest.fixture
+def doc_format():
+	with open('config/doc_format.yaml', 'r') as file:
+		return yaml.safe_load(file)
+
+
+def test_resume_template_styles(doc_format):
+	"""Test that the base resume carries the configured styles and the table header style"""
+	document = base_document('resume', doc_format)
+	assert document.styles['Normal'].font.name == doc_format['normal']['font_name']
+	assert document.styles['Heading 1'].font.size == Pt(doc_format['h1']['font_size'])
+	assert document.styles[TABLE_HEADER_STYLE].font.bold
+
+
+def test_template_is_built_once_per_format(doc_format):
+	"""Test that renders clone the cached template, and a changed format builds a new one"""
+	first = base_document('cover_letter', doc_format)
+	first.add_paragraph("only in the first document")
+	second = base_document('cover_letter', doc_format)
+	assert len(second.paragraphs) == len(first.paragraphs) - 1
+
+	templates = len(docx_template._templates)
+	base_document('cover_letter', doc_format)
+	assert len(docx_template._templates) == templates
+	doc_format['cover_letter']['font_size'] += 1
+	assert base_document('cover_letter', doc_format).styles['Normal'].font.size == Pt(doc_format['cover_letter']['font_size'])
+	assert len(docx_template._templates) == templates + 1
+
+
+def test_unknown_template(doc_format):
+	"""Test that an unknown document kind raises ValueError"""
+	with pytest.raises(ValueError):
+		base_document('invoice', doc_format)
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
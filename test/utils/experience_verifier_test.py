@@ -0,0 +1,37 @@
+import pytest
+from src.utils.experience_verifier import experience_tokens, verify_experience_locally
+
+ORIGINAL = [
+	{"what": "Built churn models", "how": "Python, scikit-learn", "result": "Cut churn by 12%"},
+	{"what": "Led a data team", "how": "Agile, Jira", "result": "Shipped 3 products"},
+	{"what": "Migrated pipelines", "how": "Airflow, dbt", "result": "Halved run time"},
+]
+
+
+def test_tokens_ignore_formatting_and_key_order():
+	"""Test that case, punctuation and key order are normalized away"""
+	reordered = {"result": "cut churn by 12 %", "how": "python scikit learn", "what": "built CHURN models"}
+	assert experience_tokens(reordered) == experience_tokens(ORIGINAL[0])
+
+
+def test_exact_and_fuzzy_matches_return_originals():
+	"""Test that lightly reworded entries resolve to the original entries"""
+	extracted = [
+		{"what": "Migrated pipelines", "how": "Airflow, dbt", "result": "Halved run time"},
+		{"what": "Built churn models", "how": "Python and scikit-learn", "result": "Cut churn by 12%"},
+	]
+	assert verify_experience_locally(extracted, ORIGINAL, 2) == [ORIGINAL[2], ORIGINAL[0]]
+
+
+def test_unmatched_entries_need_the_llm():
+	"""Test that invented, duplicated, too few, or too many entries are not verified locally"""
+	invented = [{"what": "Designed rockets", "how": "C++", "result": "Reached orbit"}]
+	assert verify_experience_locally(invented, ORIGINAL, 1) is None
+	assert verify_experience_locally([ORIGINAL[0], ORIGINAL[0]], ORIGINAL, 2) is None
+	assert verify_experience_locally([ORIGINAL[0]], ORIGINAL, 2) is None
+	assert verify_experience_locally(ORIGINAL, ORIGINAL, 2) is None
+	assert verify_experience_locally("not a list", ORIGINAL, 1) is None
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
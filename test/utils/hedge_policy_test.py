@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.utils.hedge_policy import HedgePolicy
+
+
+def make_policy(**kwargs):
+	settings = dict(enabled=True, min_delay=0.01, min_samples=3, max_extra_fraction=1.0)
+	settings.update(kwargs)
+	return HedgePolicy(**settings)
+
+
+def test_delay_from_observed_latencies():
+	"""Test that the hedge delay is the stage's latency percentile once enough samples exist"""
+	policy = make_policy(delay_seconds=None, min_delay=0.5)
+	assert policy.delay('format_experience') is None
+	for latency in (1.0, 2.0, 3.0, 10.0):
+		policy.observe('format_experience', latency)
+	assert policy.delay('format_experience') == 10.0
+	assert make_policy(delay_seconds=4.0).delay('generate_role_title') == 4.0
+	assert HedgePolicy(enabled=False, delay_seconds=4.0).delay('generate_role_title') is None
+
+
+def test_run_without_hedge():
+	"""Test that a fast request is not hedged"""
+	policy = make_policy(delay_seconds=1.0)
+	assert policy.run('stage', lambda: 'response') == ('response', False)
+	assert policy.hedges == 0
+
+
+def test_run_hedges_slow_request():
+	"""Test that the hedge's response is used when the first request is slow"""
+	policy = make_policy(delay_seconds=0.05)
+	calls = []
+	lock = threading.Lock()
+
+	def send():
+		with lock:
+			calls.append(None)
+			first = len(calls) == 1
+		time.sleep(0.5 if first else 0.0)
+		return 'slow' if first else 'fast'
+
+	assert policy.run('stage', send) == ('fast', True)
+	assert policy.hedges == 1
+	assert policy.hedge_wins == 1
+
+
+def test_hedges_capped_by_extra_spend():
+	"""Test that no hedge is sent once the extra spend budget is used up"""
+	policy = make_policy(delay_seconds=0.01, max_extra_fraction=0.0)
+
+	def send():
+		time.sleep(0.05)
+		return 'response'
+
+	assert policy.run('stage', send) == ('response', False)
+	assert policy.hedges == 0
+	assert policy.requests == 1
+
+
+def test_async_run_cancels_slower_request():
+	"""Test that the async engine cancels the request that lost the race"""
+	policy = make_policy(delay_seconds=0.05)
+	cancelled = []
+	calls = []
+
+	async def send():
+		calls.append(None)
+		first = len(calls) == 1
+		try:
+			await asyncio.sleep(1.0 if first else 0.0)
+		except asyncio.CancelledError:
+			cancelled.append(first)
+			raise
+		return 'slow' if first else 'fast'
+
+	async def run():
+		result = await policy.async_run('stage', send)
+		await asyncio.sleep(0)
+		return result
+
+	assert asyncio.run(run()) == ('fast', True)
+	assert cancelled == [True]
+
+
+def test_run_raises_when_both_requests_fail():
+	"""Test that the error is raised when the request and its hedge both fail"""
+	policy = make_policy(delay_seconds=0.01)
+
+	def send():
+		time.sleep(0.05)
+		raise ConnectionError('connection reset')
+
+	with pytest.raises(ConnectionError):
+		policy.run('stage', send)
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
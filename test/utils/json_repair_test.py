@@ -0,0 +1,32 @@
+import pytest
+from src.utils.json_repair import parse_model_output, strip_code_fences
+
+
+def test_plain_json_and_python_literals():
+	"""Test that JSON and Python literal syntax both parse"""
+	assert parse_model_output('["python", "sql"]') == ["python", "sql"]
+	assert parse_model_output("['python', 'sql']") == ["python", "sql"]
+	assert parse_model_output('{"remote": true, "salary": null}') == {"remote": True, "salary": None}
+	assert parse_model_output("{'remote': true, 'note': 'true story'}") == {"remote": True, "note": "true story"}
+
+
+def test_code_fences_and_prose_are_ignored():
+	"""Test that the value is found inside fences and surrounding prose"""
+	assert strip_code_fences('```json\n["a"]\n```') == '["a"]\n'
+	assert parse_model_output('```json\n[{"what": "built models"}]\n```') == [{"what": "built models"}]
+	assert parse_model_output(
+		'Here are the skills [as requested]:\n["statistics", "a [b] c"]\nLet me know!'
+	) == ["statistics", "a [b] c"]
+	assert parse_model_output("Sure! {'tech_skills': ['ml'],}") == {"tech_skills": ["ml"]}
+
+
+def test_unparsable_output_raises():
+	"""Test that output without a value raises ValueError"""
+	with pytest.raises(ValueError):
+		parse_model_output("N/A")
+	with pytest.raises(ValueError):
+		parse_model_output('["unterminated"')
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,62 @@
+import pytest
+import yaml
+from docx.shared import Inches, Pt
+from src.utils.asset_registry import RULE_LINE, add_asset_picture
+from src.utils.docx_template import base_document
+from src.utils.page_fit import PageFitEstimator
+
+
+@pytest.fixture
+def doc_format():
+	with open('config/doc_format.yaml', 'r') as file:
+		return yaml.safe_load(file)
+
+
+@pytest.fixture
+def estimator(doc_format):
+	return PageFitEstimator(doc_format)
+
+
+def test_line_wrapping(estimator):
+	"""Test that text wraps at word boundaries, and words wider than a line break across lines"""
+	normal = estimator.normal
+	word_width = estimator.text_width('word', normal)
+	space_width = estimator.text_width(' ', normal)
+	assert estimator.line_count('', Inches(1), normal) == 1
+	assert estimator.line_count('word word', 2 * word_width + space_width, normal) == 1
+	assert estimator.line_count('word word', 2 * word_width, normal) == 2
+	assert estimator.line_count('word' * 5, 2 * word_width, normal) == 3
+	assert estimator.line_count('word\nword', Inches(6), normal) == 2
+	assert estimator.text_width('word', normal, bold=True) > word_width
+
+
+def test_bullets_are_indented(estimator):
+	"""Test that a bullet wraps one line earlier than normal text of the same width"""
+	text = 'word ' * 40
+	width = estimator.text_width(text.strip(), estimator.normal) / 2 + Inches(0.1)
+	assert estimator.paragraph_height(text, width) == 2 * estimator.line_height(estimator.normal)
+	assert estimator.paragraph_height(text, width, 'List Bullet') == 3 * estimator.line_height(estimator.normal)
+
+
+def test_document_pages(doc_format, estimator):
+	"""Test that headings, tables, pictures, and bullets all add to the page estimate"""
+	document = base_document('resume', doc_format)
+	assert estimator.pages(document) == 0
+	document.add_heading('PROFESSIONAL EXPERIENCE', level=1)
+	heading_height = estimator.document_height(document)
+	assert heading_height == pytest.approx(Pt(doc_format['h1']['font_size']) * 1.15 * doc_format['h1']['line_spacing'])
+	add_asset_picture(document.add_paragraph().add_run(), RULE_LINE, width=Inches(6.375))
+	table = document.add_table(rows=1, cols=2)
+	table.columns[0].width = Inches(4.5)
+	table.columns[1].width = Inches(2.0)
+	table.rows[0].cells[0].text = 'Data Scientist, TechCorp'
+	assert estimator.document_height(document) > heading_height + estimator.line_height(estimator.normal)
+
+	assert estimator.pages(document) < 1
+	for _ in range(80):
+		document.add_paragraph('Built a forecasting platform that cut inventory costs by 12% across 40 warehouses', style='List Bullet')
+	assert estimator.pages(document) > 1
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
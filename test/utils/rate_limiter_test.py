@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from unittest.mock import patch
+from src.utils.rate_limiter import RateLimiter
+
+
+class FakeClock:
+	"""Manually advanced clock"""
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+@pytest.fixture
+def clock():
+	return FakeClock()
+
+
+def test_requests_within_burst_do_not_wait(clock):
+	"""Test that requests within the per-minute budget are sent immediately"""
+	limiter = RateLimiter(requests_per_minute=60, clock=clock)
+	waits = [limiter.reserve(0, 0) for _ in range(60)]
+	assert waits == [0.0] * 60
+
+
+def test_waits_queue_in_arrival_order(clock):
+	"""Test that callers over the budget wait in order at the refill rate"""
+	limiter = RateLimiter(requests_per_minute=60, clock=clock)
+	for _ in range(60):
+		limiter.reserve(0, 0)
+	# refill rate is one request per second
+	assert limiter.reserve(0, 0) == pytest.approx(1.0)
+	assert limiter.reserve(0, 0) == pytest.approx(2.0)
+	clock.now = 2.0
+	assert limiter.reserve(0, 0) == pytest.approx(1.0)
+
+
+def test_slowest_budget_sets_the_wait(clock):
+	"""Test that the wait covers every budget"""
+	limiter = RateLimiter(
+		requests_per_minute=1000,
+		input_tokens_per_minute=600,
+		output_tokens_per_minute=6000,
+		clock=clock
+	)
+	assert limiter.reserve(600, 100) == 0.0
+	# 300 input tokens refill at 10 tokens per second
+	assert limiter.reserve(300, 100) == pytest.approx(30.0)
+
+
+def test_settle_returns_unused_tokens(clock):
+	"""Test that unused reserved output tokens are returned to the budget"""
+	limiter = RateLimiter(output_tokens_per_minute=4096, clock=clock)
+	assert limiter.reserve(0, 2048) == 0.0
+	assert limiter.reserve(0, 2048) == 0.0
+	limiter.settle(0, 2048, 0, 48)
+	assert limiter.reserve(0, 2000) == 0.0
+
+
+def test_release_returns_failed_reservation(clock):
+	"""Test that the tokens of a failed request are returned, but the request still counts"""
+	limiter = RateLimiter(requests_per_minute=2, input_tokens_per_minute=1000, output_tokens_per_minute=4096, clock=clock)
+	assert limiter.reserve(1000, 4096) == 0.0
+	limiter.release(1000, 4096)
+	assert limiter.reserve(1000, 4096) == 0.0
+	assert limiter.reserve(0, 0) == pytest.approx(30.0)
+
+
+def test_disabled_limits_never_wait(clock):
+	"""Test that a limiter without limits never delays callers"""
+	limiter = RateLimiter.from_config({'requests_per_minute': None})
+	assert all(limiter.reserve(10 ** 6, 10 ** 6) == 0.0 for _ in range(100))
+
+
+def test_acquire_sleeps_for_the_reserved_wait(clock):
+	"""Test that acquire and async_acquire sleep for the computed wait"""
+	limiter = RateLimiter(requests_per_minute=60, clock=clock)
+	for _ in range(60):
+		limiter.reserve(0, 0)
+
+	with patch('src.utils.rate_limiter.time.sleep') as sleep:
+		limiter.acquire(0, 0)
+		sleep.assert_called_once_with(pytest.approx(1.0))
+
+	with patch('src.utils.rate_limiter.asyncio.sleep') as sleep:
+		async def noop(_):
+			return None
+		sleep.side_effect = noop
+		asyncio.run(limiter.async_acquire(0, 0))
+		sleep.assert_called_once_with(pytest.approx(2.0))
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,90 @@
+import os
+import time
+import pytest
+from src.utils.response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+	"""Create a cache in a temporary directory"""
+	return ResponseCache(cache_dir=str(tmp_path), max_size_bytes=1024 * 1024)
+
+
+def test_make_key_is_stable_and_distinct():
+	"""Test that keys depend on model, prompt and max_tokens"""
+	key = ResponseCache.make_key("model-a", "prompt", 2048)
+	assert key == ResponseCache.make_key("model-a", "prompt", 2048)
+	assert key != ResponseCache.make_key("model-b", "prompt", 2048)
+	assert key != ResponseCache.make_key("model-a", "prompt ", 2048)
+	assert key != ResponseCache.make_key("model-a", "prompt", 1024)
+
+
+def test_set_and_get(cache):
+	"""Test that stored responses are returned on lookup"""
+	key = ResponseCache.make_key("model", "prompt", 2048)
+	assert cache.get(key) is None
+	cache.set(key, '["python", "sql"]')
+	assert cache.get(key) == '["python", "sql"]'
+
+
+def test_delete(cache):
+	"""Test that a deleted response is no longer returned, and deleting a missing key is a no-op"""
+	key = ResponseCache.make_key("model", "prompt", 2048)
+	cache.set(key, "truncated")
+	cache.delete(key)
+	assert cache.get(key) is None
+	cache.delete(key)
+
+
+def test_bypass_skips_lookup_but_refreshes(cache):
+	"""Test that bypass ignores cached values while still writing new ones"""
+	key = ResponseCache.make_key("model", "prompt", 2048)
+	cache.set(key, "old")
+	cache.bypass = True
+	assert cache.get(key) is None
+	cache.set(key, "new")
+	cache.bypass = False
+	assert cache.get(key) == "new"
+
+
+def test_disabled_cache_does_not_write(cache, tmp_path):
+	"""Test that a disabled cache neither reads nor writes"""
+	cache.enabled = False
+	key = ResponseCache.make_key("model", "prompt", 2048)
+	cache.set(key, "value")
+	assert cache.get(key) is None
+	assert os.listdir(tmp_path) == []
+
+
+def test_lru_eviction(tmp_path):
+	"""Test that the least recently used entry is evicted first"""
+	entry = "x" * 400
+	cache = ResponseCache(cache_dir=str(tmp_path), max_size_bytes=1200)
+	keys = [ResponseCache.make_key("model", str(i), 2048) for i in range(3)]
+
+	for i, key in enumerate(keys[:2]):
+		cache.set(key, entry)
+		# spread modification times so recency ordering is unambiguous
+		os.utime(os.path.join(str(tmp_path), key + '.json'), (time.time() - 100 + i, time.time() - 100 + i))
+
+	# touch the oldest entry so the second one becomes least recently used
+	assert cache.get(keys[0]) == entry
+	cache.set(keys[2], entry)
+
+	assert cache.get(keys[0]) == entry
+	assert cache.get(keys[1]) is None
+	assert cache.get(keys[2]) == entry
+
+
+def test_corrupt_entry_is_discarded(cache, tmp_path):
+	"""Test that unreadable entries are treated as misses and removed"""
+	key = ResponseCache.make_key("model", "prompt", 2048)
+	path = os.path.join(str(tmp_path), key + '.json')
+	with open(path, 'w') as file:
+		file.write("{not json")
+	assert cache.get(key) is None
+	assert not os.path.exists(path)
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
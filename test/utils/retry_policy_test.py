@@ -0,0 +1,110 @@
+import anthropic
+import httpx
+import pytest
+from src.utils.retry_policy import (
+	CompletionError,
+	DeadlineExceededError,
+	RetriesExhaustedError,
+	RetryPolicy,
+	is_retryable,
+	retry_after,
+)
+
+
+class FakeClock:
+	"""Manually advanced clock"""
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+def status_error(status_code, headers=None):
+	request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+	response = httpx.Response(status_code, headers=headers, request=request)
+	return anthropic.APIStatusError('error', response=response, body=None)
+
+
+@pytest.fixture
+def clock():
+	return FakeClock()
+
+
+def test_retryable_errors():
+	"""Test that only transient errors are retried"""
+	request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+	assert is_retryable(status_error(429))
+	assert is_retryable(status_error(529))
+	assert is_retryable(anthropic.APITimeoutError(request=request))
+	assert not is_retryable(status_error(400))
+	assert not is_retryable(ValueError('bad output'))
+
+
+def test_retry_after_headers():
+	"""Test that retry-after-ms takes precedence over retry-after"""
+	assert retry_after(status_error(429, {'retry-after': '3'})) == 3.0
+	assert retry_after(status_error(429, {'retry-after-ms': '250', 'retry-after': '3'})) == 0.25
+	assert retry_after(status_error(429)) is None
+
+
+def test_backoff_is_jittered_and_exponential(clock):
+	"""Test that the backoff doubles per attempt up to max_delay"""
+	policy = RetryPolicy(base_delay=1.0, max_delay=5.0, clock=clock, jitter=lambda: 0.5)
+	started = policy.start_call()
+	delays = [policy.backoff(status_error(529), attempt, started) for attempt in range(4)]
+	assert delays == [0.5, 1.0, 2.0, 2.5]
+	assert policy.backoff(status_error(429, {'retry-after': '7'}), 0, started) == 7.0
+
+
+def test_backoff_raises_typed_errors(clock):
+	"""Test that non-retryable, exhausted and late calls raise typed errors"""
+	policy = RetryPolicy(max_attempts=3, call_deadline=10.0, clock=clock, jitter=lambda: 1.0)
+	started = policy.start_call()
+
+	with pytest.raises(CompletionError):
+		policy.backoff(status_error(400), 0, started)
+	with pytest.raises(RetriesExhaustedError):
+		policy.backoff(status_error(529), 2, started)
+
+	clock.now = 9.5
+	with pytest.raises(DeadlineExceededError):
+		policy.backoff(status_error(529), 0, started)
+	clock.now = 10.0
+	with pytest.raises(DeadlineExceededError):
+		policy.remaining(started)
+
+
+def test_run_deadline_caps_call_deadline(clock):
+	"""Test that the earlier of the call and run deadlines applies"""
+	policy = RetryPolicy(call_deadline=60.0, run_deadline=100.0, clock=clock)
+	policy.start_run()
+	clock.now = 70.0
+	assert policy.remaining(policy.start_call()) == 30.0
+	policy.start_run()
+	assert policy.remaining(policy.start_call()) == 60.0
+	assert RetryPolicy(clock=clock).remaining(0.0) is None
+
+
+def test_run_deadline_per_run(clock):
+	"""Test that the run deadline starts with each run, so a second run after the deadline still succeeds"""
+	policy = RetryPolicy(run_deadline=100.0, clock=clock)
+	clock.now = 500.0
+	assert policy.remaining(policy.start_call()) is None
+
+	with policy.run():
+		clock.now = 550.0
+		with policy.run():
+			assert policy.remaining(policy.start_call()) == 50.0
+		clock.now = 600.0
+		with pytest.raises(DeadlineExceededError):
+			policy.remaining(policy.start_call())
+
+	assert policy.remaining(policy.start_call()) is None
+	with policy.run():
+		clock.now = 650.0
+		assert policy.remaining(policy.start_call()) == 50.0
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+import pytest
+from src.utils import single_content_completion
+from src.utils.response_cache import ResponseCache
+from src.utils.telemetry import Telemetry
+
+RESPONSE = '["demand forecasting", "causal inference", "experiment design", "python"]'
+
+
+class FakeStream:
+	"""Stands in for a message stream, yielding a response in small deltas"""
+	def __init__(self, message):
+		self.message = message
+		text = message.content[0].text
+		self.text_stream = (text[k:k + 7] for k in range(0, len(text), 7))
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		return False
+
+	def get_final_message(self):
+		return self.message
+
+
+class FakeMessages:
+	"""Stands in for the messages resource of the Anthropic client"""
+	def __init__(self, text=RESPONSE):
+		self.text = text
+		self.requests = []
+
+	def create(self, max_tokens, messages, **kwargs):
+		self.requests.append((messages[0]['content'], max_tokens))
+		return SimpleNamespace(
+			content=[SimpleNamespace(text=self.text)],
+			stop_reason='end_turn',
+			usage=SimpleNamespace(input_tokens=50, output_tokens=20),
+		)
+
+	def stream(self, max_tokens, messages, **kwargs):
+		return FakeStream(self.create(max_tokens, messages))
+
+
+@pytest.fixture
+def messages(tmp_path, monkeypatch):
+	"""Answer chat completions with a fake client, an empty response cache, and fresh telemetry"""
+	messages = FakeMessages()
+	cache = ResponseCache(cache_dir=str(tmp_path), max_size_bytes=1024 * 1024)
+	monkeypatch.setattr(single_content_completion, 'response_cache', cache)
+	monkeypatch.setattr(single_content_completion, 'telemetry', Telemetry())
+	monkeypatch.setattr(single_content_completion, 'get_client', lambda: SimpleNamespace(messages=messages))
+	return messages
+
+
+def test_stream_joins_to_completion(messages):
+	"""Test that the joined deltas of a stream equal the text of the same non-streaming completion"""
+	deltas = list(single_content_completion.stream_single_content("a prompt", use_cache=False, stage='extract_tech_skills'))
+	completion = single_content_completion.complete_single_content("a prompt", use_cache=False, stage='extract_tech_skills')
+	assert len(deltas) > 1
+	assert "".join(deltas) == completion == RESPONSE
+	assert messages.requests[0] == messages.requests[1]
+
+
+def test_stream_replays_cached_response(messages):
+	"""Test that a streamed response is cached, and a cache hit is replayed as a single delta without a request"""
+	streamed = "".join(single_content_completion.stream_single_content("a prompt", stage='extract_tech_skills'))
+	assert list(single_content_completion.stream_single_content("a prompt", stage='extract_tech_skills')) == [streamed]
+	assert single_content_completion.complete_single_content("a prompt", stage='extract_tech_skills') == streamed
+	assert len(messages.requests) == 1
+	assert [record['cache_status'] for record in single_content_completion.telemetry.records] == ['miss', 'hit', 'hit']
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_call():
+	"""Test that callers with the same key wait for the call in flight"""
+	single_flight = SingleFlight()
+	calls = []
+	results = []
+
+	def call():
+		calls.append(None)
+		time.sleep(0.1)
+		return 'response'
+
+	threads = [
+		threading.Thread(target=lambda: results.append(single_flight.run('key', call)))
+		for _ in range(4)
+	]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert len(calls) == 1
+	assert sorted(results) == [('response', False)] + [('response', True)] * 3
+	assert single_flight.in_flight() == 0
+
+
+def test_sequential_calls_are_not_shared():
+	"""Test that a finished call is not reused by later callers"""
+	single_flight = SingleFlight()
+	assert single_flight.run('key', lambda: 1) == (1, False)
+	assert single_flight.run('key', lambda: 2) == (2, False)
+
+
+def test_error_is_raised_for_every_caller():
+	"""Test that callers waiting on a failed call receive its error"""
+	single_flight = SingleFlight()
+	errors = []
+
+	def call():
+		time.sleep(0.1)
+		raise RuntimeError('failed')
+
+	def run():
+		try:
+			single_flight.run('key', call)
+		except RuntimeError as e:
+			errors.append(e)
+
+	threads = [threading.Thread(target=run) for _ in range(3)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+
+	assert len(errors) == 3
+	assert single_flight.in_flight() == 0
+
+
+def test_async_calls_share_one_call():
+	"""Test that coroutines with the same key await the call in flight"""
+	single_flight = SingleFlight()
+	calls = []
+
+	async def call():
+		calls.append(None)
+		await asyncio.sleep(0.05)
+		return 'response'
+
+	async def run():
+		return await asyncio.gather(
+			single_flight.async_run('key', call),
+			single_flight.async_run('key', call),
+			single_flight.async_run('other', call)
+		)
+
+	assert asyncio.run(run()) == [('response', False), ('response', True), ('response', False)]
+	assert len(calls) == 2
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
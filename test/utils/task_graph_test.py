@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+import pytest
+from src.utils.task_graph import TaskGraph, task_label
+
+
+def test_task_label():
+	"""Test the readable label of task keys"""
+	assert task_label(('verify_experience', 0)) == 'verify_experience[0]'
+	assert task_label(('extract_hard_skills',)) == 'extract_hard_skills'
+
+
+def test_dependencies_run_first():
+	"""Test that every task runs after the tasks it depends on"""
+	order = []
+	lock = threading.Lock()
+
+	def task(key):
+		def run():
+			with lock:
+				order.append(key)
+		return run
+
+	graph = TaskGraph()
+	graph.add('c', task('c'), depends_on=['a', 'b'])
+	graph.add('a', task('a'))
+	graph.add('b', task('b'), depends_on=['a'])
+	graph.run(max_workers=4)
+	assert order == ['a', 'b', 'c']
+
+
+def test_chains_do_not_wait_for_each_other():
+	"""Test that a slow chain does not hold back an independent chain"""
+	finished = {}
+	graph = TaskGraph()
+	graph.add(('slow', 0), lambda: time.sleep(0.3))
+	graph.add(('next', 0), lambda: finished.setdefault(0, time.monotonic()), depends_on=[('slow', 0)])
+	graph.add(('fast', 1), lambda: None)
+	graph.add(('next', 1), lambda: finished.setdefault(1, time.monotonic()), depends_on=[('fast', 1)])
+	graph.run(max_workers=4)
+	assert finished[1] < finished[0]
+
+
+def test_failure_skips_dependents_only():
+	"""Test that a failure skips its dependents but not independent tasks"""
+	ran = []
+
+	def fail():
+		raise ValueError("bad output")
+
+	graph = TaskGraph()
+	graph.add('fail', fail)
+	graph.add('dependent', lambda: ran.append('dependent'), depends_on=['fail'])
+	graph.add('independent', lambda: ran.append('independent'))
+	with pytest.raises(RuntimeError) as error:
+		graph.run(max_workers=2)
+	assert isinstance(error.value.__cause__, ValueError)
+	assert ran == ['independent']
+
+
+def test_async_run():
+	"""Test the event loop scheduler, including failure handling"""
+	order = []
+
+	def task(key, fail=False):
+		async def run():
+			await asyncio.sleep(0)
+			if fail:
+				raise ValueError(key)
+			order.append(key)
+		return run
+
+	graph = TaskGraph()
+	graph.add('b', task('b'), depends_on=['a'])
+	graph.add('a', task('a'))
+	graph.add('x', task('x', fail=True))
+	graph.add('y', task('y'), depends_on=['x'])
+	with pytest.raises(RuntimeError):
+		asyncio.run(graph.async_run())
+	assert order == ['a', 'b']
+
+
+def test_invalid_graphs():
+	"""Test that unknown dependencies and cycles are rejected"""
+	graph = TaskGraph()
+	graph.add('a', lambda: None, depends_on=['missing'])
+	with pytest.raises(ValueError):
+		graph.run(max_workers=1)
+
+	graph = TaskGraph()
+	graph.add('a', lambda: None, depends_on=['b'])
+	graph.add('b', lambda: None, depends_on=['a'])
+	with pytest.raises(ValueError):
+		graph.run(max_workers=1)
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
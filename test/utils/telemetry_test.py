@@ -0,0 +1,70 @@
+import json
+import os
+import pytest
+from src.utils import atomic_write
+from src.utils.telemetry import Telemetry, percentile
+
+
+@pytest.fixture
+def telemetry():
+	telemetry = Telemetry(pricing={'input_per_mtok': 3.0, 'output_per_mtok': 15.0})
+	for latency in (1.0, 2.0, 3.0, 4.0):
+		telemetry.record(stage='verify_experience', latency=latency,
+			input_tokens=1000, output_tokens=100)
+	telemetry.record(stage='verify_experience', cache_status='hit')
+	telemetry.record(stage='extract_tech_skills', latency=0.5, retries=2,
+		input_tokens=500, output_tokens=50)
+	return telemetry
+
+
+def test_percentile():
+	"""Test the nearest-rank percentile"""
+	assert percentile([], 50) is None
+	assert percentile([4, 1, 3, 2], 50) == 2
+	assert percentile([4, 1, 3, 2], 95) == 4
+
+
+def test_summary_per_stage(telemetry):
+	"""Test that cache hits count as calls but not towards latency"""
+	verify, extract = telemetry.summary()
+	assert verify['stage'] == 'verify_experience'
+	assert verify['calls'] == 5
+	assert verify['cache_hits'] == 1
+	assert verify['latency_p50'] == 2.0
+	assert verify['latency_p95'] == 4.0
+	assert verify['input_tokens'] == 4000
+	assert verify['estimated_cost'] == pytest.approx((4000 * 3.0 + 400 * 15.0) / 1e6)
+	assert extract['retries'] == 2
+
+
+def test_export_run(telemetry, tmp_path):
+	"""Test that calls, summary and Prometheus metrics are exported"""
+	telemetry.export_run(str(tmp_path), 'run')
+
+	calls = (tmp_path / 'run-calls.jsonl').read_text().splitlines()
+	assert len(calls) == 6
+	summary = [json.loads(line) for line in (tmp_path / 'run-summary.jsonl').read_text().splitlines()]
+	assert [row['stage'] for row in summary] == ['verify_experience', 'extract_tech_skills']
+
+	metrics = (tmp_path / 'run.prom').read_text()
+	assert 'resume_generator_llm_calls_total{stage="verify_experience"} 5' in metrics
+	assert 'resume_generator_llm_latency_seconds{stage="verify_experience",quantile="0.95"} 4.0' in metrics
+	assert sorted(os.listdir(str(tmp_path))) == ['run-calls.jsonl', 'run-summary.jsonl', 'run.prom']
+
+
+def test_failed_export_leaves_previous_files(telemetry, tmp_path, monkeypatch):
+	"""Test that an export that fails midway leaves the previous exports intact and no partial files"""
+	telemetry.export_run(str(tmp_path), 'run')
+	previous = {name: (tmp_path / name).read_text() for name in os.listdir(str(tmp_path))}
+	telemetry.record(stage='format_experience', latency=1.0, input_tokens=100, output_tokens=10)
+
+	def fail_fsync(fd):
+		raise OSError("disk full")
+	monkeypatch.setattr(atomic_write.os, 'fsync', fail_fsync)
+	with pytest.raises(OSError):
+		telemetry.export_run(str(tmp_path), 'run')
+	assert {name: (tmp_path / name).read_text() for name in os.listdir(str(tmp_path))} == previous
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])
@@ -0,0 +1,45 @@
+import pytest
+from src.utils.token_estimator import estimate_tokens, trim_to_budget
+
+
+def test_estimate_tokens():
+	"""Test the estimate for words, long words, digits and punctuation"""
+	assert estimate_tokens("") == 0
+	assert estimate_tokens("built a model") == 3
+	assert estimate_tokens("internationalization") == 4
+	assert estimate_tokens("2024") == 2
+	assert estimate_tokens('["a", "b"]') == 9
+
+
+def test_estimate_tokens_of_content_blocks():
+	"""Test that content blocks are estimated like the joined prompt text"""
+	blocks = [{"type": "text", "text": "select the "}, {"type": "text", "text": "skills"}]
+	assert estimate_tokens(blocks) == estimate_tokens("select the skills")
+
+
+def test_trim_to_budget_drops_last_items():
+	"""Test that the last items of the longest list are dropped until the prompt fits"""
+	def build_prompt(inputs):
+		return f"skills: {inputs['skills']} experience: {inputs['experience']}"
+
+	prompt_inputs = {
+		"skills": ["python"],
+		"experience": [f"built model number {i}" for i in range(20)]
+	}
+	prompt, dropped = trim_to_budget(build_prompt, prompt_inputs, 60)
+	assert estimate_tokens(prompt) <= 60
+	assert dropped > 0
+	assert "built model number 0'" in prompt
+	assert "built model number 19" not in prompt
+	assert len(prompt_inputs["experience"]) == 20
+
+
+def test_trim_to_budget_keeps_prompts_that_fit():
+	"""Test that prompts within the budget are unchanged"""
+	prompt, dropped = trim_to_budget(lambda inputs: str(inputs['items']), {"items": ["a", "b"]}, 100)
+	assert prompt == "['a', 'b']"
+	assert dropped == 0
+
+
+if __name__ == '__main__':
+	pytest.main([__file__])